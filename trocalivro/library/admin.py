@@ -1,7 +1,8 @@
 from django.contrib import admin
-from library.models import Profile, Book
 
+from library.models import Book, Job, Profile
 
 # Registrando os modelos.
 admin.site.register(Profile)
 admin.site.register(Book)
+admin.site.register(Job)
@@ -0,0 +1,264 @@
+"""
+API JSON para o aplicativo: livros (lista, busca, detalhe) e trocas.
+
+As respostas são montadas com ``.values()`` só das colunas pedidas em
+``fields=`` (projeção no SELECT, sem instanciar modelos) e a paginação é por
+cursor opaco: a chave ``(created_at, id)`` do último livro, assinada com
+django.core.signing. Cada página custa uma consulta por shard, qualquer que
+seja a profundidade. A autenticação é a mesma sessão do site (com CSRF).
+"""
+
+import json
+from datetime import date
+from functools import wraps
+
+from django.core import signing
+from django.http import HttpResponse, JsonResponse
+from django.templatetags.static import static
+from django.views.decorators.http import (
+    require_GET,
+    require_http_methods,
+    require_POST,
+)
+
+from library import changes
+from library.models import Book, StatusBook
+from library.services.books_management_service import (
+    BookRemovalError,
+    delete_book,
+    get_book_page,
+    get_book_values,
+    image_display_path,
+)
+from library.services.exchange_service import (
+    BookExchangeError,
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+from library.services.rating_service import RatingError, rate_exchange
+from library.views import distance_filter
+
+BOOK_FIELDS = (
+    "title",
+    "author",
+    "genre",
+    "description",
+    "status",
+    "image",
+    "owner_id",
+)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+CURSOR_SALT = "library.api.cursor"
+CHANGES_CURSOR_SALT = "library.api.changes"
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_view(view):
+    """Converte ApiError e os erros de domínio em respostas JSON de erro."""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return _error(str(e), e.status)
+        except (BookExchangeError, BookRemovalError, RatingError) as e:
+            return _error(str(e), 400)
+
+    return wrapped
+
+
+def _profile(request):
+    if not request.user.is_authenticated:
+        raise ApiError("Autenticação necessária.", status=401)
+    return request.user.profile
+
+
+def _fields(request):
+    """Campos de ``fields=title,author``; sem o parâmetro, todos."""
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(BOOK_FIELDS)
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = set(fields) - set(BOOK_FIELDS) - {"id", "created_at"}
+    if unknown:
+        raise ApiError(f"Campos desconhecidos: {', '.join(sorted(unknown))}.")
+    return fields
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("limit deve ser um número.")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def encode_cursor(key):
+    created_at, book_id = key
+    return signing.dumps([created_at.isoformat(), book_id], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        created_at, book_id = signing.loads(cursor, salt=CURSOR_SALT)
+        return date.fromisoformat(created_at), int(book_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ApiError("Cursor inválido.")
+
+
+def _status_label(status):
+    # O status sai como rótulo ("IN EXCHANGE"), como nos templates e no SSE.
+    return StatusBook(status).label
+
+
+def _present(rows):
+    """Converte a capa em URL e o status em rótulo nas linhas que os têm."""
+    for row in rows:
+        if "image" in row:
+            row["image"] = static(image_display_path(row["image"]))
+        if "status" in row:
+            row["status"] = _status_label(row["status"])
+    return rows
+
+
+def _book_fields():
+    return ["id", "created_at", *BOOK_FIELDS]
+
+
+def _decode_positions(cursor):
+    try:
+        positions = signing.loads(cursor, salt=CHANGES_CURSOR_SALT)
+        return {str(alias): int(position) for alias, position in positions.items()}
+    except (signing.BadSignature, AttributeError, TypeError, ValueError):
+        raise ApiError("Cursor inválido.")
+
+
+def _json_body(request):
+    if not request.body:
+        return {}
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        raise ApiError("Corpo JSON inválido.")
+    if not isinstance(body, dict):
+        raise ApiError("Corpo JSON inválido.")
+    return body
+
+
+def _exchange(exchange):
+    return {
+        "id": exchange.id,
+        "book_id": exchange.book_id,
+        "requester_id": exchange.requester_id,
+        "owner_id": exchange.owner_id,
+        "status": _status_label(exchange.status),
+        "message": exchange.message,
+    }
+
+
+@require_GET
+@api_view
+def books(request):
+    """Lista (ou busca, com ``q=``) livros, mais recentes primeiro."""
+    fields = _fields(request)
+    owner_ids = None
+    if request.user.is_authenticated and request.GET.get("km"):
+        _, owner_ids = distance_filter(request.user.profile, request.GET["km"])
+    rows, next_key = get_book_page(
+        fields,
+        after=decode_cursor(request.GET.get("cursor")),
+        limit=_limit(request),
+        query=request.GET.get("q", "").strip() or None,
+        owner_ids=owner_ids,
+    )
+    _present(rows)
+    return JsonResponse(
+        {"results": rows, "next": encode_cursor(next_key) if next_key else None}
+    )
+
+
+@require_http_methods(["GET", "DELETE"])
+@api_view
+def book_detail(request, id):
+    if request.method == "DELETE":
+        delete_book(id, _profile(request))
+        return HttpResponse(status=204)
+    fields = _fields(request)
+    try:
+        row = get_book_values(id, fields)
+    except Book.DoesNotExist:
+        raise ApiError("Livro não encontrado.", status=404)
+    _present([row])
+    return JsonResponse(row)
+
+
+@require_POST
+@api_view
+def request_exchange(request, id):
+    """Solicita a troca do livro ``id``."""
+    exchange = create_exchange_request(book_id=id, requester_profile=_profile(request))
+    return JsonResponse(_exchange(exchange), status=201)
+
+
+@require_POST
+@api_view
+def respond_exchange(request, id):
+    """Aceita ou recusa a solicitação ``id`` (``{"action": "accept"|"reject"}``)."""
+    profile = _profile(request)
+    body = _json_body(request)
+    exchange = respond_to_exchange_request(
+        id, profile, str(body.get("action", "")), str(body.get("message", ""))
+    )
+    return JsonResponse(_exchange(exchange))
+
+
+@require_POST
+@api_view
+def exchange_rating(request, id):
+    """Avalia a outra parte de uma troca aceita (``{"score": 1..5, "comment"}``)."""
+    profile = _profile(request)
+    body = _json_body(request)
+    rating = rate_exchange(id, profile, body.get("score"), str(body.get("comment", "")))
+    return JsonResponse(
+        {"exchange_id": rating.exchange_id, "score": rating.score}, status=201
+    )
+
+
+@require_GET
+@api_view
+def book_changes(request):
+    """
+    Livros e trocas do usuário alterados desde ``cursor``. Sem cursor devolve
+    só o cursor de agora: o cliente baixa o catálogo (GET /api/books) e
+    sincroniza dali em diante.
+    """
+    cursor = request.GET.get("cursor")
+    profile_id = request.user.profile.id if request.user.is_authenticated else None
+    result, positions, more = changes.changes_since(
+        _decode_positions(cursor) if cursor else None,
+        _book_fields(),
+        profile_id=profile_id,
+    )
+    for kind in ("books", "exchanges"):
+        for key in ("created", "updated"):
+            _present(result[kind][key])
+    return JsonResponse(
+        {
+            **result,
+            "next": signing.dumps(positions, salt=CHANGES_CURSOR_SALT),
+            "more": more,
+        }
+    )
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class LibraryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "library"
+
+    def ready(self):
+        # Registra os receivers (ids por shard, cache do usuário da sessão) e
+        # as tarefas da fila.
+        from library import (  # noqa: F401
+            middleware,
+            notifications,
+            sharding,
+            tasks,
+            wishlists,
+        )
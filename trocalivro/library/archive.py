@@ -0,0 +1,89 @@
+"""
+Arquivamento das trocas encerradas (tabela quente / tabela fria).
+
+BookExchange guarda as trocas pendentes e as encerradas recentemente, que é
+o que as caixas de solicitações mostram. As encerradas há mais de
+EXCHANGE_ARCHIVE_AFTER dias vão para ArchivedExchange, no mesmo shard e com
+o mesmo id, então os índices da tabela quente acompanham o movimento atual e
+não o histórico inteiro. Cada lote copia e apaga numa transação curta do
+shard; um lote interrompido é refeito sem duplicar (a cópia ignora ids que
+já estão no arquivo). A saída da tabela quente fica no ChangeLog como
+exclusão, para que os clientes sincronizados tirem a troca das caixas.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from library.changes import record_changes
+from library.models import ArchivedExchange, BookExchange, ChangeAction, ChangeKind
+from library.sharding import get_shards
+
+
+def archive_after():
+    return timedelta(days=getattr(settings, "EXCHANGE_ARCHIVE_AFTER", 90))
+
+
+def closed_exchanges(alias, cutoff):
+    """Trocas encerradas antes de ``cutoff``, das mais antigas."""
+    return (
+        BookExchange.objects.using(alias)
+        .select_related("book")
+        .filter(closed_at__isnull=False, closed_at__lt=cutoff)
+        .order_by("closed_at", "id")
+    )
+
+
+def _archived(exchange, now):
+    return ArchivedExchange(
+        id=exchange.id,
+        book_id=exchange.book_id,
+        book_title=exchange.book.title,
+        book_author=exchange.book.author or "",
+        requester_id=exchange.requester_id,
+        owner_id=exchange.owner_id,
+        status=exchange.status,
+        message=exchange.message,
+        created_at=exchange.created_at,
+        closed_at=exchange.closed_at,
+        archived_at=now,
+    )
+
+
+def archive_batch(alias, cutoff, batch_size):
+    """Move até ``batch_size`` trocas encerradas antes de ``cutoff``."""
+    with transaction.atomic(using=alias):
+        exchanges = list(closed_exchanges(alias, cutoff)[:batch_size])
+        if not exchanges:
+            return 0
+        now = timezone.now()
+        ArchivedExchange.objects.using(alias).bulk_create(
+            [_archived(exchange, now) for exchange in exchanges],
+            ignore_conflicts=True,
+        )
+        BookExchange.objects.using(alias).filter(
+            id__in=[exchange.id for exchange in exchanges]
+        ).delete()
+        record_changes(alias, ChangeKind.EXCHANGE, ChangeAction.DELETED, exchanges)
+    return len(exchanges)
+
+
+def archive_closed_exchanges(now=None, older_than=None, batch_size=None):
+    """
+    Arquiva, em todos os shards, as trocas encerradas há mais de
+    ``older_than``. Devolve quantas foram movidas.
+    """
+    if older_than is None:
+        older_than = archive_after()
+    cutoff = (now or timezone.now()) - older_than
+    batch_size = batch_size or getattr(settings, "EXCHANGE_ARCHIVE_BATCH_SIZE", 500)
+    total = 0
+    for alias in get_shards():
+        while True:
+            moved = archive_batch(alias, cutoff, batch_size)
+            total += moved
+            if moved < batch_size:
+                break
+    return total
@@ -0,0 +1,161 @@
+"""
+Versões assíncronas das páginas de leitura e o stream SSE das trocas,
+usados sob ASGI (ASYNC_VIEWS).
+
+As consultas usam o ORM assíncrono e não prendem uma thread enquanto o
+cliente espera; a renderização e os POSTs continuam síncronos, em
+sync_to_async, porque a sessão e as mensagens ainda acessam o banco.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import render
+
+from library.events import get_broker
+from library.models import Book
+from library.services.books_management_service import (
+    aget_book,
+    aget_book_recommendations,
+    aget_home_feed,
+    aget_similar_books,
+    asearch_books,
+    display_book_image,
+)
+from library.services.exchange_service import (
+    aget_received_counts,
+    aget_received_page,
+    aget_sent_counts,
+    aget_sent_page,
+    get_received_history,
+    get_sent_history,
+)
+from library.services.rating_service import aget_rated_exchange_ids
+from library.views import (
+    HISTORY_TAB,
+    distance_filter,
+    inbox_context,
+    inbox_params,
+    respond_to_received_request,
+)
+
+_render = sync_to_async(render)
+
+
+async def _authenticated_user(request):
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def _distance_filter(request):
+    user = await _authenticated_user(request)
+    profile = user.profile if user else None
+    return await sync_to_async(distance_filter)(profile, request.GET.get("km"))
+
+
+async def index(request):
+    context, owner_ids = await _distance_filter(request)
+    book_list = [display_book_image(book) for book in await aget_home_feed(owner_ids)]
+    context.update({"num_books": len(book_list), "book_list": book_list})
+    return await _render(request, "index.html", context)
+
+
+async def search_book(request):
+    query = request.GET.get("q")
+    context, owner_ids = await _distance_filter(request)
+    books = await asearch_books(query, owner_ids)
+    context.update({"book_list": books, "query": query})
+    return await _render(request, "index.html", context)
+
+
+async def book_detail_view(request, id):
+    try:
+        book = await aget_book(id)
+    except Book.DoesNotExist:
+        raise Http404("Livro não encontrado.")
+
+    user = await _authenticated_user(request)
+    book_info = {
+        "book": display_book_image(book),
+        "user": user.profile if user else None,
+    }
+    context = {
+        "book_info": book_info,
+        "recommendations": await aget_book_recommendations(book.id),
+        "similar_books": await aget_similar_books(book.id),
+    }
+    return await _render(request, "book_detail.html", context)
+
+
+async def send_books(request):
+    user = await _authenticated_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+
+    tab, before = inbox_params(request)
+    if tab == HISTORY_TAB:
+        page = await sync_to_async(get_sent_history)(user.profile, before)
+    else:
+        page = await aget_sent_page(user.profile, tab, before)
+    context = inbox_context(
+        page,
+        await aget_sent_counts(user.profile),
+        tab,
+        await aget_rated_exchange_ids(user.profile, page[0]),
+    )
+    return await _render(request, "send_books.html", context)
+
+
+async def received_books(request):
+    user = await _authenticated_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    if request.method == "POST":
+        return await sync_to_async(respond_to_received_request)(request)
+
+    tab, before = inbox_params(request)
+    if tab == HISTORY_TAB:
+        page = await sync_to_async(get_received_history)(user.profile, before)
+    else:
+        page = await aget_received_page(user.profile, tab, before)
+    context = inbox_context(
+        page,
+        await aget_received_counts(user.profile),
+        tab,
+        await aget_rated_exchange_ids(user.profile, page[0]),
+    )
+    return await _render(request, "received_books.html", context)
+
+
+async def exchange_events(request):
+    """Server-Sent Events com as mudanças nas trocas do usuário logado."""
+    user = await _authenticated_user(request)
+    if user is None:
+        return HttpResponseForbidden()
+
+    subscription = get_broker().subscribe(
+        user.profile.id, request.headers.get("Last-Event-ID")
+    )
+    response = StreamingHttpResponse(
+        _event_stream(subscription), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Evita que um proxy (nginx) segure os eventos em buffer.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _event_stream(subscription):
+    with subscription:
+        yield "retry: 3000\n\n"
+        while True:
+            item = await subscription.next(settings.EVENT_HEARTBEAT)
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event = item
+            data = json.dumps(event)
+            yield f"id: {event_id}\nevent: {event['type']}\ndata: {data}\n\n"
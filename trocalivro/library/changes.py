@@ -0,0 +1,139 @@
+"""
+Sincronização incremental ("o que mudou desde o cursor") para o aplicativo.
+
+Cada escrita de livro ou troca nos serviços grava também uma linha em
+ChangeLog, no mesmo banco e na mesma transação; exclusões deixam a linha como
+lápide. O cursor do cliente é a última linha lida de cada shard. Uma leitura
+percorre só as linhas novas (pela chave primária), junta as alterações de
+cada objeto e busca o estado atual dos criados/alterados com uma consulta
+por tipo, então o custo acompanha o que mudou e não o tamanho do catálogo.
+O SQLite serializa as escritas, então uma linha de id menor nunca aparece
+depois que o cursor passou dela.
+"""
+
+from django.db.models import Max, Q
+
+from library.models import Book, BookExchange, ChangeAction, ChangeKind, ChangeLog
+from library.sharding import get_shards
+
+CHANGES_LIMIT = 500
+EXCHANGE_FIELDS = ("id", "book_id", "requester_id", "owner_id", "status", "message")
+
+
+def record_changes(using, kind, action, objects):
+    """Grava as alterações de ``objects`` (livros ou trocas) no banco ``using``."""
+    ChangeLog.objects.using(using).bulk_create(
+        [
+            ChangeLog(
+                kind=kind,
+                action=action,
+                object_id=obj.pk,
+                owner_id=obj.owner_id,
+                requester_id=getattr(obj, "requester_id", None),
+            )
+            for obj in objects
+        ]
+    )
+
+
+def record_book(book, action):
+    record_changes(book._state.db, ChangeKind.BOOK, action, [book])
+
+
+def record_exchange(exchange, action):
+    record_changes(exchange._state.db, ChangeKind.EXCHANGE, action, [exchange])
+
+
+def head():
+    """Cursor que aponta para agora: a última alteração de cada shard."""
+    return {
+        alias: ChangeLog.objects.using(alias).aggregate(last=Max("id"))["last"] or 0
+        for alias in get_shards()
+    }
+
+
+def _collapse(rows):
+    """Ação final de cada objeto: criado, alterado ou excluído na janela."""
+    first, last = {}, {}
+    for kind, action, object_id in rows:
+        first.setdefault((kind, object_id), action)
+        last[(kind, object_id)] = action
+    collapsed = {}
+    for key, action in last.items():
+        if action != ChangeAction.DELETED and first[key] == ChangeAction.CREATED:
+            action = ChangeAction.CREATED
+        collapsed[key] = action
+    return collapsed
+
+
+def _empty():
+    return {"created": [], "updated": [], "deleted": []}
+
+
+def _add_current(result, queryset, fields, actions):
+    """Estado atual dos objetos; os que sumiram nesse meio tempo viram lápide."""
+    found = set()
+    for row in queryset.filter(id__in=list(actions)).values(*fields):
+        found.add(row["id"])
+        result[actions[row["id"]]].append(row)
+    result["deleted"].extend(pk for pk in actions if pk not in found)
+
+
+def changes_since(positions, book_fields, profile_id=None, limit=CHANGES_LIMIT):
+    """
+    Livros (de todos) e trocas (só as de ``profile_id``) alterados depois de
+    ``positions`` (``{shard: última linha lida}``, ou None para começar
+    agora). Devolve ``(alterações, novas posições, se há mais)``; cada shard
+    lê no máximo ``limit`` linhas.
+    """
+    books, exchanges = _empty(), _empty()
+    if positions is None:
+        # Primeira sincronização: só o cursor de agora (o cliente já baixou
+        # o catálogo pela listagem).
+        return {"books": books, "exchanges": exchanges}, head(), False
+    positions = dict(positions)
+    more = False
+    visible = Q(kind=ChangeKind.BOOK)
+    if profile_id is not None:
+        visible |= Q(kind=ChangeKind.EXCHANGE) & (
+            Q(owner_id=profile_id) | Q(requester_id=profile_id)
+        )
+
+    for alias in get_shards():
+        log = ChangeLog.objects.using(alias)
+        last = log.aggregate(last=Max("id"))["last"] or 0
+        after = positions.get(alias, 0)
+        rows = list(
+            log.filter(visible, id__gt=after, id__lte=last)
+            .order_by("id")
+            .values_list("id", "kind", "action", "object_id")[: limit + 1]
+        )
+        if len(rows) > limit:
+            more = True
+            rows = rows[:limit]
+            last = rows[-1][0]
+        positions[alias] = max(after, last)
+
+        actions = {ChangeKind.BOOK: {}, ChangeKind.EXCHANGE: {}}
+        collapsed = _collapse(
+            (kind, action, object_id) for _, kind, action, object_id in rows
+        )
+        for (kind, object_id), action in collapsed.items():
+            if action == ChangeAction.DELETED:
+                target = books if kind == ChangeKind.BOOK else exchanges
+                target["deleted"].append(object_id)
+            else:
+                actions[kind][object_id] = ChangeAction(action).label
+        if actions[ChangeKind.BOOK]:
+            _add_current(
+                books, Book.objects.using(alias), book_fields, actions[ChangeKind.BOOK]
+            )
+        if actions[ChangeKind.EXCHANGE]:
+            _add_current(
+                exchanges,
+                BookExchange.objects.using(alias),
+                EXCHANGE_FIELDS,
+                actions[ChangeKind.EXCHANGE],
+            )
+
+    return {"books": books, "exchanges": exchanges}, positions, more
@@ -0,0 +1,47 @@
+"""
+Redimensionamento de capas, só com Pillow.
+
+Não importa nada do Django para poder rodar em processos filhos
+(ProcessPoolExecutor da importação em lote) sem configurar o projeto.
+"""
+
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
+
+class CoverError(Exception):
+    """Arquivo de capa ausente ou que não é uma imagem suportada."""
+
+
+def resize_image(image, max_size):
+    """Bytes da imagem reduzida para caber em ``max_size``, ou None se já cabe."""
+    if image.width <= max_size[0] and image.height <= max_size[1]:
+        return None
+    image_format = image.format
+    image.thumbnail(max_size)
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def prepare_cover(path, max_size):
+    """
+    Lê e reduz a capa em ``path``. Devolve ``(nome, bytes)`` com a extensão
+    do formato real da imagem.
+    """
+    path = Path(path)
+    try:
+        with Image.open(path) as image:
+            image.load()
+            if image.format not in EXTENSIONS:
+                raise CoverError(f"formato de capa não suportado: {image.format}")
+            data = resize_image(image, max_size) or path.read_bytes()
+            return path.stem + EXTENSIONS[image.format], data
+    except FileNotFoundError:
+        raise CoverError(f"capa não encontrada: {path.name}")
+    except (UnidentifiedImageError, OSError) as e:
+        raise CoverError(f"capa inválida: {path.name} ({e})")
@@ -0,0 +1,250 @@
+"""
+Busca de trocas em cadeia no grafo "quem quer o livro de quem".
+
+Os vértices são perfis; a aresta ``u → v`` diz que ``u`` quer um livro de
+``v``, por uma solicitação pendente (BookExchange) ou por um pedido da lista
+de desejos atendido por um livro ainda não trocado (WishlistMatch). Um ciclo
+``A → B → C → A`` deixa cada participante com um livro do seguinte.
+
+Escolher ciclos disjuntos que movem o máximo de livros é NP-difícil para
+k ≥ 3, então a busca é gulosa e limitada:
+
+1. componentes fortemente conexas (Tarjan, iterativo, O(V + E)) descartam
+   arestas e vértices que não podem estar em nenhum ciclo;
+2. dentro de cada componente, os vértices de menor grau são atendidos
+   primeiro (são os mais difíceis de encaixar depois), com uma DFS de
+   profundidade ≤ k e orçamento de expansões que escolhe o ciclo mais longo
+   pelo vértice, usando só vértices ainda livres.
+"""
+
+from collections import defaultdict
+from operator import attrgetter
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from library.models import (
+    Book,
+    BookExchange,
+    CycleStatus,
+    ExchangeCycle,
+    ExchangeCycleLeg,
+    StatusBook,
+    WishlistMatch,
+)
+from library.sharding import fan_out
+
+CHUNK_SIZE = 5000
+
+
+def build_graph(exclude=()):
+    """
+    ``{u: {v: book_id}}``: um livro por par, preferindo solicitações
+    pendentes a pedidos da lista de desejos. ``exclude`` são perfis que já
+    estão em outra proposta.
+    """
+    exclude = set(exclude)
+    graph = defaultdict(dict)
+
+    def add(wanter, owner, book_id):
+        if wanter != owner and wanter not in exclude and owner not in exclude:
+            graph[wanter].setdefault(owner, book_id)
+
+    pending = fan_out(
+        lambda alias: (
+            BookExchange.objects.using(alias)
+            .filter(status=StatusBook.IN_EXCHANGE.value)
+            .order_by("-id")
+            .values_list("id", "requester_id", "owner_id", "book_id")
+        ),
+        key=lambda row: row[0],
+    )
+    for _, requester_id, owner_id, book_id in pending:
+        add(requester_id, owner_id, book_id)
+
+    matches = (
+        WishlistMatch.objects.using(DEFAULT_DB_ALIAS)
+        .order_by("id")
+        .values_list("wishlist__profile_id", "book_id")
+    )
+    batch = []
+    for row in matches.iterator(chunk_size=CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) == CHUNK_SIZE:
+            _add_wishlist_edges(batch, add)
+            batch = []
+    _add_wishlist_edges(batch, add)
+    return graph
+
+
+def _add_wishlist_edges(batch, add):
+    if not batch:
+        return
+    wanted = defaultdict(list)
+    for profile_id, book_id in batch:
+        wanted[book_id].append(profile_id)
+    # Só livros que ainda não foram trocados; o dono vem do shard do livro.
+    books = fan_out(
+        lambda alias: (
+            Book.objects.using(alias)
+            .filter(id__in=list(wanted))
+            .exclude(status=StatusBook.UNAVAILABLE.value)
+            .order_by("-id")
+            .values_list("id", "owner_id")
+        ),
+        key=lambda row: row[0],
+    )
+    for book_id, owner_id in books:
+        for profile_id in wanted[book_id]:
+            add(profile_id, owner_id, book_id)
+
+
+def strongly_connected_components(graph):
+    """Componentes com mais de um vértice (algoritmo de Tarjan, iterativo)."""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in list(graph):
+        if root in index:
+            continue
+        work = [(root, iter(graph.get(root, ())))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(graph.get(neighbor, ()))))
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        components.append(component)
+    return components
+
+
+def _longest_cycle_through(start, graph, members, used, max_length, budget):
+    """Ciclo mais longo (≤ max_length) que sai e volta a ``start``."""
+    best = None
+    expansions = 0
+    path = [start]
+    on_path = {start}
+    work = [iter(graph[start])]
+    while work and expansions < budget:
+        for neighbor in work[-1]:
+            if neighbor == start and len(path) > 1:
+                if best is None or len(path) > len(best):
+                    best = list(path)
+                    if len(best) == max_length:
+                        return best
+                continue
+            if (
+                neighbor in members
+                and neighbor not in used
+                and neighbor not in on_path
+                and len(path) < max_length
+            ):
+                expansions += 1
+                path.append(neighbor)
+                on_path.add(neighbor)
+                work.append(iter(graph[neighbor]))
+                break
+        else:
+            work.pop()
+            on_path.discard(path.pop())
+    return best
+
+
+def find_cycles(graph, max_length=3, budget=10000):
+    """
+    Ciclos disjuntos de 2 a ``max_length`` perfis, como listas
+    ``[(recebe, dá, book_id), ...]``.
+    """
+    cycles = []
+    used = set()
+    for component in strongly_connected_components(graph):
+        members = set(component)
+        degree = {
+            node: sum(1 for neighbor in graph[node] if neighbor in members)
+            for node in component
+        }
+        for start in sorted(component, key=lambda node: (degree[node], node)):
+            if start in used:
+                continue
+            cycle = _longest_cycle_through(
+                start, graph, members, used, max_length, budget
+            )
+            if cycle is None:
+                continue
+            used.update(cycle)
+            cycles.append(
+                [
+                    (receiver, giver, graph[receiver][giver])
+                    for receiver, giver in zip(cycle, cycle[1:] + cycle[:1])
+                ]
+            )
+    return cycles
+
+
+def propose_cycles(max_length=3, budget=10000):
+    """Grava as propostas encontradas, sem repetir perfis já em proposta."""
+    busy = ExchangeCycleLeg.objects.filter(
+        cycle__status=CycleStatus.PROPOSED
+    ).values_list("receiver_id", flat=True)
+    cycles = find_cycles(build_graph(exclude=busy), max_length, budget)
+
+    book_ids = [book_id for cycle in cycles for _, _, book_id in cycle]
+    titles = {}
+    if book_ids:
+        titles = {
+            book.id: book.title
+            for book in fan_out(
+                lambda alias: (
+                    Book.objects.using(alias)
+                    .filter(id__in=book_ids)
+                    .only("id", "title")
+                    .order_by("-id")
+                ),
+                key=attrgetter("id"),
+            )
+        }
+
+    proposed = []
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        for cycle in cycles:
+            exchange_cycle = ExchangeCycle.objects.create()
+            ExchangeCycleLeg.objects.bulk_create(
+                ExchangeCycleLeg(
+                    cycle=exchange_cycle,
+                    position=position,
+                    receiver_id=receiver,
+                    giver_id=giver,
+                    book_id=book_id,
+                    book_title=titles.get(book_id, ""),
+                )
+                for position, (receiver, giver, book_id) in enumerate(cycle)
+            )
+            proposed.append(exchange_cycle)
+    return proposed
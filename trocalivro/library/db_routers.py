@@ -0,0 +1,163 @@
+import os
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from library import sharding
+from library.models import ArchivedExchange, Book, BookExchange, OwnerShard, Profile
+
+# Verdadeiro quando a requisição (ou sessão, via cookie) já escreveu no
+# primário: as leituras seguintes também vão para ele (read-your-writes).
+_pinned_to_primary = ContextVar("library_pinned_to_primary", default=False)
+# Verdadeiro só quando esta requisição escreveu. É ela que renova o cookie:
+# uma sessão que só lê volta às réplicas quando o cookie expira.
+_wrote_to_primary = ContextVar("library_wrote_to_primary", default=False)
+
+
+def is_pinned():
+    return _pinned_to_primary.get()
+
+
+def pin_to_primary(pinned=True):
+    return _pinned_to_primary.set(pinned)
+
+
+def unpin(token):
+    _pinned_to_primary.reset(token)
+
+
+def wrote_to_primary():
+    return _wrote_to_primary.get()
+
+
+def track_writes():
+    """Zera a marca de escrita no início de uma requisição."""
+    return _wrote_to_primary.set(False)
+
+
+def untrack_writes(token):
+    _wrote_to_primary.reset(token)
+
+
+def replica_lag(alias):
+    """Segundos desde a última cópia da réplica, ou None se ela não existe."""
+    try:
+        return time.time() - os.path.getmtime(settings.DATABASES[alias]["NAME"])
+    except (KeyError, OSError):
+        return None
+
+
+def available_replicas():
+    """Réplicas configuradas cujo atraso está dentro de REPLICA_MAX_LAG."""
+    max_lag = getattr(settings, "REPLICA_MAX_LAG", 30)
+    replicas = []
+    for alias in getattr(settings, "DATABASE_REPLICAS", []):
+        lag = replica_lag(alias)
+        if lag is not None and lag <= max_lag:
+            replicas.append(alias)
+    return replicas
+
+
+def refresh_replica(source_path, replica_path):
+    """Copia o banco primário para a réplica com a API de backup do SQLite."""
+    source = sqlite3.connect(source_path)
+    replica = sqlite3.connect(replica_path)
+    try:
+        with replica:
+            source.backup(replica)
+    finally:
+        replica.close()
+        source.close()
+    # A idade do arquivo é a medida de atraso usada pelo roteador.
+    os.utime(replica_path)
+
+
+def refresh_replicas():
+    primary = settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"]
+    for alias in getattr(settings, "DATABASE_REPLICAS", []):
+        refresh_replica(primary, settings.DATABASES[alias]["NAME"])
+
+
+class ReplicaRouter:
+    """
+    Envia leituras para uma réplica atualizada e escritas (inclusive
+    select_for_update) para o primário. Sem réplicas disponíveis, ou depois
+    de uma escrita, tudo é lido do primário.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if is_pinned():
+            return DEFAULT_DB_ALIAS
+        replicas = available_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        _wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, "DATABASE_REPLICAS", [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, "DATABASE_REPLICAS", []):
+            return False
+        return None
+
+
+class ShardRouter:
+    """
+    Envia livros e trocas para o shard do dono (library.sharding). Os demais
+    modelos seguem para o próximo roteador, exceto quando a consulta parte de
+    um objeto de outro shard: perfis e o mapa de shards vivem no "default".
+    """
+
+    def _db_for_instance(self, model, instance):
+        if isinstance(instance, (Book, BookExchange, ArchivedExchange)):
+            if instance._state.db and not instance._state.adding:
+                return instance._state.db
+            if instance.owner_id is not None:
+                return sharding.shard_for_owner(instance.owner_id)
+            return instance._state.db
+        if isinstance(instance, Profile) and model is Book:
+            return sharding.shard_for_owner(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if not sharding.is_sharded():
+            return None
+        instance = hints.get("instance")
+        if sharding.is_sharded_model(model):
+            return self._db_for_instance(model, instance) or DEFAULT_DB_ALIAS
+        if model is OwnerShard:
+            return DEFAULT_DB_ALIAS
+        if instance is not None and instance._state.db in sharding.get_shards():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        if not sharding.is_sharded():
+            return None
+        if sharding.is_sharded_model(model):
+            return (
+                self._db_for_instance(model, hints.get("instance")) or DEFAULT_DB_ALIAS
+            )
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding.is_sharded():
+            return None
+        shards = sharding.get_shards()
+        if obj1._state.db in shards and obj2._state.db in shards:
+            return True
+        return None
@@ -0,0 +1,230 @@
+"""
+Publicação de eventos de troca para os perfis envolvidos (Server-Sent Events).
+
+O transporte é plugável por EVENT_BROKER:
+
+* ``InMemoryBroker`` entrega direto às conexões abertas no mesmo processo;
+  serve para um único worker ASGI (e para os testes).
+* ``SQLiteBroker`` grava os eventos em um arquivo SQLite que todos os workers
+  consultam periodicamente; substitui um Redis/Postgres LISTEN quando há
+  vários processos na mesma máquina.
+"""
+
+import asyncio
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from functools import cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from library.models import StatusBook
+
+
+class InMemoryBroker:
+    """Filas por perfil dentro do processo; eventos perdidos sem conexão aberta."""
+
+    max_queued = 100
+
+    def __init__(self, **options):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, profile_id, event):
+        event_id = next(self._ids)
+        with self._lock:
+            subscribers = list(self._subscribers.get(profile_id, ()))
+        # publish roda em threads síncronas (on_commit); cada fila pertence ao
+        # event loop da conexão SSE.
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(
+                subscription.deliver, (event_id, event)
+            )
+
+    def subscribe(self, profile_id, last_event_id=None):
+        return _QueueSubscription(self, profile_id)
+
+    def _add(self, subscription):
+        with self._lock:
+            self._subscribers.setdefault(subscription.profile_id, set()).add(
+                subscription
+            )
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.profile_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.profile_id, None)
+
+
+class _QueueSubscription:
+    def __init__(self, broker, profile_id):
+        self.broker = broker
+        self.profile_id = profile_id
+        self.queue = asyncio.Queue(maxsize=broker.max_queued)
+        self.loop = None
+
+    def __enter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.broker._add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker._remove(self)
+
+    def deliver(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Cliente lento demais: descarta em vez de crescer sem limite; a
+            # página ainda mostra o estado correto ao ser recarregada.
+            pass
+
+    async def next(self, timeout):
+        """Próximo ``(id, evento)``, ou None se nada chegou em ``timeout`` s."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SQLiteBroker:
+    """
+    Eventos em uma tabela SQLite compartilhada pelos workers.
+
+    Cada conexão SSE consulta a tabela a cada ``poll_interval`` segundos;
+    eventos mais antigos que ``retention`` segundos são apagados ao publicar.
+    O id do evento é o rowid, então o cabeçalho Last-Event-ID do navegador
+    retoma a conexão sem perder eventos.
+    """
+
+    def __init__(self, path, poll_interval=0.5, retention=300, **options):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS library_event ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " profile_id INTEGER NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS library_event_profile_idx"
+                " ON library_event (profile_id, id)"
+            )
+        connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def publish(self, profile_id, event):
+        now = time.time()
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO library_event (profile_id, payload, created_at)"
+                    " VALUES (?, ?, ?)",
+                    (profile_id, json.dumps(event), now),
+                )
+                connection.execute(
+                    "DELETE FROM library_event WHERE created_at < ?",
+                    (now - self.retention,),
+                )
+        finally:
+            connection.close()
+
+    def subscribe(self, profile_id, last_event_id=None):
+        return _PollingSubscription(self, profile_id, last_event_id)
+
+    def fetch(self, profile_id, after_id):
+        connection = self._connect()
+        try:
+            if after_id is None:
+                row = connection.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM library_event"
+                ).fetchone()
+                return row[0], []
+            rows = connection.execute(
+                "SELECT id, payload FROM library_event"
+                " WHERE profile_id = ? AND id > ? ORDER BY id",
+                (profile_id, after_id),
+            ).fetchall()
+        finally:
+            connection.close()
+        events = [(event_id, json.loads(payload)) for event_id, payload in rows]
+        return (events[-1][0] if events else after_id), events
+
+
+class _PollingSubscription:
+    def __init__(self, broker, profile_id, last_event_id):
+        self.broker = broker
+        self.profile_id = profile_id
+        self.last_id = int(last_event_id) if str(last_event_id).isdigit() else None
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    async def _fetch(self):
+        self.last_id, events = await asyncio.to_thread(
+            self.broker.fetch, self.profile_id, self.last_id
+        )
+        self.pending.extend(events)
+
+    async def next(self, timeout):
+        """Próximo ``(id, evento)``, ou None se nada chegou em ``timeout`` s."""
+        deadline = time.monotonic() + timeout
+        if self.last_id is None:
+            await self._fetch()
+        while not self.pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self.broker.poll_interval, remaining))
+            await self._fetch()
+        return self.pending.pop(0)
+
+
+@cache
+def get_broker():
+    options = dict(getattr(settings, "EVENT_BROKER_OPTIONS", {}))
+    return import_string(settings.EVENT_BROKER)(**options)
+
+
+def exchange_event(kind, exchange):
+    return {
+        "type": kind,
+        "exchange_id": exchange.id,
+        "book_id": exchange.book_id,
+        "status": StatusBook(exchange.status).label,
+        "message": exchange.message,
+    }
+
+
+def publish_exchange_event(kind, exchange, using=None):
+    """
+    Avisa solicitante e dono depois do commit, para que ninguém receba um
+    evento de uma troca que acabou revertida.
+    """
+    event = exchange_event(kind, exchange)
+
+    def publish():
+        broker = get_broker()
+        for profile_id in {exchange.requester_id, exchange.owner_id}:
+            broker.publish(profile_id, event)
+
+    transaction.on_commit(publish, using=using)
@@ -0,0 +1,120 @@
+"""
+Expiração das solicitações de troca sem resposta.
+
+Uma solicitação pendente deixa o livro IN EXCHANGE até o dono responder; as
+que passaram de EXCHANGE_REQUEST_TTL viram EXPIRED e o livro volta a ficar
+disponível (se não houver outra solicitação pendente para ele). A varredura
+anda em lotes de EXCHANGE_EXPIRY_BATCH_SIZE pela faixa do índice parcial das
+pendentes, cada lote numa transação curta com UPDATEs em massa: o SQLite só
+fica bloqueado para escrita durante um lote, e entre eles os pedidos do site
+passam.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from library.changes import record_changes
+from library.events import publish_exchange_event
+from library.history import record_events
+from library.models import (
+    Book,
+    BookExchange,
+    ChangeAction,
+    ChangeKind,
+    ExchangeEventType,
+    StatusBook,
+)
+from library.notifications import notify_exchange
+from library.sharding import get_shards
+
+
+def request_ttl():
+    return timedelta(seconds=getattr(settings, "EXCHANGE_REQUEST_TTL", 14 * 86400))
+
+
+def stale_requests(alias, cutoff):
+    """Solicitações pendentes criadas antes de ``cutoff``, das mais velhas."""
+    return (
+        BookExchange.objects.using(alias)
+        .select_related("book")
+        .filter(status=StatusBook.IN_EXCHANGE.value, created_at__lt=cutoff)
+        .order_by("created_at", "id")
+    )
+
+
+def expire_batch(alias, cutoff, batch_size):
+    """Expira até ``batch_size`` solicitações pendentes criadas antes de ``cutoff``."""
+    with transaction.atomic(using=alias):
+        exchanges = list(stale_requests(alias, cutoff)[:batch_size])
+        if not exchanges:
+            return 0
+        ids = [exchange.id for exchange in exchanges]
+        now = timezone.now()
+        BookExchange.objects.using(alias).filter(id__in=ids).update(
+            status=StatusBook.EXPIRED.value, closed_at=now
+        )
+        # Só libera livros sem outra solicitação ainda pendente.
+        pending = BookExchange.objects.using(alias).filter(
+            book=OuterRef("pk"), status=StatusBook.IN_EXCHANGE.value
+        )
+        books = (
+            Book.objects.using(alias)
+            .filter(
+                id__in={exchange.book_id for exchange in exchanges},
+                status=StatusBook.IN_EXCHANGE.value,
+            )
+            .exclude(Exists(pending))
+        )
+        released = list(books.values_list("id", flat=True))
+        Book.objects.using(alias).filter(id__in=released).update(
+            status=StatusBook.AVAILABLE.value
+        )
+
+        for exchange in exchanges:
+            exchange.status = StatusBook.EXPIRED.value
+            exchange.closed_at = now
+            if exchange.book_id in released:
+                exchange.book.status = StatusBook.AVAILABLE.value
+        record_changes(alias, ChangeKind.EXCHANGE, ChangeAction.UPDATED, exchanges)
+        released_books = {
+            exchange.book_id: exchange.book
+            for exchange in exchanges
+            if exchange.book_id in released
+        }
+        record_changes(
+            alias, ChangeKind.BOOK, ChangeAction.UPDATED, released_books.values()
+        )
+        record_events(
+            alias, [(exchange, ExchangeEventType.EXPIRED) for exchange in exchanges]
+        )
+        for exchange in exchanges:
+            publish_exchange_event("exchange.updated", exchange, using=alias)
+            notify_exchange("exchange.expired", exchange, using=alias)
+    return len(exchanges)
+
+
+def expire_stale_requests(now=None, ttl=None, batch_size=None, pause=None):
+    """
+    Expira as solicitações pendentes mais velhas que ``ttl`` em todos os
+    shards, lote a lote, esperando ``pause`` segundos entre os lotes.
+    Devolve quantas foram expiradas.
+    """
+    cutoff = (now or timezone.now()) - (ttl or request_ttl())
+    batch_size = batch_size or getattr(settings, "EXCHANGE_EXPIRY_BATCH_SIZE", 200)
+    if pause is None:
+        pause = getattr(settings, "EXCHANGE_EXPIRY_PAUSE", 0)
+    total = 0
+    for alias in get_shards():
+        while True:
+            expired = expire_batch(alias, cutoff, batch_size)
+            total += expired
+            if expired < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return total
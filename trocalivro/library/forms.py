@@ -1,7 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Book, Profile
+
+from .models import Book, Profile, Wishlist
 
 
 class SignUpForm(UserCreationForm):
@@ -48,3 +49,32 @@ class EditProfile(forms.ModelForm):
         # Itera sobre todas os campos e coloca todos eles como opcionais.
         for field_name in self.fields:
             self.fields[field_name].required = False
+
+
+class WishlistForm(forms.ModelForm):
+    class Meta:
+        model = Wishlist
+        fields = ("title", "author", "genre")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(field) for field in self.Meta.fields):
+            raise forms.ValidationError("Preencha ao menos um dos campos.")
+        return cleaned_data
+
+
+class ImportBooksForm(forms.Form):
+    owner = forms.CharField(max_length=150, label="Usuário dono dos livros")
+    file = forms.FileField(label="Arquivo (.csv, .jsonl ou .ndjson)")
+
+    def clean_owner(self):
+        try:
+            return Profile.objects.get(user__username=self.cleaned_data["owner"])
+        except Profile.DoesNotExist:
+            raise forms.ValidationError("Usuário não encontrado.")
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith((".csv", ".jsonl", ".ndjson")):
+            raise forms.ValidationError("Envie um arquivo .csv, .jsonl ou .ndjson.")
+        return upload
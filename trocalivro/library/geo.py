@@ -0,0 +1,146 @@
+"""
+Localização aproximada dos perfis e busca por raio ("livros perto de mim").
+
+O endereço (texto livre) é geocodificado sem rede pela tabela embutida
+data/city_centroids.csv: primeiro pelo CEP, depois pelo nome da cidade.
+A posição vira uma célula de uma grade fixa de GRID_DEGREES graus,
+numerada linha a linha (``linha * COLUMNS + coluna``). As células de uma
+linha da grade são inteiros consecutivos, então o quadrado que cobre um
+círculo é um punhado de ``grid_cell BETWEEN a AND b`` no índice, um por
+linha; a distância exata (haversine) só é calculada para os candidatos.
+"""
+
+import bisect
+import csv
+import math
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import Q
+
+from library.models import Profile
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Células de 0,1° (~11 km no equador): poucas linhas para raios de dezenas
+# de km e poucos perfis por célula fora dos grandes centros.
+GRID_DEGREES = 0.1
+ROWS = round(180 / GRID_DEGREES)
+COLUMNS = round(360 / GRID_DEGREES)
+CENTROIDS_PATH = Path(__file__).parent / "data" / "city_centroids.csv"
+CEP_RE = re.compile(r"\b(\d{5})-?\d{3}\b")
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = text.encode("ascii", "ignore").decode().lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+@lru_cache(maxsize=1)
+def _centroids():
+    with open(CENTROIDS_PATH, encoding="utf-8") as source:
+        rows = sorted(csv.DictReader(source), key=lambda row: row["cep_start"])
+    return {
+        "starts": [row["cep_start"] for row in rows],
+        "rows": rows,
+        "cities": [(f" {_normalize(row['city'])} ", row) for row in rows],
+    }
+
+
+def _point(row):
+    return float(row["latitude"]), float(row["longitude"])
+
+
+def geocode(address):
+    """``(latitude, longitude)`` do centro da cidade do endereço, ou None."""
+    table = _centroids()
+    match = CEP_RE.search(address or "")
+    if match:
+        prefix = match.group(1)
+        position = bisect.bisect_right(table["starts"], prefix) - 1
+        if position >= 0 and prefix <= table["rows"][position]["cep_end"]:
+            return _point(table["rows"][position])
+
+    # Sem CEP conhecido, vale a cidade citada mais ao fim do endereço
+    # ("Rua São Paulo, 10, Belo Horizonte" fica em Belo Horizonte).
+    text = f" {_normalize(address)} "
+    best = None
+    for name, row in table["cities"]:
+        end = text.rfind(name)
+        if end >= 0:
+            end += len(name)
+            if best is None or end > best[0]:
+                best = (end, row)
+    return _point(best[1]) if best else None
+
+
+def _row(latitude):
+    return min(max(math.floor((latitude + 90) / GRID_DEGREES), 0), ROWS - 1)
+
+
+def _column(longitude):
+    return math.floor((longitude + 180) / GRID_DEGREES) % COLUMNS
+
+
+def grid_cell(latitude, longitude):
+    return _row(latitude) * COLUMNS + _column(longitude)
+
+
+def cell_ranges(latitude, longitude, km):
+    """Intervalos ``(primeira, última)`` de células que cobrem o círculo."""
+    lat_delta = km / KM_PER_DEGREE
+    south, north = max(latitude - lat_delta, -90), min(latitude + lat_delta, 90)
+    # A longitude encolhe com o cosseno; usa a borda mais próxima do polo.
+    widest = max(abs(south), abs(north))
+    cosine = math.cos(math.radians(widest))
+    lon_delta = 180 if cosine < 1e-9 else min(km / (KM_PER_DEGREE * cosine), 180)
+
+    if lon_delta >= 180:
+        spans = [(0, COLUMNS - 1)]
+    else:
+        first = _column(longitude - lon_delta)
+        last = _column(longitude + lon_delta)
+        # Atravessa o antimeridiano: duas faixas na mesma linha.
+        if first <= last:
+            spans = [(first, last)]
+        else:
+            spans = [(first, COLUMNS - 1), (0, last)]
+
+    return [
+        (row * COLUMNS + first, row * COLUMNS + last)
+        for row in range(_row(south), _row(north) + 1)
+        for first, last in spans
+    ]
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Distância pelo haversine."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def candidate_profiles(latitude, longitude, km):
+    """Perfis nas células que cobrem o círculo (faixas no profile_grid_cell_idx)."""
+    cells = Q()
+    for first, last in cell_ranges(latitude, longitude, km):
+        cells |= Q(grid_cell__range=(first, last))
+    return Profile.objects.filter(cells).values_list("id", "latitude", "longitude")
+
+
+def profiles_within(latitude, longitude, km):
+    """Ids dos perfis a até ``km`` quilômetros do ponto."""
+    candidates = candidate_profiles(latitude, longitude, km)
+    return [
+        profile_id
+        for profile_id, lat, lon in candidates
+        if distance_km(latitude, longitude, lat, lon) <= km
+    ]
@@ -0,0 +1,177 @@
+"""
+Histórico das trocas: eventos só acrescentados e a visão por perfil.
+
+Os serviços chamam ``record_events`` uma vez por transação com todas as
+transições que fizeram: os ExchangeEvent vão num único ``bulk_create`` no
+shard da troca e as linhas de ExchangeHistory (uma por evento para cada
+parte) em outro, no "default". Com um banco só, tudo entra na mesma
+transação; com shards, o histórico é gravado depois do commit do shard, como
+as notificações, e ``rebuild_exchange_history`` o refaz a partir dos eventos.
+"""
+
+import heapq
+from operator import attrgetter
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from library.models import (
+    BookExchange,
+    ExchangeEvent,
+    ExchangeEventType,
+    ExchangeHistory,
+    HistoryRole,
+    Profile,
+    StatusBook,
+)
+from library.sharding import get_shards
+
+HISTORY_PAGE_SIZE = 20
+BATCH_SIZE = 2000
+
+# Evento que explica o status atual de uma troca sem eventos (dados antigos).
+EVENT_FOR_STATUS = {
+    StatusBook.UNAVAILABLE.value: ExchangeEventType.ACCEPTED,
+    StatusBook.AVAILABLE.value: ExchangeEventType.REJECTED,
+    StatusBook.EXPIRED.value: ExchangeEventType.EXPIRED,
+}
+
+EVENT_DESCRIPTIONS = {
+    ExchangeEventType.CREATED: "Solicitação enviada",
+    ExchangeEventType.ACCEPTED: "Solicitação aceita",
+    ExchangeEventType.REJECTED: "Solicitação recusada",
+    ExchangeEventType.CLOSED: "Solicitação encerrada",
+    ExchangeEventType.EXPIRED: "Solicitação expirada",
+}
+
+
+def _event(exchange, event_type, now):
+    return ExchangeEvent(
+        exchange_id=exchange.id,
+        book_id=exchange.book_id,
+        book_title=exchange.book.title,
+        owner_id=exchange.owner_id,
+        requester_id=exchange.requester_id,
+        event=event_type,
+        status=exchange.status,
+        message=exchange.message,
+        created_at=now,
+    )
+
+
+def history_rows(events, names):
+    """Duas linhas de histórico (solicitante e dono) por evento."""
+    for event in events:
+        for profile_id, role, other_id in (
+            (event.requester_id, HistoryRole.SENT, event.owner_id),
+            (event.owner_id, HistoryRole.RECEIVED, event.requester_id),
+        ):
+            yield ExchangeHistory(
+                profile_id=profile_id,
+                role=role,
+                exchange_id=event.exchange_id,
+                book_id=event.book_id,
+                book_title=event.book_title,
+                other_party_id=other_id,
+                other_party_name=names.get(other_id, ""),
+                event=event.event,
+                message=event.message,
+                created_at=event.created_at,
+            )
+
+
+def _names(events):
+    ids = {event.owner_id for event in events}
+    ids |= {event.requester_id for event in events}
+    return dict(
+        Profile.objects.using(DEFAULT_DB_ALIAS)
+        .filter(id__in=ids)
+        .values_list("id", "firstname")
+    )
+
+
+def record_events(using, entries):
+    """
+    Grava ``entries`` (pares ``(troca, ExchangeEventType)``, com ``troca.book``
+    carregado) como eventos no banco ``using`` e atualiza o histórico.
+    """
+    if not entries:
+        return
+    now = timezone.now()
+    events = [_event(exchange, event_type, now) for exchange, event_type in entries]
+    ExchangeEvent.objects.using(using).bulk_create(events)
+
+    if (using or DEFAULT_DB_ALIAS) == DEFAULT_DB_ALIAS:
+        _materialize(events)
+    else:
+        transaction.on_commit(lambda: _materialize(events), using=using)
+
+
+def get_history_page(profile, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Linhas do histórico do perfil, mais recentes primeiro, abaixo do id
+    ``before``; devolve ``(linhas, id para a próxima página ou None)``.
+    """
+    rows = ExchangeHistory.objects.filter(profile=profile)
+    if before:
+        rows = rows.filter(id__lt=before)
+    rows = list(rows.order_by("-id")[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], rows[limit - 1].id
+
+
+def backfill_events(alias):
+    """Eventos para trocas anteriores ao log: criação e o status atual."""
+    missing = (
+        BookExchange.objects.using(alias)
+        .select_related("book")
+        .exclude(id__in=ExchangeEvent.objects.using(alias).values("exchange_id"))
+        .order_by("id")
+    )
+    created = 0
+    batch = []
+    for exchange in missing.iterator(chunk_size=BATCH_SIZE):
+        batch.append(_event(exchange, ExchangeEventType.CREATED, timezone.now()))
+        if exchange.status in EVENT_FOR_STATUS:
+            batch.append(
+                _event(exchange, EVENT_FOR_STATUS[exchange.status], timezone.now())
+            )
+        if len(batch) >= BATCH_SIZE:
+            ExchangeEvent.objects.using(alias).bulk_create(batch)
+            created += len(batch)
+            batch = []
+    ExchangeEvent.objects.using(alias).bulk_create(batch)
+    return created + len(batch)
+
+
+def rebuild_history():
+    """Refaz ExchangeHistory a partir dos eventos de todos os shards."""
+    events = heapq.merge(
+        *(
+            ExchangeEvent.objects.using(alias)
+            .order_by("created_at", "id")
+            .iterator(chunk_size=BATCH_SIZE)
+            for alias in get_shards()
+        ),
+        key=attrgetter("created_at"),
+    )
+    total = 0
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        ExchangeHistory.objects.using(DEFAULT_DB_ALIAS).all().delete()
+        batch = []
+        for event in events:
+            batch.append(event)
+            if len(batch) == BATCH_SIZE:
+                total += _materialize(batch)
+                batch = []
+        total += _materialize(batch)
+    return total
+
+
+def _materialize(events):
+    if not events:
+        return 0
+    rows = list(history_rows(events, _names(events)))
+    ExchangeHistory.objects.using(DEFAULT_DB_ALIAS).bulk_create(rows)
+    return len(rows)
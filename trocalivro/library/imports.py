@@ -0,0 +1,265 @@
+"""
+Importação em lote de catálogos (CSV ou JSON Lines) para um perfil.
+
+O arquivo é lido em streaming, linha a linha, e validado com os campos do
+BookForm (``BookForm.base_fields``) sem montar um formulário por linha. As
+linhas válidas são gravadas com ``bulk_create`` em lotes; cada lote é uma
+transação que também avança o ponto de controle em BookImport (``position``,
+contadores e erros). Se o processo cair, rodar a mesma importação de novo
+(mesmo arquivo, mesmo dono) continua depois da última linha gravada.
+
+As capas (coluna ``cover``, relativa ao diretório de capas) são lidas e
+reduzidas em um ProcessPoolExecutor (library.covers) antes de cada lote.
+Com vários shards, o lote e o ponto de controle ficam em bancos diferentes e
+o commit dos dois não é atômico: uma queda entre eles repete o lote.
+"""
+
+import csv
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from library.changes import record_changes
+from library.covers import CoverError, prepare_cover
+from library.forms import BookForm
+from library.models import (
+    Book,
+    BookImport,
+    ChangeAction,
+    ChangeKind,
+    ImportStatus,
+    StatusBook,
+)
+from library.sharding import allocate_ids, is_sharded, shard_for_owner
+from library.tasks import index_imported_books
+
+FIELDS = ("title", "description", "genre", "author")
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+# Erros guardados em BookImport.errors; o contador ``failed`` conta todos.
+MAX_ERRORS = 100
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_format(path):
+    return "jsonl" if Path(path).suffix.lower() in JSON_LINES_SUFFIXES else "csv"
+
+
+def read_rows(path, format=None):
+    """
+    Gera ``(linha, registro)`` sem carregar o arquivo. A linha conta a partir
+    de 1 (sem o cabeçalho, no CSV); JSON inválido vira um registro None.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as source:
+        if (format or detect_format(path)) == "csv":
+            yield from enumerate(csv.DictReader(source), start=1)
+            return
+        for line, text in enumerate(source, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                yield line, None
+
+
+def resolve_cover(name, covers_dir):
+    """Caminho da capa dentro de ``covers_dir``; recusa caminhos que saem dele."""
+    root = Path(covers_dir).resolve()
+    path = (root / name).resolve()
+    if not path.is_relative_to(root):
+        raise ValidationError(f"capa fora do diretório de capas: {name}")
+    return path
+
+
+def clean_row(row, covers_dir=None):
+    """
+    Valida o registro como o BookForm validaria os campos do livro. Devolve
+    ``(dados, caminho da capa ou None)`` ou levanta ValidationError.
+    """
+    if not isinstance(row, dict):
+        raise ValidationError("registro inválido (esperado um objeto JSON)")
+    data, errors = {}, []
+    for name in FIELDS:
+        value = row.get(name)
+        try:
+            data[name] = BookForm.base_fields[name].clean(
+                value if value is None else str(value)
+            )
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    if errors:
+        raise ValidationError("; ".join(errors))
+
+    # Sem diretório de capas (upload pela página da equipe) a coluna é ignorada.
+    cover = (row.get("cover") or "").strip()
+    return data, resolve_cover(cover, covers_dir) if cover and covers_dir else None
+
+
+def start_import(path, owner, source=None):
+    """BookImport do arquivo para o dono: o mesmo arquivo retoma o anterior."""
+    book_import, created = BookImport.objects.get_or_create(
+        owner=owner,
+        checksum=file_checksum(path),
+        defaults={"source": str(source or path)},
+    )
+    if not created and source and book_import.source != str(source):
+        book_import.source = str(source)
+        book_import.save(update_fields=["source"])
+    return book_import
+
+
+def _cover_error(path, error):
+    """Qualquer falha ao preparar a capa vira erro da linha, não da importação."""
+    if isinstance(error, CoverError):
+        return error
+    return CoverError(f"capa inválida: {Path(path).name} ({error!r})")
+
+
+def _prepare_covers(paths, executor, max_size):
+    """Capas prontas (nome, bytes) ou o CoverError de cada caminho, em ordem."""
+    if executor is None:
+        results = []
+        for path in paths:
+            try:
+                results.append(prepare_cover(path, max_size))
+            except Exception as e:  # noqa: BLE001 - ver _cover_error
+                results.append(_cover_error(path, e))
+        return results
+    futures = [executor.submit(prepare_cover, path, max_size) for path in paths]
+    results = []
+    for path, future in zip(paths, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:  # noqa: BLE001 - ver _cover_error
+            results.append(_cover_error(path, e))
+    return results
+
+
+def _build_books(rows, owner, executor):
+    """Livros do lote e os erros ``[linha, mensagem]`` das capas."""
+    max_size = tuple(getattr(settings, "BOOK_COVER_MAX_SIZE", (600, 900)))
+    with_cover = [(line, data, cover) for line, data, cover in rows if cover]
+    covers = _prepare_covers([cover for _, _, cover in with_cover], executor, max_size)
+    ready = {line: result for (line, _, _), result in zip(with_cover, covers)}
+
+    field = Book._meta.get_field("image")
+    books, errors = [], []
+    for line, data, cover in rows:
+        book = Book(**data, owner=owner, status=StatusBook.AVAILABLE.value)
+        if cover:
+            result = ready[line]
+            if isinstance(result, CoverError):
+                errors.append([line, str(result)])
+                continue
+            name, content = result
+            book.image = field.storage.save(
+                field.generate_filename(book, name), ContentFile(content)
+            )
+        books.append(book)
+    return books, errors
+
+
+def _write_batch(book_import, shard, books, position, errors):
+    """Grava o lote e o ponto de controle; devolve o BookImport atualizado."""
+    with ExitStack() as stack:
+        for alias in dict.fromkeys([shard, DEFAULT_DB_ALIAS]):
+            stack.enter_context(transaction.atomic(using=alias))
+        if books and is_sharded():
+            # bulk_create não dispara o pre_save que reserva ids no shard.
+            for book, pk in zip(books, allocate_ids(Book, shard, len(books))):
+                book.pk = pk
+        Book.objects.using(shard).bulk_create(books)
+        record_changes(shard, ChangeKind.BOOK, ChangeAction.CREATED, books)
+
+        imports = BookImport.objects.using(DEFAULT_DB_ALIAS).select_for_update()
+        book_import = imports.get(pk=book_import.pk)
+        book_import.position = position
+        book_import.imported = F("imported") + len(books)
+        book_import.failed = F("failed") + len(errors)
+        book_import.errors = (book_import.errors + errors)[:MAX_ERRORS]
+        book_import.updated_at = timezone.now()
+        book_import.save(
+            update_fields=["position", "imported", "failed", "errors", "updated_at"]
+        )
+        if books:
+            index_imported_books.enqueue(
+                book_ids=[book.pk for book in books], using=shard
+            )
+    book_import.refresh_from_db(fields=["imported", "failed"])
+    return book_import
+
+
+def _set_status(book_import, status):
+    book_import.status = status
+    book_import.updated_at = timezone.now()
+    book_import.save(update_fields=["status", "updated_at"])
+
+
+def run_import(
+    book_import,
+    *,
+    format=None,
+    covers_dir=None,
+    batch_size=500,
+    workers=0,
+    progress=None,
+):
+    """
+    Importa ``book_import.source`` a partir de ``book_import.position``.
+    ``workers`` processos reduzem as capas (0: no próprio processo);
+    ``progress(book_import)`` é chamado depois de cada lote.
+    """
+    if book_import.status == ImportStatus.DONE:
+        return book_import
+    _set_status(book_import, ImportStatus.RUNNING)
+    owner = book_import.owner
+    shard = shard_for_owner(owner.id)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers else nullcontext()
+
+    try:
+        with pool as executor:
+            rows, errors, position = [], [], book_import.position
+
+            def flush():
+                nonlocal book_import, rows, errors
+                books, cover_errors = _build_books(rows, owner, executor)
+                book_import = _write_batch(
+                    book_import, shard, books, position, sorted(errors + cover_errors)
+                )
+                rows, errors = [], []
+                if progress:
+                    progress(book_import)
+
+            for line, row in read_rows(book_import.source, format):
+                if line <= book_import.position:
+                    continue
+                try:
+                    rows.append((line, *clean_row(row, covers_dir)))
+                except ValidationError as e:
+                    errors.append([line, " ".join(e.messages)])
+                position = line
+                if len(rows) + len(errors) >= batch_size:
+                    flush()
+            if rows or errors or position > book_import.position:
+                flush()
+    except Exception:
+        _set_status(book_import, ImportStatus.FAILED)
+        raise
+    _set_status(book_import, ImportStatus.DONE)
+    return book_import
@@ -0,0 +1,192 @@
+"""
+Fila de tarefas em segundo plano guardada no banco "default".
+
+Tarefas são funções registradas com ``@job``; ``enqueue`` grava a linha só
+depois do commit da transação em curso, para que o worker nunca veja dados
+que ainda podem ser revertidos. O ``manage.py run_worker`` retira os jobs com
+``claim()``, um único ``UPDATE ... RETURNING`` que marca o job mais
+prioritário como em execução, então vários workers nunca pegam o mesmo job.
+Falhas voltam para a fila com espera exponencial e, esgotadas as tentativas,
+ficam com status DEAD. Depois da reserva, as escritas que finalizam o job
+são repetidas até o banco aceitar: um job reservado e não finalizado voltaria
+após JOB_LOCK_TIMEOUT e a tarefa rodaria duas vezes.
+"""
+
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.utils import timezone
+
+from library.models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def job(name=None, priority=0, max_attempts=5):
+    """Registra a função como tarefa; ``func.enqueue(**kwargs)`` agenda."""
+
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        _registry[task_name] = func
+        func.enqueue = partial(
+            enqueue, task_name, priority=priority, max_attempts=max_attempts
+        )
+        return func
+
+    return register
+
+
+def enqueue(name, *, priority=0, max_attempts=5, run_at=None, using=None, **kwargs):
+    """
+    Agenda ``name(**kwargs)`` para depois do commit da transação aberta em
+    ``using`` (ou imediatamente, fora de transação). Os argumentos precisam
+    ser serializáveis em JSON.
+    """
+
+    def insert():
+        Job.objects.using(DEFAULT_DB_ALIAS).create(
+            name=name,
+            kwargs=kwargs,
+            priority=priority,
+            max_attempts=max_attempts,
+            run_at=run_at or timezone.now(),
+        )
+
+    transaction.on_commit(insert, using=using)
+
+
+def _lock_timeout():
+    return timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT", 600))
+
+
+def _persist(operation):
+    """
+    Executa ``operation`` repetindo enquanto o banco recusar (ex.: SQLite
+    bloqueado por outro worker), com espera crescente até
+    JOB_FINALIZE_BACKOFF_MAX segundos. Dentro de um bloco atômico o erro
+    sobe, porque a transação já está perdida.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    ceiling = getattr(settings, "JOB_FINALIZE_BACKOFF_MAX", 5)
+    delay = 0.05
+    while True:
+        try:
+            return operation()
+        except DatabaseError:
+            if connection.in_atomic_block:
+                raise
+            logger.warning("Erro no banco ao gravar job, repetindo.", exc_info=True)
+            connection.close_if_unusable_or_obsolete()
+            time.sleep(delay)
+            delay = min(delay * 2, ceiling)
+
+
+def claim(worker_id):
+    """
+    Marca como RUNNING e devolve o próximo job pronto, ou None.
+
+    Jobs RUNNING há mais de JOB_LOCK_TIMEOUT (worker que morreu no meio)
+    voltam a ser elegíveis.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    adapt = connection.ops.adapt_datetimefield_value
+    now = timezone.now()
+    table = Job._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table}
+               SET status = %s, locked_by = %s, locked_at = %s,
+                   attempts = attempts + 1
+             WHERE id = (
+                SELECT id FROM {table}
+                 WHERE (status = %s AND run_at <= %s)
+                    OR (status = %s AND locked_at < %s)
+                 ORDER BY priority DESC, run_at, id
+                 LIMIT 1
+             )
+            RETURNING id
+            """,
+            [
+                JobStatus.RUNNING.value,
+                worker_id,
+                adapt(now),
+                JobStatus.QUEUED.value,
+                adapt(now),
+                JobStatus.RUNNING.value,
+                adapt(now - _lock_timeout()),
+            ],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return _persist(lambda: Job.objects.using(DEFAULT_DB_ALIAS).get(pk=row[0]))
+
+
+def retry_delay(attempts):
+    """Espera antes da próxima tentativa: exponencial, com teto e jitter."""
+    base = getattr(settings, "JOB_RETRY_BACKOFF", 10)
+    ceiling = getattr(settings, "JOB_RETRY_BACKOFF_MAX", 3600)
+    delay = min(base * 2 ** (attempts - 1), ceiling)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run(claimed):
+    """Executa um job já reservado por claim() e registra o resultado."""
+    jobs = Job.objects.using(DEFAULT_DB_ALIAS).filter(pk=claimed.pk)
+    func = _registry.get(claimed.name)
+    try:
+        if func is None:
+            raise LookupError(f"Tarefa não registrada: {claimed.name}")
+        func(**claimed.kwargs)
+    except Exception:  # noqa: BLE001 - qualquer falha da tarefa conta como tentativa
+        error = traceback.format_exc()
+        if func is None or claimed.attempts >= claimed.max_attempts:
+            logger.error("Job %s descartado:\n%s", claimed, error)
+            _persist(
+                lambda: jobs.update(
+                    status=JobStatus.DEAD, last_error=error, locked_by=""
+                )
+            )
+            return False
+        logger.warning("Job %s falhou, nova tentativa:\n%s", claimed, error)
+        run_at = timezone.now() + retry_delay(claimed.attempts)
+        _persist(
+            lambda: jobs.update(
+                status=JobStatus.QUEUED,
+                run_at=run_at,
+                last_error=error,
+                locked_by="",
+                locked_at=None,
+            )
+        )
+        return False
+    _persist(jobs.delete)
+    return True
+
+
+def run_next(worker_id):
+    """Reserva e executa um job; devolve False se a fila estava vazia."""
+    claimed = claim(worker_id)
+    if claimed is None:
+        return False
+    run(claimed)
+    return True
+
+
+def requeue_dead(name=None):
+    """Devolve jobs DEAD à fila, com as tentativas zeradas."""
+    jobs = Job.objects.using(DEFAULT_DB_ALIAS).filter(status=JobStatus.DEAD)
+    if name:
+        jobs = jobs.filter(name=name)
+    return jobs.update(
+        status=JobStatus.QUEUED, attempts=0, run_at=timezone.now(), locked_at=None
+    )
@@ -0,0 +1,46 @@
+"""
+Trava exclusiva entre processos por arquivo, em qualquer sistema do CI.
+
+No Unix é o ``flock`` do arquivo inteiro; no Windows, ``msvcrt.locking`` do
+primeiro byte, repetido enquanto outro processo o segura (cada tentativa do
+LK_LOCK desiste depois de uns dez segundos).
+"""
+
+import os
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(file):
+        while True:
+            file.seek(0)
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            except OSError:
+                continue
+            return
+
+    def _unlock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(file):
+        fcntl.flock(file, fcntl.LOCK_EX)
+
+    def _unlock(file):
+        fcntl.flock(file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path):
+    """Segura a trava de ``path`` (criado se preciso) durante o bloco."""
+    with open(path, "a") as file:
+        _lock(file)
+        try:
+            yield
+        finally:
+            _unlock(file)
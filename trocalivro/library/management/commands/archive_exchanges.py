@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from library.archive import archive_closed_exchanges
+
+
+class Command(BaseCommand):
+    help = (
+        "Move as trocas encerradas há mais de EXCHANGE_ARCHIVE_AFTER dias "
+        "para o arquivo, em lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Arquiva as encerradas há mais desses dias (padrão: configuração).",
+        )
+        parser.add_argument("--batch-size", type=int)
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        moved = archive_closed_exchanges(
+            older_than=timedelta(days=days) if days is not None else None,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(f"{moved} troca(s) arquivada(s).")
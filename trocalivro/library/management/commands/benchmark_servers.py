@@ -0,0 +1,192 @@
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+HOST = "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a vazão de WSGI (pool de threads) e ASGI (event loop) com "
+        "clientes lentos, chamando os handlers do Django no próprio processo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default="/library/", help="URL requisitada (GET)."
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=200,
+            help="Clientes simultâneos.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Threads do servidor WSGI simulado.",
+        )
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=0.2,
+            help="Segundos que cada cliente leva para receber a resposta.",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=["both", "wsgi", "asgi"],
+            default="both",
+            help="Cada modo roda em um subprocesso com as views correspondentes.",
+        )
+
+    def handle(self, *args, **options):
+        if options["mode"] == "both":
+            for mode in ("wsgi", "asgi"):
+                self._run_subprocess(mode, options)
+            return
+
+        if options["mode"] == "asgi":
+            latencies, errors, elapsed = asyncio.run(self._run_asgi(options))
+        else:
+            latencies, errors, elapsed = self._run_wsgi(options)
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        views = "async" if settings.ASYNC_VIEWS else "sync"
+        self.stdout.write(
+            f"{options['mode']} ({views} views): {len(latencies)} requisições em "
+            f"{elapsed:.2f}s = {len(latencies) / elapsed:.1f} req/s, "
+            f"latência mediana {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p95 {p95 * 1000:.0f} ms, erros {errors}"
+        )
+
+    def _run_subprocess(self, mode, options):
+        env = dict(os.environ, TROCALIVRO_ASYNC_VIEWS="1" if mode == "asgi" else "0")
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [str(settings.BASE_DIR), env.get("PYTHONPATH")])
+        )
+        command = [
+            sys.executable,
+            "-m",
+            "django",
+            "benchmark_servers",
+            f"--settings={os.environ['DJANGO_SETTINGS_MODULE']}",
+            f"--mode={mode}",
+            f"--path={options['path']}",
+            f"--requests={options['requests']}",
+            f"--concurrency={options['concurrency']}",
+            f"--threads={options['threads']}",
+            f"--client-delay={options['client_delay']}",
+        ]
+        result = subprocess.run(
+            command, env=env, capture_output=True, text=True, check=False
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        self.stdout.write(result.stdout.strip())
+
+    def _run_wsgi(self, options):
+        handler = WSGIHandler()
+        url = urlsplit(options["path"])
+        delay = options["client_delay"]
+
+        def request(queued_at):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "SERVER_NAME": HOST,
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": HOST,
+                "wsgi.url_scheme": "http",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": sys.stderr,
+            }
+            statuses = []
+            body = handler(environ, lambda status, headers: statuses.append(status))
+            try:
+                b"".join(body)
+                # A thread fica presa enquanto o cliente lento recebe a resposta.
+                time.sleep(delay)
+            finally:
+                body.close()
+            return time.perf_counter() - queued_at, statuses[0].startswith("200")
+
+        started = time.perf_counter()
+        # Os clientes excedentes esperam na fila do pool, como num servidor real.
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            futures = [
+                pool.submit(request, time.perf_counter())
+                for _ in range(options["requests"])
+            ]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+        return (
+            [latency for latency, _ in results],
+            sum(not ok for _, ok in results),
+            elapsed,
+        )
+
+    async def _run_asgi(self, options):
+        handler = ASGIHandler()
+        url = urlsplit(options["path"])
+        delay = options["client_delay"]
+        slots = asyncio.Semaphore(options["concurrency"])
+
+        async def request():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": url.path,
+                "raw_path": url.path.encode(),
+                "query_string": url.query.encode(),
+                "headers": [(b"host", HOST.encode())],
+                "server": (HOST, 80),
+                "client": ("127.0.0.1", 0),
+            }
+            received = asyncio.Event()
+            statuses = []
+
+            async def receive():
+                if received.is_set():
+                    # Cliente conectado até o fim: nunca envia http.disconnect.
+                    await asyncio.Event().wait()
+                received.set()
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+                elif not message.get("more_body"):
+                    await asyncio.sleep(delay)
+
+            queued_at = time.perf_counter()
+            async with slots:
+                await handler(scope, receive, send)
+            return time.perf_counter() - queued_at, statuses[0] == 200
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request() for _ in range(options["requests"])))
+        elapsed = time.perf_counter() - started
+        return (
+            [latency for latency, _ in results],
+            sum(not ok for _, ok in results),
+            elapsed,
+        )
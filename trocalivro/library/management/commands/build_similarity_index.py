@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from library.tasks import rebuild_similarity_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o índice TF-IDF de livros parecidos e a tabela "
+        "SimilarBook (rodar toda noite pelo cron). Com --enqueue, deixa a "
+        "reconstrução para o worker da fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Agenda a reconstrução na fila em vez de executá-la agora.",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            rebuild_similarity_index.enqueue()
+            self.stdout.write("Reconstrução do índice agendada.")
+            return
+        rows = rebuild_similarity_index()
+        self.stdout.write(f"{rows} par(es) de livros parecidos gravado(s).")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from library.tasks import compute_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as recomendações de livros (rodar toda noite pelo cron). "
+        "Com --enqueue, deixa o cálculo para o worker da fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Agenda o cálculo na fila em vez de executá-lo agora.",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            compute_recommendations.enqueue()
+            self.stdout.write("Cálculo das recomendações agendado.")
+            return
+        rows = compute_recommendations()
+        self.stdout.write(f"{rows} recomendação(ões) gravada(s).")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from library.expiry import expire_stale_requests
+from library.models import Job, JobStatus
+from library.tasks import expire_stale_requests as expire_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Expira as solicitações de troca pendentes há mais de "
+        "EXCHANGE_REQUEST_TTL e devolve os livros à circulação."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help=(
+                "Agenda a varredura periódica na fila (repete a cada "
+                "EXCHANGE_EXPIRY_INTERVAL) em vez de executar agora."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            queued = Job.objects.filter(
+                name="library.expire_stale_requests",
+                status__in=[JobStatus.QUEUED, JobStatus.RUNNING],
+            )
+            if queued.exists():
+                self.stdout.write("A varredura periódica já está agendada.")
+                return
+            expire_job.enqueue(repeat=True)
+            self.stdout.write("Varredura periódica agendada.")
+            return
+
+        expired = expire_stale_requests()
+        self.stdout.write(f"{expired} solicitação(ões) expirada(s).")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from library.cycles import propose_cycles
+
+
+class Command(BaseCommand):
+    help = (
+        "Procura trocas em cadeia (A→B→C→A) nas solicitações pendentes e "
+        "nas listas de desejos e grava as propostas para os participantes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-length",
+            type=int,
+            default=3,
+            help="Quantidade máxima de participantes por ciclo.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=int,
+            default=10000,
+            help="Expansões da busca por vértice inicial (limita o tempo).",
+        )
+
+    def handle(self, *args, **options):
+        cycles = propose_cycles(options["max_length"], options["budget"])
+        books = sum(cycle.legs.count() for cycle in cycles)
+        self.stdout.write(
+            f"{len(cycles)} troca(s) em cadeia proposta(s), {books} livro(s)."
+        )
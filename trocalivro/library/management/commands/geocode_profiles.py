@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from library.middleware import forget_session_users
+from library.models import Profile
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Preenche latitude, longitude e célula da grade dos perfis a partir "
+        "do endereço (tabela de CEPs e cidades embutida, sem rede)."
+    )
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.only("id", "user_id", "address").order_by("id")
+        batch = []
+        located = 0
+        for profile in profiles.iterator(chunk_size=BATCH_SIZE):
+            profile.set_location(profile.address)
+            located += profile.has_location
+            batch.append(profile)
+            if len(batch) == BATCH_SIZE:
+                self._save(batch)
+                batch = []
+        self._save(batch)
+        self.stdout.write(f"{located} perfil(is) localizado(s).")
+
+    def _save(self, batch):
+        Profile.objects.bulk_update(batch, ["latitude", "longitude", "grid_cell"])
+        forget_session_users([profile.user_id for profile in batch])
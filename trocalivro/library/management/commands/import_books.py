@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.imports import run_import, start_import
+from library.models import ImportStatus, Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa um catálogo de livros (CSV ou JSON Lines) para um usuário. "
+        "Rodar de novo com o mesmo arquivo continua de onde parou."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Arquivo .csv, .jsonl ou .ndjson.")
+        parser.add_argument(
+            "--owner", required=True, help="Usuário dono dos livros importados."
+        )
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Formato do arquivo (padrão: pela extensão).",
+        )
+        parser.add_argument(
+            "--covers-dir",
+            help="Diretório das capas da coluna 'cover' (padrão: o do arquivo).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Linhas por lote/transação.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Processos para reduzir as capas (0: no próprio processo).",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["file"]).resolve()
+        if not path.is_file():
+            raise CommandError(f"Arquivo não encontrado: {path}")
+        try:
+            owner = Profile.objects.get(user__username=options["owner"])
+        except Profile.DoesNotExist:
+            raise CommandError(f"Usuário não encontrado: {options['owner']}")
+
+        book_import = start_import(path, owner, source=path)
+        if book_import.status == ImportStatus.DONE:
+            self.stdout.write(f"Importação #{book_import.id} já concluída.")
+            return
+        if book_import.position:
+            self.stdout.write(
+                f"Retomando a importação #{book_import.id} "
+                f"depois da linha {book_import.position}."
+            )
+
+        def progress(current):
+            self.stdout.write(
+                f"linha {current.position}: {current.imported} importado(s), "
+                f"{current.failed} com erro"
+            )
+
+        book_import = run_import(
+            book_import,
+            format=options["format"],
+            covers_dir=options["covers_dir"] or path.parent,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            progress=progress,
+        )
+        for line, message in book_import.errors:
+            self.stderr.write(f"linha {line}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Importação #{book_import.id}: {book_import.imported} livro(s), "
+                f"{book_import.failed} linha(s) com erro."
+            )
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.models import Profile
+from library.sharding import get_shards, move_owner
+
+
+class Command(BaseCommand):
+    help = "Move os livros e trocas de um dono para outro shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile_id", type=int)
+        parser.add_argument("target", choices=get_shards())
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not Profile.objects.filter(pk=options["profile_id"]).exists():
+            raise CommandError("Perfil não encontrado.")
+
+        moved = move_owner(
+            options["profile_id"], options["target"], options["batch_size"]
+        )
+        self.stdout.write(f"{moved} linha(s) copiada(s) para {options['target']}.")
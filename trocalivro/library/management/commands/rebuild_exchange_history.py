@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from library.history import backfill_events, rebuild_history
+from library.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Cria os eventos que faltam para trocas antigas e refaz o histórico "
+        "materializado de cada perfil a partir dos eventos."
+    )
+
+    def handle(self, *args, **options):
+        events = sum(backfill_events(alias) for alias in get_shards())
+        rows = rebuild_history()
+        self.stdout.write(
+            f"{events} evento(s) criado(s); {rows} linha(s) de histórico gravada(s)."
+        )
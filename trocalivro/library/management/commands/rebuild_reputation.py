@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from library.services.rating_service import REPAIR_BATCH_SIZE, rebuild_reputations
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula a soma, a quantidade de notas e a reputação de todos os "
+        "perfis a partir das avaliações de trocas, em lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=REPAIR_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = rebuild_reputations(batch_size=options["batch_size"])
+        self.stdout.write(f"{total} perfil(is) recalculado(s).")
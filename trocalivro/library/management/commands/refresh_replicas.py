@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library.db_routers import refresh_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco primário para as réplicas de leitura (API de backup do SQLite)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Repete a cópia a cada N segundos (0 executa uma vez).",
+        )
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "DATABASE_REPLICAS", []):
+            self.stdout.write("Nenhuma réplica configurada.")
+            return
+
+        while True:
+            refresh_replicas()
+            self.stdout.write(
+                f"{len(settings.DATABASE_REPLICAS)} réplica(s) atualizada(s)."
+            )
+            if options["interval"] <= 0:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from library.jobs import requeue_dead, run_next
+
+logger = logging.getLogger("library.jobs")
+
+
+def work(worker_id, stop, poll_interval, burst):
+    """Laço de um worker: executa jobs até ``stop`` ou, em burst, fila vazia."""
+    try:
+        while not stop.is_set():
+            try:
+                if run_next(worker_id):
+                    continue
+            except DatabaseError:
+                # Banco ocupado por outro worker ao reservar: espera e tenta de
+                # novo. A finalização de um job reservado já repete em run().
+                logger.warning("Worker %s: erro no banco.", worker_id, exc_info=True)
+                stop.wait(poll_interval)
+                continue
+            if burst:
+                return
+            stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def work_in_process(worker_id, stop, poll_interval, burst):
+    # Ctrl+C chega a todo o grupo; quem encerra os filhos é o processo pai.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(worker_id, stop, poll_interval, burst)
+
+
+class Command(BaseCommand):
+    help = "Executa os jobs da fila do banco (library.jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Quantidade de workers (threads ou processos).",
+        )
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Usa processos em vez de threads (tarefas que usam CPU).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Segundos de espera quando a fila está vazia.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Encerra quando a fila esvaziar.",
+        )
+        parser.add_argument(
+            "--requeue-dead",
+            action="store_true",
+            help="Devolve os jobs DEAD à fila e encerra.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"]:
+            count = requeue_dead()
+            self.stdout.write(f"{count} job(s) devolvido(s) à fila.")
+            return
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        worker_args = (options["poll_interval"], options["burst"])
+        if options["processes"]:
+            # Conexões abertas não podem ser herdadas pelos filhos.
+            connections.close_all()
+            stop = multiprocessing.Event()
+            workers = [
+                multiprocessing.Process(
+                    target=work_in_process, args=(f"{prefix}:{n}", stop, *worker_args)
+                )
+                for n in range(options["concurrency"])
+            ]
+        else:
+            stop = threading.Event()
+            workers = [
+                threading.Thread(
+                    target=work, args=(f"{prefix}:{n}", stop, *worker_args)
+                )
+                for n in range(options["concurrency"])
+            ]
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f"{len(workers)} worker(s) em execução"
+            f" ({'processos' if options['processes'] else 'threads'})."
+        )
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrando depois dos jobs em andamento...")
+            stop.set()
+            for worker in workers:
+                worker.join()
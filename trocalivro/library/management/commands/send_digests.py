@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from library.notifications import send_due_digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Envia os e-mails de resumo das trocas cuja janela já terminou "
+        "(o worker da fila também agenda esse envio)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Envia todas as notificações pendentes, sem esperar a janela.",
+        )
+
+    def handle(self, *args, **options):
+        sent = send_due_digests(flush=options["flush"])
+        self.stdout.write(f"{sent} e-mail(s) de resumo enviado(s).")
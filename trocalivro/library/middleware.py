@@ -0,0 +1,218 @@
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from library.db_routers import (
+    pin_to_primary,
+    track_writes,
+    unpin,
+    untrack_writes,
+    wrote_to_primary,
+)
+
+CACHE_KEY_PREFIX = "library:session-user:"
+PINNED_COOKIE = "library_primary"
+# O hash da senha não vai para o cache: o usuário volta com o campo adiado
+# (lido do banco só se alguém o acessar) e a sessão é conferida pelo hash de
+# sessão guardado ao lado, o mesmo que já fica na própria sessão.
+SECRET_USER_FIELDS = frozenset({"password"})
+
+
+def _cache_key(user_id):
+    # Por usuário, não por sessão: um save() do usuário ou do perfil apaga a
+    # entrada de todas as sessões dele de uma vez.
+    return f"{CACHE_KEY_PREFIX}{user_id}"
+
+
+def _cache_timeout():
+    return getattr(settings, "SESSION_USER_CACHE_TIMEOUT", 0)
+
+
+def _values(instance, exclude=frozenset()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def _rebuild(model, values):
+    return model.from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+
+
+def _to_cache(user):
+    profile = getattr(user, "profile", None)
+    return {
+        "user": _values(user, SECRET_USER_FIELDS),
+        "profile": _values(profile) if profile is not None else None,
+        "session_hash": user.get_session_auth_hash(),
+    }
+
+
+def _from_cache(entry):
+    from library.models import Profile
+
+    user = _rebuild(get_user_model(), entry["user"])
+    if entry["profile"] is not None:
+        user.profile = _rebuild(Profile, entry["profile"])
+    return user
+
+
+def _belongs_to_session(entry, session):
+    # Mesmas verificações do auth.get_user, sem consultar o banco.
+    user_id = entry["user"][get_user_model()._meta.pk.attname]
+    return (
+        str(user_id) == str(session.get(auth.SESSION_KEY))
+        and session.get(auth.BACKEND_SESSION_KEY) in settings.AUTHENTICATION_BACKENDS
+        and constant_time_compare(
+            session.get(auth.HASH_SESSION_KEY, ""), entry["session_hash"]
+        )
+    )
+
+
+def get_session_user(request):
+    """Usuário (com perfil) da sessão, reaproveitando o cache quando ativo."""
+    if hasattr(request, "_cached_user"):
+        return request._cached_user
+
+    user_id = request.session.get(auth.SESSION_KEY)
+    key = _cache_key(user_id) if user_id else None
+    timeout = _cache_timeout()
+    entry = cache.get(key) if key and timeout else None
+    if entry is not None and _belongs_to_session(entry, request.session):
+        user = _from_cache(entry)
+    else:
+        user = auth.get_user(request)
+        if key and timeout and user.is_authenticated:
+            cache.set(key, _to_cache(user), timeout)
+
+    request._cached_user = user
+    return user
+
+
+def forget_session_users(user_ids):
+    """Descarta do cache os usuários ``user_ids`` em todas as sessões."""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def forget_profiles(profile_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Descarta os usuários dos perfis alterados sem save() (UPDATE ou
+    bulk_update), que não disparam os sinais abaixo.
+    """
+    from library.models import Profile
+
+    forget_session_users(
+        Profile.objects.using(using)
+        .filter(id__in=list(profile_ids))
+        .values_list("user_id", flat=True)
+    )
+
+
+def invalidate_session_user(request):
+    """Descarta o usuário em cache da sessão (ex.: após editar o perfil)."""
+    user_id = request.session.get(auth.SESSION_KEY)
+    if user_id:
+        forget_session_users([user_id])
+    if hasattr(request, "_cached_user"):
+        del request._cached_user
+
+
+@receiver(user_logged_out)
+def _forget_logged_out_user(sender, request, **kwargs):
+    if request is not None:
+        invalidate_session_user(request)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _forget_saved_user(sender, instance, **kwargs):
+    forget_session_users([instance.pk])
+
+
+@receiver(post_save, sender="library.Profile")
+@receiver(post_delete, sender="library.Profile")
+def _forget_saved_profile(sender, instance, **kwargs):
+    forget_session_users([instance.user_id])
+
+
+class SessionUserMiddleware(AuthenticationMiddleware):
+    """
+    Substitui o AuthenticationMiddleware: o usuário e o perfil vêm de uma
+    única consulta (ProfileBackend) ou do cache por sessão, sem consultas.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_session_user(request))
+        request.auser = partial(sync_to_async(get_session_user), request)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Mantém a sessão lendo do primário por REPLICA_STICKY_SECONDS depois de
+    uma escrita, para que o usuário sempre veja o que acabou de gravar.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, "DATABASE_REPLICAS", []):
+            return self.get_response(request)
+
+        token = pin_to_primary(PINNED_COOKIE in request.COOKIES)
+        writes = track_writes()
+        try:
+            response = self.get_response(request)
+            self._set_pinned_cookie(response)
+        finally:
+            untrack_writes(writes)
+            unpin(token)
+        return response
+
+    async def __acall__(self, request):
+        # Sob ASGI as views assíncronas não precisam de uma thread só por
+        # causa deste middleware; o ContextVar do pin acompanha a tarefa.
+        if not getattr(settings, "DATABASE_REPLICAS", []):
+            return await self.get_response(request)
+
+        token = pin_to_primary(PINNED_COOKIE in request.COOKIES)
+        writes = track_writes()
+        try:
+            response = await self.get_response(request)
+            self._set_pinned_cookie(response)
+        finally:
+            untrack_writes(writes)
+            unpin(token)
+        return response
+
+    def _set_pinned_cookie(self, response):
+        # Só uma escrita desta requisição abre uma nova janela; o cookie
+        # recebido não se renova sozinho.
+        if wrote_to_primary():
+            response.set_cookie(
+                PINNED_COOKIE,
+                "1",
+                max_age=getattr(settings, "REPLICA_STICKY_SECONDS", 30),
+                httponly=True,
+                samesite="Lax",
+            )
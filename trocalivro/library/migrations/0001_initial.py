@@ -0,0 +1,147 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Book",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=255)),
+                ("description", models.TextField()),
+                ("genre", models.CharField(default="", max_length=200, null=True)),
+                (
+                    "image",
+                    models.ImageField(
+                        blank=True,
+                        null=True,
+                        upload_to="trocalivro/library/static/images/",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("AVAILABLE", "AVAILABLE"),
+                            ("IN_EXCHANGE", "IN EXCHANGE"),
+                            ("UNAVAILABLE", "UNAVAILABLE"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("author", models.CharField(max_length=255, null=True)),
+                ("created_at", models.DateField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Profile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("firstname", models.CharField(max_length=255)),
+                ("lastname", models.CharField(max_length=255)),
+                ("email", models.EmailField(default="", max_length=254, null=True)),
+                ("phone_number", models.CharField(default="", max_length=255)),
+                ("reputation", models.IntegerField(default=5)),
+                ("address", models.TextField(default="")),
+                (
+                    "user",
+                    models.OneToOneField(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="profile",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BookExchange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("AVAILABLE", "AVAILABLE"),
+                            ("IN_EXCHANGE", "IN EXCHANGE"),
+                            ("UNAVAILABLE", "UNAVAILABLE"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("message", models.TextField(blank=True, default="")),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="library.book"
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="owned_books",
+                        to="library.profile",
+                    ),
+                ),
+                (
+                    "requester",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="requested_books",
+                        to="library.profile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="library.profile"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="bookexchange",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "IN EXCHANGE")),
+                fields=("book", "requester"),
+                name="unique_pending_exchange_per_requester",
+            ),
+        ),
+    ]
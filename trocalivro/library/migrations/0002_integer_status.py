@@ -0,0 +1,107 @@
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, Max, Value, When
+
+import library.models
+
+BATCH_SIZE = 1000
+
+# Valores gravados antes da migração (tanto o rótulo quanto o nome do Enum).
+TEXT_TO_CODE = {
+    "AVAILABLE": 1,
+    "IN EXCHANGE": 2,
+    "IN_EXCHANGE": 2,
+    "UNAVAILABLE": 3,
+}
+CODE_TO_TEXT = {1: "AVAILABLE", 2: "IN EXCHANGE", 3: "UNAVAILABLE"}
+
+
+def _convert_in_batches(model, using, source, target, mapping, output_field):
+    rows = model.objects.using(using)
+    last_id = rows.aggregate(last=Max("pk"))["last"] or 0
+    conversion = Case(
+        *[When(**{source: old}, then=Value(new)) for old, new in mapping.items()],
+        output_field=output_field,
+    )
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        rows.filter(pk__gte=start, pk__lt=start + BATCH_SIZE).update(
+            **{target: conversion}
+        )
+
+
+def forwards(apps, schema_editor):
+    using = schema_editor.connection.alias
+    for model_name in ("Book", "BookExchange"):
+        model = apps.get_model("library", model_name)
+        _convert_in_batches(
+            model, using, "status", "status_code", TEXT_TO_CODE, IntegerField()
+        )
+
+
+def backwards(apps, schema_editor):
+    using = schema_editor.connection.alias
+    for model_name in ("Book", "BookExchange"):
+        model = apps.get_model("library", model_name)
+        _convert_in_batches(
+            model, using, "status_code", "status", CODE_TO_TEXT, models.CharField()
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="bookexchange",
+            name="unique_pending_exchange_per_requester",
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="status_code",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="bookexchange",
+            name="status_code",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        # Torna a coluna antiga anulável para que a migração possa ser revertida.
+        migrations.AlterField(
+            model_name="book",
+            name="status",
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="status",
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(model_name="book", name="status"),
+        migrations.RemoveField(model_name="bookexchange", name="status"),
+        migrations.RenameField(
+            model_name="book", old_name="status_code", new_name="status"
+        ),
+        migrations.RenameField(
+            model_name="bookexchange", old_name="status_code", new_name="status"
+        ),
+        migrations.AlterField(
+            model_name="book",
+            name="status",
+            field=library.models.StatusField(),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="status",
+            field=library.models.StatusField(),
+        ),
+        migrations.AddConstraint(
+            model_name="bookexchange",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", 2)),
+                fields=("book", "requester"),
+                name="unique_pending_exchange_per_requester",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0002_integer_status"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="book",
+            name="owner",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="library.profile",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="book",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="library.book",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="owner",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="owned_books",
+                to="library.profile",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="requester",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="requested_books",
+                to="library.profile",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["-created_at", "-id"], name="book_recent_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="book_owner_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(
+                fields=["requester", "-id"], name="exchange_requester_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(fields=["owner", "-id"], name="exchange_owner_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(
+                fields=["book", "requester", "status"], name="exchange_pending_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0003_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OwnerShard",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="shard",
+                        serialize=False,
+                        to="library.profile",
+                    ),
+                ),
+                ("shard", models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ShardSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("last_value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="book",
+            name="owner",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="library.profile",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="owner",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="owned_books",
+                to="library.profile",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="bookexchange",
+            name="requester",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="requested_books",
+                to="library.profile",
+            ),
+        ),
+    ]
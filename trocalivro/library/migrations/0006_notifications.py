@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import library.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0005_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Notification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=50)),
+                ("exchange_id", models.BigIntegerField()),
+                ("book_title", models.CharField(max_length=255)),
+                (
+                    "actor_name",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("status", library.models.StatusField()),
+                ("message", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notifications",
+                        to="library.profile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["sent_at", "recipient", "created_at"],
+                        name="notification_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0006_notifications"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="exchange_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="Wishlist",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(blank=True, default="", max_length=255)),
+                ("author", models.CharField(blank=True, default="", max_length=255)),
+                ("genre", models.CharField(blank=True, default="", max_length=200)),
+                ("index_key", models.CharField(editable=False, max_length=80)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="wishlist",
+                        to="library.profile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="WishlistMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("book_id", models.BigIntegerField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "wishlist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches",
+                        to="library.wishlist",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="wishlist",
+            index=models.Index(fields=["index_key"], name="wishlist_index_key_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="wishlistmatch",
+            index=models.Index(fields=["book_id"], name="wishlist_match_book_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="wishlistmatch",
+            constraint=models.UniqueConstraint(
+                fields=("wishlist", "book_id"), name="unique_wishlist_match"
+            ),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0007_wishlists"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeCycle",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, "PROPOSED"), (2, "CONFIRMED"), (3, "CANCELLED")],
+                        default=1,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["status", "-id"], name="cycle_status_idx")
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ExchangeCycleLeg",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.PositiveSmallIntegerField()),
+                ("book_id", models.BigIntegerField()),
+                ("book_title", models.CharField(max_length=255)),
+                ("exchange_id", models.BigIntegerField(blank=True, null=True)),
+                ("confirmed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "cycle",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="legs",
+                        to="library.exchangecycle",
+                    ),
+                ),
+                (
+                    "giver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cycle_legs_given",
+                        to="library.profile",
+                    ),
+                ),
+                (
+                    "receiver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cycle_legs_received",
+                        to="library.profile",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["cycle", "position"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="exchangecycleleg",
+            constraint=models.UniqueConstraint(
+                fields=("cycle", "position"), name="unique_cycle_position"
+            ),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0008_exchange_cycles"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("recommended_id", models.BigIntegerField()),
+                ("score", models.FloatField()),
+                ("title", models.CharField(max_length=255)),
+                ("author", models.CharField(default="", max_length=255)),
+                ("image", models.CharField(default="", max_length=255)),
+                ("book_id", models.BigIntegerField()),
+            ],
+            options={
+                "ordering": ["rank"],
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ProfileRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("recommended_id", models.BigIntegerField()),
+                ("score", models.FloatField()),
+                ("title", models.CharField(max_length=255)),
+                ("author", models.CharField(default="", max_length=255)),
+                ("image", models.CharField(default="", max_length=255)),
+            ],
+            options={
+                "ordering": ["rank"],
+                "abstract": False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="bookrecommendation",
+            constraint=models.UniqueConstraint(
+                fields=("book_id", "rank"), name="unique_book_recommendation"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilerecommendation",
+            name="profile",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="library.profile",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="profilerecommendation",
+            constraint=models.UniqueConstraint(
+                fields=("profile", "rank"), name="unique_profile_recommendation"
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0009_recommendations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarBook",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("recommended_id", models.BigIntegerField()),
+                ("score", models.FloatField()),
+                ("title", models.CharField(max_length=255)),
+                ("author", models.CharField(default="", max_length=255)),
+                ("image", models.CharField(default="", max_length=255)),
+                ("book_id", models.BigIntegerField()),
+            ],
+            options={
+                "ordering": ["rank"],
+                "abstract": False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="similarbook",
+            constraint=models.UniqueConstraint(
+                fields=("book_id", "rank"), name="unique_similar_book"
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0011_profile_location"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookImport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=500)),
+                ("checksum", models.CharField(max_length=64)),
+                (
+                    "status",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (1, "QUEUED"),
+                            (2, "RUNNING"),
+                            (3, "DONE"),
+                            (4, "FAILED"),
+                        ],
+                        default=1,
+                    ),
+                ),
+                ("position", models.PositiveIntegerField(default=0)),
+                ("imported", models.PositiveIntegerField(default=0)),
+                ("failed", models.PositiveIntegerField(default=0)),
+                ("errors", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="library.profile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="bookimport",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "checksum"), name="unique_book_import"
+            ),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import library.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0013_change_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("exchange_id", models.BigIntegerField()),
+                ("book_id", models.BigIntegerField()),
+                ("book_title", models.CharField(max_length=255)),
+                ("owner_id", models.BigIntegerField()),
+                ("requester_id", models.BigIntegerField()),
+                (
+                    "event",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (1, "created"),
+                            (2, "accepted"),
+                            (3, "rejected"),
+                            (4, "closed"),
+                            (5, "expired"),
+                        ]
+                    ),
+                ),
+                ("status", library.models.StatusField()),
+                ("message", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["exchange_id", "id"], name="exchange_event_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ExchangeHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, "sent"), (2, "received")]
+                    ),
+                ),
+                ("exchange_id", models.BigIntegerField()),
+                ("book_id", models.BigIntegerField()),
+                ("book_title", models.CharField(max_length=255)),
+                ("other_party_id", models.BigIntegerField()),
+                (
+                    "other_party_name",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                (
+                    "event",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (1, "created"),
+                            (2, "accepted"),
+                            (3, "rejected"),
+                            (4, "closed"),
+                            (5, "expired"),
+                        ]
+                    ),
+                ),
+                ("message", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="library.profile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["profile", "-id"], name="exchange_history_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0014_exchange_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="profile",
+            name="reputation",
+            field=models.FloatField(default=5),
+        ),
+        migrations.CreateModel(
+            name="ExchangeRating",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("exchange_id", models.BigIntegerField()),
+                ("score", models.PositiveSmallIntegerField()),
+                ("comment", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "rated",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ratings_received",
+                        to="library.profile",
+                    ),
+                ),
+                (
+                    "rater",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ratings_given",
+                        to="library.profile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="exchangerating",
+            constraint=models.UniqueConstraint(
+                fields=("exchange_id", "rater"), name="unique_exchange_rating"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="exchangerating",
+            constraint=models.CheckConstraint(
+                check=models.Q(("score__gte", 1), ("score__lte", 5)),
+                name="exchange_rating_score_range",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0015_exchange_rating"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookexchange",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(
+                condition=models.Q(("status", 2)),
+                fields=["created_at", "id"],
+                name="exchange_pending_age_idx",
+            ),
+        ),
+    ]
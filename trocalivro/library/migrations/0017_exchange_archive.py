@@ -0,0 +1,92 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+import library.models
+
+
+def close_answered_exchanges(apps, schema_editor):
+    # Trocas já respondidas (status diferente de IN EXCHANGE) antes da coluna:
+    # usa a criação como encerramento.
+    BookExchange = apps.get_model("library", "BookExchange")
+    BookExchange.objects.using(schema_editor.connection.alias).exclude(status=2).update(
+        closed_at=F("created_at")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0016_exchange_expiry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedExchange",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("book_id", models.BigIntegerField()),
+                ("book_title", models.CharField(max_length=255)),
+                (
+                    "book_author",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("status", library.models.StatusField()),
+                ("message", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField()),
+                ("closed_at", models.DateTimeField()),
+                (
+                    "archived_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="bookexchange",
+            name="closed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(
+                condition=models.Q(("closed_at__isnull", False)),
+                fields=["closed_at", "id"],
+                name="exchange_closed_idx",
+            ),
+        ),
+        migrations.RunPython(close_answered_exchanges, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="archivedexchange",
+            name="owner",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="archived_received",
+                to="library.profile",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedexchange",
+            name="requester",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="archived_requests",
+                to="library.profile",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedexchange",
+            index=models.Index(
+                fields=["requester", "-id"], name="archived_requester_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedexchange",
+            index=models.Index(fields=["owner", "-id"], name="archived_owner_idx"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0017_exchange_archive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(
+                fields=["requester", "status", "-id"], name="exchange_requester_tab_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookexchange",
+            index=models.Index(
+                fields=["owner", "status", "-id"], name="exchange_owner_tab_idx"
+            ),
+        ),
+    ]
@@ -1,19 +1,133 @@
-from django.db import models
-from django.utils import timezone
 from django.contrib.auth.models import User
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from enum import Enum
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+# O status é gravado como inteiro; os rótulos mantêm os textos em maiúsculo
+# usados no frontend ("IN EXCHANGE", ...).
+class StatusBook(models.IntegerChoices):
+    AVAILABLE = 1, "AVAILABLE"
+    IN_EXCHANGE = 2, "IN EXCHANGE"
+    UNAVAILABLE = 3, "UNAVAILABLE"
+    # Só para trocas: solicitação sem resposta dentro do prazo (library.expiry).
+    EXPIRED = 4, "EXPIRED"
+
+    @classmethod
+    def coerce(cls, value):
+        """Converte nomes ou rótulos antigos ("IN EXCHANGE") para o código inteiro."""
+        if value is None or isinstance(value, int):
+            return value
+        text = str(value).strip()
+        if text.isdigit():
+            return int(text)
+        for member in cls:
+            if text in (member.name, member.label):
+                return member.value
+        raise ValueError(f"Status de livro inválido: {value!r}")
+
+
+class StatusDescriptor(DeferredAttribute):
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = StatusBook.coerce(value)
+
+
+class StatusField(models.PositiveSmallIntegerField):
+    """Status compacto que ainda aceita os valores em texto do StatusBook."""
+
+    descriptor_class = StatusDescriptor
+
+    def __init__(self, *args, **kwargs):
+        kwargs["choices"] = StatusBook.choices
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        del kwargs["choices"]
+        return name, path, args, kwargs
+
+    def to_python(self, value):
+        try:
+            return StatusBook.coerce(value)
+        except ValueError:
+            return super().to_python(value)
+
+    def get_prep_value(self, value):
+        return super().get_prep_value(self.to_python(value))
+
 
+class DirtyFieldsMixin:
+    """
+    Rastreia os campos alterados desde a leitura do banco.
 
-# Modificado valores do Enum para maiusculo para casar com as informações no frontend
-class StatusBook(Enum):
-    AVAILABLE = "AVAILABLE"
-    IN_EXCHANGE = "IN EXCHANGE"
-    UNAVAILABLE = "UNAVAILABLE"
+    Em instâncias já persistidas, save() sem update_fields grava apenas as
+    colunas alteradas e não emite UPDATE quando nada mudou.
+    """
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._tracked_values()
+        return instance
 
-class Profile(models.Model):
+    def _tracked_values(self):
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                if isinstance(field, models.FileField):
+                    value = getattr(value, "name", value)
+                values[field.attname] = value
+        return values
+
+    def get_dirty_fields(self):
+        """Nomes dos campos alterados, ou None se a instância não veio do banco."""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None or self._state.adding:
+            return None
+        return {
+            name
+            for name, value in self._tracked_values().items()
+            if name not in loaded or loaded[name] != value
+        }
+
+    def _mark_clean(self, attnames=None):
+        current = self._tracked_values()
+        if attnames is None or not hasattr(self, "_loaded_values"):
+            self._loaded_values = current
+        else:
+            for name in attnames:
+                if name in current:
+                    self._loaded_values[name] = current[name]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if not args and update_fields is None and not kwargs.get("force_insert"):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                kwargs["update_fields"] = update_fields = dirty
+        super().save(*args, **kwargs)
+        if update_fields is None:
+            self._mark_clean()
+        else:
+            self._mark_clean(
+                {self._meta.get_field(name).attname for name in update_fields}
+            )
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None:
+            self._mark_clean()
+        else:
+            self._mark_clean({self._meta.get_field(name).attname for name in fields})
+
+
+class Profile(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(
         User, related_name="profile", on_delete=models.CASCADE, null=True
     )
@@ -21,8 +135,51 @@ class Profile(models.Model):
     lastname = models.CharField(max_length=255)
     email = models.EmailField(default="", null=True)
     phone_number = models.CharField(max_length=255, default="")
-    reputation = models.IntegerField(default=5)
+    # Média bayesiana das notas recebidas (library.services.rating_service),
+    # mantida a cada avaliação junto com a soma e a quantidade de notas.
+    reputation = models.FloatField(default=5)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     address = models.TextField(default="")
+    # Centro da cidade do endereço (library.geo), sem geocodificação online.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    grid_cell = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["grid_cell"], name="profile_grid_cell_idx")]
+
+    def save(self, *args, **kwargs):
+        changed = self.get_dirty_fields()
+        update_fields = kwargs.get("update_fields")
+        if (
+            changed is None
+            or "address" in changed
+            or (update_fields is not None and "address" in update_fields)
+        ):
+            self.set_location(self.address)
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "latitude",
+                    "longitude",
+                    "grid_cell",
+                }
+        super().save(*args, **kwargs)
+
+    def set_location(self, address):
+        from library.geo import geocode, grid_cell
+
+        point = geocode(address)
+        if point is None:
+            self.latitude = self.longitude = self.grid_cell = None
+        else:
+            self.latitude, self.longitude = point
+            self.grid_cell = grid_cell(*point)
+
+    @property
+    def has_location(self):
+        return self.grid_cell is not None
 
     @receiver(post_save, sender=User)
     def create_user_profile(sender, instance, created, **kwargs):
@@ -31,39 +188,101 @@ class Profile(models.Model):
 
     @receiver(post_save, sender=User)
     def save_user_profile(sender, instance, **kwargs):
-        instance.profile.save()
+        # Só grava o perfil se ele foi carregado (e portanto pode ter sido
+        # alterado) junto com o usuário; o save() ignora perfis sem mudanças.
+        if User.profile.is_cached(instance):
+            instance.profile.save()
 
 
-class Book(models.Model):
+class Book(DirtyFieldsMixin, models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     genre = models.CharField(max_length=200, default="", null=True)
     image = models.ImageField(
         upload_to="trocalivro/library/static/images/", blank=True, null=True
     )
-    status = models.CharField(
-        max_length=20, choices=[(tag.name, tag.value) for tag in StatusBook]
-    )
+    status = StatusField()
     # Adicionado campo de autor no banco de dados.
     author = models.CharField(max_length=255, null=True)
     created_at = models.DateField(default=timezone.now)
-    owner = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    # Coberto pelo índice composto book_owner_recent_idx. Sem FK no banco
+    # porque, com vários shards, o perfil fica em outro banco (library.sharding).
+    owner = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, db_index=False, db_constraint=False
+    )
+
+    class Meta:
+        indexes = [
+            # Feed da página inicial e listagem "Meus livros", mais recentes primeiro.
+            models.Index(fields=["-created_at", "-id"], name="book_recent_idx"),
+            models.Index(
+                fields=["owner", "-created_at", "-id"], name="book_owner_recent_idx"
+            ),
+        ]
 
 
 # Tabela que irá armazenar as informações das trocas entre os usuários.
-class BookExchange(models.Model):
+class BookExchange(DirtyFieldsMixin, models.Model):
     # Basicamente uma tabela com chaves estrangeiras que será usada para consultar as interações entre os usuários
-    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    # Chaves cobertas pelos índices compostos declarados em Meta. Os perfis
+    # podem estar em outro banco que o shard da troca (library.sharding).
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, db_index=False)
     requester = models.ForeignKey(
-        Profile, related_name="requested_books", on_delete=models.CASCADE
+        Profile,
+        related_name="requested_books",
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
     )
     owner = models.ForeignKey(
-        Profile, related_name="owned_books", on_delete=models.CASCADE
-    )
-    status = models.CharField(
-        max_length=20, choices=[(tag.name, tag.value) for tag in StatusBook]
+        Profile,
+        related_name="owned_books",
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
     )
+    status = StatusField()
     message = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    # Quando a troca foi respondida ou expirou; vazio enquanto pendente.
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Caixas de solicitações enviadas e recebidas, ordenadas por -id.
+            models.Index(fields=["requester", "-id"], name="exchange_requester_idx"),
+            models.Index(fields=["owner", "-id"], name="exchange_owner_idx"),
+            # Abas por status das caixas e suas contagens (cobrem o COUNT).
+            models.Index(
+                fields=["requester", "status", "-id"], name="exchange_requester_tab_idx"
+            ),
+            models.Index(
+                fields=["owner", "status", "-id"], name="exchange_owner_tab_idx"
+            ),
+            models.Index(
+                fields=["book", "requester", "status"], name="exchange_pending_idx"
+            ),
+            # Só as pendentes, pela idade: a varredura de expiração lê uma faixa.
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(status=StatusBook.IN_EXCHANGE.value),
+                name="exchange_pending_age_idx",
+            ),
+            # Só as encerradas, pela data: o arquivamento lê uma faixa.
+            models.Index(
+                fields=["closed_at", "id"],
+                condition=models.Q(closed_at__isnull=False),
+                name="exchange_closed_idx",
+            ),
+        ]
+        constraints = [
+            # Garante no banco uma única solicitação pendente por livro e solicitante.
+            models.UniqueConstraint(
+                fields=["book", "requester"],
+                condition=models.Q(status=StatusBook.IN_EXCHANGE.value),
+                name="unique_pending_exchange_per_requester",
+            )
+        ]
 
     def save(self, *args, **kwargs):
         # Atualiza o status do livro com base no status da troca
@@ -76,3 +295,413 @@ class BookExchange(models.Model):
                 self.book.status = self.status
                 self.book.save()
         super().save(*args, **kwargs)
+
+
+# Trocas encerradas há mais de EXCHANGE_ARCHIVE_AFTER, movidas de BookExchange
+# por library.archive para manter a tabela quente (e seus índices) pequena.
+# Fica no mesmo shard da troca, com o mesmo id; título e autor do livro são
+# copiados porque o livro pode ser excluído depois.
+class ArchivedExchange(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    book_id = models.BigIntegerField()
+    book_title = models.CharField(max_length=255)
+    book_author = models.CharField(max_length=255, blank=True, default="")
+    requester = models.ForeignKey(
+        Profile,
+        related_name="archived_requests",
+        on_delete=models.DO_NOTHING,
+        db_index=False,
+        db_constraint=False,
+    )
+    owner = models.ForeignKey(
+        Profile,
+        related_name="archived_received",
+        on_delete=models.DO_NOTHING,
+        db_index=False,
+        db_constraint=False,
+    )
+    status = StatusField()
+    message = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField()
+    closed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["requester", "-id"], name="archived_requester_idx"),
+            models.Index(fields=["owner", "-id"], name="archived_owner_idx"),
+        ]
+
+    @cached_property
+    def book(self):
+        """Livro como era na troca (sem a capa), para exibir como as trocas quentes."""
+        return Book(
+            id=self.book_id,
+            title=self.book_title,
+            author=self.book_author,
+            owner_id=self.owner_id,
+        )
+
+
+# Mapa de shards: em qual banco ficam os livros e trocas de cada dono.
+class OwnerShard(models.Model):
+    profile = models.OneToOneField(
+        Profile, primary_key=True, related_name="shard", on_delete=models.CASCADE
+    )
+    shard = models.CharField(max_length=64)
+
+
+# Sequência de ids por shard, usada quando há mais de um shard.
+class ShardSequence(models.Model):
+    name = models.CharField(max_length=64, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+
+class JobStatus(models.IntegerChoices):
+    QUEUED = 1, "QUEUED"
+    RUNNING = 2, "RUNNING"
+    # Esgotou as tentativas; fica na tabela para inspeção (dead letter).
+    # Jobs concluídos são apagados.
+    DEAD = 3, "DEAD"
+
+
+# Fila de tarefas em segundo plano (library.jobs), consumida por run_worker.
+class Job(models.Model):
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    # Maior prioridade sai primeiro.
+    priority = models.SmallIntegerField(default=0)
+    status = models.PositiveSmallIntegerField(
+        choices=JobStatus.choices, default=JobStatus.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Ordem exata da busca do próximo job em library.jobs.claim().
+            models.Index(
+                fields=["status", "-priority", "run_at", "id"], name="job_ready_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+
+# Notificação de troca aguardando o próximo e-mail de resumo do destinatário
+# (library.notifications). A troca é guardada só pelo id porque pode estar
+# em outro shard.
+class Notification(models.Model):
+    recipient = models.ForeignKey(
+        Profile, related_name="notifications", on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=50)
+    # Vazio nas notificações que não vêm de uma troca (ex.: lista de desejos).
+    exchange_id = models.BigIntegerField(null=True, blank=True)
+    book_title = models.CharField(max_length=255)
+    actor_name = models.CharField(max_length=255, blank=True, default="")
+    status = StatusField()
+    message = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Pendentes por destinatário, na ordem do e-mail de resumo.
+            models.Index(
+                fields=["sent_at", "recipient", "created_at"],
+                name="notification_pending_idx",
+            ),
+        ]
+
+
+# Livro procurado por um perfil. Campos vazios aceitam qualquer valor; os
+# preenchidos precisam ter todas as suas palavras no campo do livro.
+class Wishlist(models.Model):
+    profile = models.ForeignKey(
+        Profile, related_name="wishlist", on_delete=models.CASCADE
+    )
+    title = models.CharField(max_length=255, blank=True, default="")
+    author = models.CharField(max_length=255, blank=True, default="")
+    genre = models.CharField(max_length=200, blank=True, default="")
+    # Palavra mais seletiva do pedido ("t:casmurro"), usada pelo índice
+    # invertido de library.wishlists para achar candidatos sem varrer a tabela.
+    index_key = models.CharField(max_length=80, editable=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["index_key"], name="wishlist_index_key_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        from library.wishlists import index_key_for
+
+        self.index_key = index_key_for(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "index_key"}
+        super().save(*args, **kwargs)
+
+
+# Livro cadastrado que atende a um pedido da lista de desejos. O livro é
+# guardado só pelo id porque pode estar em outro shard.
+class WishlistMatch(models.Model):
+    wishlist = models.ForeignKey(
+        Wishlist, related_name="matches", on_delete=models.CASCADE
+    )
+    book_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["book_id"], name="wishlist_match_book_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wishlist", "book_id"], name="unique_wishlist_match"
+            )
+        ]
+
+
+class CycleStatus(models.IntegerChoices):
+    PROPOSED = 1, "PROPOSED"
+    CONFIRMED = 2, "CONFIRMED"
+    CANCELLED = 3, "CANCELLED"
+
+
+# Troca em cadeia proposta por library.cycles: cada participante recebe o
+# livro do seguinte (A→B→C→A). As trocas só são criadas quando todos
+# confirmam.
+class ExchangeCycle(models.Model):
+    status = models.PositiveSmallIntegerField(
+        choices=CycleStatus.choices, default=CycleStatus.PROPOSED
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "-id"], name="cycle_status_idx")]
+
+
+class ExchangeCycleLeg(models.Model):
+    cycle = models.ForeignKey(
+        ExchangeCycle, related_name="legs", on_delete=models.CASCADE
+    )
+    position = models.PositiveSmallIntegerField()
+    receiver = models.ForeignKey(
+        Profile, related_name="cycle_legs_received", on_delete=models.CASCADE
+    )
+    giver = models.ForeignKey(
+        Profile, related_name="cycle_legs_given", on_delete=models.CASCADE
+    )
+    # Livro e troca pelo id: podem estar em outro shard.
+    book_id = models.BigIntegerField()
+    book_title = models.CharField(max_length=255)
+    exchange_id = models.BigIntegerField(null=True, blank=True)
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["cycle", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cycle", "position"], name="unique_cycle_position"
+            )
+        ]
+
+
+# "Você também pode gostar": vizinhos mais próximos de cada livro e sugestões
+# por perfil, recalculados todas as noites (library.recommendations). Título,
+# autor e capa vêm copiados para a página ler tudo numa única consulta pelo
+# índice, sem ir aos shards dos livros.
+class Recommendation(models.Model):
+    rank = models.PositiveSmallIntegerField()
+    recommended_id = models.BigIntegerField()
+    score = models.FloatField()
+    title = models.CharField(max_length=255)
+    author = models.CharField(max_length=255, default="")
+    image = models.CharField(max_length=255, default="")
+
+    class Meta:
+        abstract = True
+        ordering = ["rank"]
+
+
+class BookRecommendation(Recommendation):
+    book_id = models.BigIntegerField()
+
+    class Meta(Recommendation.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book_id", "rank"], name="unique_book_recommendation"
+            )
+        ]
+
+
+class ProfileRecommendation(Recommendation):
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, db_index=False)
+
+    class Meta(Recommendation.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "rank"], name="unique_profile_recommendation"
+            )
+        ]
+
+
+# Livros parecidos pelo texto (TF-IDF de título, autor, gênero e descrição),
+# calculados por library.similarity.
+class SimilarBook(Recommendation):
+    book_id = models.BigIntegerField()
+
+    class Meta(Recommendation.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book_id", "rank"], name="unique_similar_book"
+            )
+        ]
+
+
+class ImportStatus(models.IntegerChoices):
+    QUEUED = 1, "QUEUED"
+    RUNNING = 2, "RUNNING"
+    DONE = 3, "DONE"
+    FAILED = 4, "FAILED"
+
+
+# Importação em lote de um catálogo (library.imports). ``position`` é a última
+# linha do arquivo já gravada: repetir a importação continua dali.
+class BookImport(models.Model):
+    owner = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    source = models.CharField(max_length=500)
+    # sha256 do arquivo: o mesmo arquivo para o mesmo dono retoma a importação.
+    checksum = models.CharField(max_length=64)
+    status = models.PositiveSmallIntegerField(
+        choices=ImportStatus.choices, default=ImportStatus.QUEUED
+    )
+    position = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # Primeiros erros por linha: [[linha, mensagem], ...].
+    errors = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "checksum"], name="unique_book_import"
+            )
+        ]
+
+
+class ChangeKind(models.IntegerChoices):
+    BOOK = 1, "book"
+    EXCHANGE = 2, "exchange"
+
+
+class ChangeAction(models.IntegerChoices):
+    CREATED = 1, "created"
+    UPDATED = 2, "updated"
+    DELETED = 3, "deleted"
+
+
+# Registro de alterações para a sincronização incremental (library.changes).
+# Fica no mesmo banco (shard) do livro ou da troca e é gravado na mesma
+# transação; o id é a sequência monotônica de alterações daquele banco.
+class ChangeLog(models.Model):
+    kind = models.PositiveSmallIntegerField(choices=ChangeKind.choices)
+    action = models.PositiveSmallIntegerField(choices=ChangeAction.choices)
+    object_id = models.BigIntegerField()
+    # Sem FK: os perfis ficam no "default". Dono do livro (ou da troca) e,
+    # nas trocas, o solicitante, para filtrar as trocas de quem sincroniza.
+    owner_id = models.BigIntegerField()
+    requester_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+
+class ExchangeEventType(models.IntegerChoices):
+    CREATED = 1, "created"
+    ACCEPTED = 2, "accepted"
+    REJECTED = 3, "rejected"
+    CLOSED = 4, "closed"
+    EXPIRED = 5, "expired"
+
+
+# Transições de cada troca, só acrescentadas (library.history). Ficam no shard
+# da troca e são gravadas na mesma transação; guardam a mensagem de cada
+# resposta, que o BookExchange sobrescreve. ``exchange_id`` é um inteiro
+# solto (e o título é copiado) para o evento sobreviver à exclusão da troca.
+class ExchangeEvent(models.Model):
+    exchange_id = models.BigIntegerField()
+    book_id = models.BigIntegerField()
+    book_title = models.CharField(max_length=255)
+    owner_id = models.BigIntegerField()
+    requester_id = models.BigIntegerField()
+    event = models.PositiveSmallIntegerField(choices=ExchangeEventType.choices)
+    status = StatusField()
+    message = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["exchange_id", "id"], name="exchange_event_idx"),
+        ]
+
+
+class HistoryRole(models.IntegerChoices):
+    SENT = 1, "sent"
+    RECEIVED = 2, "received"
+
+
+# Histórico materializado por perfil: uma linha por evento para cada parte da
+# troca, já com o que a página mostra. A página lê uma faixa contígua do
+# índice (profile, -id), sem reconstruir o estado das trocas.
+class ExchangeHistory(models.Model):
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, db_index=False)
+    role = models.PositiveSmallIntegerField(choices=HistoryRole.choices)
+    exchange_id = models.BigIntegerField()
+    book_id = models.BigIntegerField()
+    book_title = models.CharField(max_length=255)
+    other_party_id = models.BigIntegerField()
+    other_party_name = models.CharField(max_length=255, blank=True, default="")
+    event = models.PositiveSmallIntegerField(choices=ExchangeEventType.choices)
+    message = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["profile", "-id"], name="exchange_history_idx"),
+        ]
+
+
+# Nota dada por uma das partes à outra depois de uma troca aceita. Fica no
+# "default", junto dos perfis, para gravar a nota e a reputação na mesma
+# transação; a troca é referenciada só pelo id (ela pode estar em um shard).
+class ExchangeRating(models.Model):
+    exchange_id = models.BigIntegerField()
+    rater = models.ForeignKey(
+        Profile, related_name="ratings_given", on_delete=models.CASCADE
+    )
+    rated = models.ForeignKey(
+        Profile, related_name="ratings_received", on_delete=models.CASCADE
+    )
+    score = models.PositiveSmallIntegerField()
+    comment = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["exchange_id", "rater"], name="unique_exchange_rating"
+            ),
+            models.CheckConstraint(
+                check=models.Q(score__gte=1, score__lte=5),
+                name="exchange_rating_score_range",
+            ),
+        ]
@@ -0,0 +1,141 @@
+"""
+Notificações de troca por e-mail, agrupadas em resumos por destinatário.
+
+Cada evento de troca vira uma linha de Notification depois do commit. A
+primeira notificação pendente de um perfil agenda na fila (library.jobs) o
+envio dos resumos para daqui a NOTIFICATION_DIGEST_WINDOW segundos; até lá,
+os eventos seguintes entram no mesmo e-mail. Os e-mails de um lote saem por
+uma única conexão (get_connection + send_messages).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Min
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from library.jobs import job
+from library.models import Notification, StatusBook
+
+
+def _window():
+    return timedelta(seconds=getattr(settings, "NOTIFICATION_DIGEST_WINDOW", 900))
+
+
+def notify_exchange(kind, exchange, actor_name="", using=None):
+    """
+    Registra a notificação para a outra parte da troca depois do commit:
+    o dono recebe as novas solicitações e o solicitante, as respostas.
+    """
+    if kind == "exchange.created":
+        recipient_id = exchange.owner_id
+    else:
+        recipient_id = exchange.requester_id
+    notification = Notification(
+        recipient_id=recipient_id,
+        kind=kind,
+        exchange_id=exchange.id,
+        book_title=exchange.book.title,
+        actor_name=actor_name,
+        status=exchange.status,
+        message=exchange.message,
+    )
+    transaction.on_commit(lambda: _record(notification), using=using)
+
+
+def _record(notification):
+    pending = Notification.objects.using(DEFAULT_DB_ALIAS).filter(
+        recipient_id=notification.recipient_id, sent_at__isnull=True
+    )
+    first_pending = not pending.exists()
+    notification.created_at = timezone.now()
+    notification.save(using=DEFAULT_DB_ALIAS)
+    if first_pending:
+        # Um envio por janela; notificações que chegarem até lá vão juntas.
+        send_due_digests.enqueue(run_at=notification.created_at + _window())
+
+
+def notify_wishlist_matches(matches, book):
+    """Avisa os donos dos pedidos atendidos por um livro novo."""
+    if not matches:
+        return
+    now = timezone.now()
+    Notification.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [
+            Notification(
+                recipient_id=match.wishlist.profile_id,
+                kind="wishlist.match",
+                book_title=book.title,
+                actor_name=book.author or "",
+                status=StatusBook.AVAILABLE.value,
+                created_at=now,
+            )
+            for match in matches
+        ]
+    )
+    # Um único envio agendado atende todos os destinatários do lote.
+    send_due_digests.enqueue(run_at=now + _window())
+
+
+def build_digest(recipient, notifications):
+    count = len(notifications)
+    subject = (
+        "trocalivro: 1 novidade nas suas trocas"
+        if count == 1
+        else f"trocalivro: {count} novidades nas suas trocas"
+    )
+    body = render_to_string(
+        "emails/exchange_digest.txt",
+        {"profile": recipient, "notifications": notifications},
+    )
+    return EmailMessage(subject, body, to=[recipient.email])
+
+
+@job(name="library.send_due_digests", priority=-1)
+def send_due_digests(now=None, flush=False):
+    """
+    Envia um resumo para cada perfil cuja notificação pendente mais antiga
+    já passou da janela (ou para todos, com ``flush``). Devolve quantos
+    e-mails foram enviados.
+    """
+    now = now or timezone.now()
+    pending = Notification.objects.using(DEFAULT_DB_ALIAS).filter(sent_at__isnull=True)
+    due = pending.values("recipient").annotate(oldest=Min("created_at"))
+    if not flush:
+        due = due.filter(oldest__lte=now - _window())
+    recipient_ids = [row["recipient"] for row in due]
+
+    batch_size = getattr(settings, "NOTIFICATION_BATCH_SIZE", 100)
+    sent = 0
+    for start in range(0, len(recipient_ids), batch_size):
+        sent += _send_batch(pending, recipient_ids[start : start + batch_size], now)
+    return sent
+
+
+def _send_batch(pending, recipient_ids, now):
+    notifications = (
+        pending.filter(recipient_id__in=recipient_ids, created_at__lte=now)
+        .select_related("recipient")
+        .order_by("recipient_id", "created_at", "id")
+    )
+    by_recipient = {}
+    for notification in notifications:
+        by_recipient.setdefault(notification.recipient_id, []).append(notification)
+
+    messages = [
+        build_digest(items[0].recipient, items)
+        for items in by_recipient.values()
+        if items[0].recipient.email
+    ]
+    if messages:
+        with get_connection() as connection:
+            connection.send_messages(messages)
+    # Marca depois do envio: uma falha deixa o lote para a nova tentativa
+    # do job (pode repetir e-mails, mas não perde notificações).
+    Notification.objects.using(DEFAULT_DB_ALIAS).filter(
+        id__in=[n.id for items in by_recipient.values() for n in items]
+    ).update(sent_at=now)
+    return len(messages)
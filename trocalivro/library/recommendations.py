@@ -0,0 +1,238 @@
+"""
+Recomendações "você também pode gostar" por filtragem colaborativa item-item.
+
+Monta a matriz esparsa perfil × livro com o histórico de BookExchange (quem
+pediu o livro) e a posse dos livros (quem o cadastrou), normaliza as colunas
+e calcula a similaridade do cosseno entre livros com um produto de matrizes
+esparsas, em blocos de livros para limitar a memória. Livros do mesmo gênero
+ganham um bônus. Os N vizinhos de cada livro e as N sugestões de cada perfil
+(``perfil × similaridade``, sem os livros que ele já pediu ou tem) são
+escolhidos com ordenação vetorizada e gravados em BookRecommendation e
+ProfileRecommendation.
+
+Depende de NumPy e SciPy, que só o worker precisa ter instalados: as páginas
+leem apenas as tabelas prontas.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from scipy import sparse
+
+from library.models import (
+    Book,
+    BookExchange,
+    BookRecommendation,
+    ProfileRecommendation,
+    StatusBook,
+)
+from library.sharding import fan_out
+
+REQUEST_WEIGHT = 1.0
+OWNER_WEIGHT = 0.5
+BLOCK_SIZE = 2048
+INSERT_BATCH_SIZE = 5000
+
+
+def load_catalog():
+    """Livros de todos os shards como arrays alinhados pelo índice da coluna."""
+    rows = fan_out(
+        lambda alias: (
+            Book.objects.using(alias)
+            .order_by("-id")
+            .values_list(
+                "id", "owner_id", "genre", "status", "title", "author", "image"
+            )
+        ),
+        key=lambda row: row[0],
+    )
+    ids, owners, genres, statuses, meta = [], [], [], [], []
+    for book_id, owner_id, genre, status, title, author, image in rows:
+        ids.append(book_id)
+        owners.append(owner_id)
+        genres.append((genre or "").strip().lower())
+        statuses.append(status)
+        meta.append((title, author or "", image or ""))
+
+    _, genre_codes = np.unique(np.array(genres, dtype=object), return_inverse=True)
+    genre_codes = genre_codes.astype(np.int32)
+    # Livro sem gênero não ganha bônus com os demais sem gênero.
+    genre_codes[np.array([not genre for genre in genres], dtype=bool)] = -1
+    return {
+        "ids": np.array(ids, dtype=np.int64),
+        "owners": np.array(owners, dtype=np.int64),
+        "genres": genre_codes,
+        "available": np.array(statuses, dtype=np.int64) == StatusBook.AVAILABLE.value,
+        "meta": meta,
+    }
+
+
+def load_requests():
+    """Pares (solicitante, livro) de todo o histórico de trocas."""
+    rows = fan_out(
+        lambda alias: (
+            BookExchange.objects.using(alias)
+            .order_by("-id")
+            .values_list("id", "requester_id", "book_id")
+        ),
+        key=lambda row: row[0],
+    )
+    pairs = np.array([(requester, book) for _, requester, book in rows], dtype=np.int64)
+    return pairs.reshape(-1, 2)
+
+
+def interaction_matrix(catalog, requests):
+    """Matriz CSR perfil × livro e os ids de perfil de cada linha."""
+    book_ids = catalog["ids"]
+    request_cols = request_profiles = np.array([], dtype=np.int64)
+    if len(book_ids):
+        # Trocas de livros apagados depois da leitura do catálogo são ignoradas.
+        order = np.argsort(book_ids)
+        positions = np.searchsorted(book_ids, requests[:, 1], sorter=order)
+        cols = order[np.minimum(positions, len(book_ids) - 1)]
+        known = book_ids[cols] == requests[:, 1]
+        request_cols, request_profiles = cols[known], requests[known, 0]
+
+    profiles = np.concatenate([request_profiles, catalog["owners"]])
+    cols = np.concatenate([request_cols, np.arange(len(book_ids))])
+    weights = np.concatenate(
+        [
+            np.full(len(request_cols), REQUEST_WEIGHT, dtype=np.float32),
+            np.full(len(book_ids), OWNER_WEIGHT, dtype=np.float32),
+        ]
+    )
+    profile_ids, rows = np.unique(profiles, return_inverse=True)
+    # Pares repetidos são somados na conversão para CSR.
+    matrix = sparse.coo_matrix(
+        (weights, (rows, cols)), shape=(len(profile_ids), len(book_ids))
+    ).tocsr()
+    return matrix, profile_ids
+
+
+def concat_parts(parts):
+    """Junta os resultados de top_n calculados por bloco."""
+    if not parts:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float32), empty
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def top_n(rows, cols, scores, n):
+    """As ``n`` maiores notas de cada linha, com a posição (rank) na linha."""
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    if not len(rows):
+        return rows, cols, scores, rows
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    counts = np.diff(np.r_[starts, len(rows)])
+    rank = np.arange(len(rows)) - np.repeat(starts, counts)
+    keep = rank < n
+    return rows[keep], cols[keep], scores[keep], rank[keep]
+
+
+def item_neighbours(matrix, catalog, n, genre_bonus, block_size=BLOCK_SIZE):
+    """
+    Matriz esparsa livro × livro só com os ``n`` vizinhos disponíveis mais
+    similares de cada livro.
+    """
+    n_books = matrix.shape[1]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = (matrix @ sparse.diags((1 / norms).astype(np.float32))).tocsc()
+    genres = catalog["genres"]
+    available = catalog["available"]
+
+    parts = []
+    for start in range(0, n_books, block_size):
+        block = (normalized[:, start : start + block_size].T @ normalized).tocoo()
+        rows = block.row + start
+        keep = (rows != block.col) & available[block.col]
+        rows, cols, data = rows[keep], block.col[keep], block.data[keep]
+        same_genre = (genres[rows] == genres[cols]) & (genres[rows] >= 0)
+        data = data * np.where(same_genre, 1 + genre_bonus, 1).astype(np.float32)
+        parts.append(top_n(rows, cols, data, n))
+
+    rows, cols, scores, _ = concat_parts(parts)
+    return sparse.csr_matrix((scores, (rows, cols)), shape=(n_books, n_books))
+
+
+def profile_suggestions(matrix, neighbours, n, block_size=BLOCK_SIZE):
+    """Top ``n`` livros por perfil, sem os que ele já pediu ou cadastrou."""
+    parts = []
+    for start in range(0, matrix.shape[0], block_size):
+        interactions = matrix[start : start + block_size]
+        scores = interactions @ neighbours
+        scores = (scores - scores.multiply(interactions > 0)).tocoo()
+        keep = scores.data > 0
+        parts.append(
+            top_n(scores.row[keep] + start, scores.col[keep], scores.data[keep], n)
+        )
+    return concat_parts(parts)
+
+
+def recommendation_rows(model, owner_field, owners, ranks, cols, scores, meta, ids):
+    """Instâncias de ``model`` (uma Recommendation) a partir dos arrays de top_n."""
+    for owner, rank, col, score in zip(
+        owners.tolist(), ranks.tolist(), cols.tolist(), scores.tolist()
+    ):
+        title, author, image = meta[col]
+        yield model(
+            **{owner_field: owner},
+            rank=rank,
+            recommended_id=int(ids[col]),
+            score=score,
+            title=title,
+            author=author,
+            image=image,
+        )
+
+
+def replace_table(model, objects):
+    """Troca todo o conteúdo da tabela, em lotes; chame dentro de uma transação."""
+    manager = model.objects.using(DEFAULT_DB_ALIAS)
+    manager.all().delete()
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == INSERT_BATCH_SIZE:
+            manager.bulk_create(batch)
+            batch = []
+    manager.bulk_create(batch)
+
+
+def compute_recommendations():
+    """Recalcula e substitui as duas tabelas; devolve quantas linhas gravou."""
+    n = getattr(settings, "RECOMMENDATIONS_TOP_N", 8)
+    genre_bonus = getattr(settings, "RECOMMENDATIONS_GENRE_BONUS", 0.25)
+
+    catalog = load_catalog()
+    matrix, profile_ids = interaction_matrix(catalog, load_requests())
+    neighbours = item_neighbours(matrix, catalog, n, genre_bonus)
+    suggestions = profile_suggestions(matrix, neighbours, n)
+
+    book_rows = neighbours.tocoo()
+    rows, cols, scores, ranks = top_n(book_rows.row, book_rows.col, book_rows.data, n)
+    profile_rows, profile_cols, profile_scores, profile_ranks = suggestions
+
+    ids, meta = catalog["ids"], catalog["meta"]
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        replace_table(
+            BookRecommendation,
+            recommendation_rows(
+                BookRecommendation, "book_id", ids[rows], ranks, cols, scores, meta, ids
+            ),
+        )
+        replace_table(
+            ProfileRecommendation,
+            recommendation_rows(
+                ProfileRecommendation,
+                "profile_id",
+                profile_ids[profile_rows],
+                profile_ranks,
+                profile_cols,
+                profile_scores,
+                meta,
+                ids,
+            ),
+        )
+    return len(rows) + len(profile_rows)
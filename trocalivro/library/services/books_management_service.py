@@ -1,27 +1,63 @@
+from itertools import islice
+from operator import itemgetter
+
 from django.db import transaction
-from library.models import Book, StatusBook
+from django.db.models import Q
+
+from library.changes import record_book, record_changes
 from library.forms import BookForm
+from library.history import record_events
+from library.models import (
+    Book,
+    BookExchange,
+    BookRecommendation,
+    ChangeAction,
+    ChangeKind,
+    ExchangeEventType,
+    ProfileRecommendation,
+    SimilarBook,
+    StatusBook,
+)
+from library.sharding import (
+    afan_out,
+    alocate,
+    fan_out,
+    locate,
+    shard_for_owner,
+    with_profiles,
+)
+from library.tasks import index_new_book, process_book_cover
+from library.wishlists import match_new_book
+
+
+def _newest_first(book):
+    return (book.created_at, book.id)
 
 
 class BookAdditionError(Exception):
     """Exceção de domínio para erros na adição de livros."""
 
-    pass
 
+class BookRemovalError(Exception):
+    """Exceção de domínio para erros na exclusão de livros."""
 
-def display_book_image(book):
+
+def image_display_path(image_path):
     # Normaliza o caminho da imagem para ser usado pelo {% static %} no template.
-    if getattr(book, "image", None) and book.image.name:
-        image_path = book.image.name
-        if "library/static/" in image_path:
-            image_path = image_path.split("library/static/")[-1]
-        book.image_display_url = image_path
-    else:
-        book.image_display_url = "images/no-image.png"
+    if not image_path:
+        return "images/no-image.png"
+    if "library/static/" in image_path:
+        image_path = image_path.split("library/static/")[-1]
+    return image_path
+
+
+def display_book_image(book):
+    # Aceita também o nome do arquivo já em texto (recomendações).
+    image = getattr(book, "image", None)
+    book.image_display_url = image_display_path(getattr(image, "name", image))
     return book
 
 
-@transaction.atomic
 def add_new_book(book_data, owner_profile, book_image=None):
     form = BookForm(book_data)
     if not form.is_valid():
@@ -34,20 +70,203 @@ def add_new_book(book_data, owner_profile, book_image=None):
     if book_image:
         book.image = book_image
 
-    book.save()
+    # A transação é a do shard do dono, onde ficam o livro e o ChangeLog.
+    with transaction.atomic(using=shard_for_owner(owner_profile.id)):
+        book.save()
+        record_book(book, ChangeAction.CREATED)
+        # Listas de desejos atendidas pelo livro novo, fora da requisição.
+        match_new_book.enqueue(book_id=book.pk, using=book._state.db)
+        index_new_book.enqueue(book_id=book.pk, using=book._state.db)
+        if book.image:
+            # O redimensionamento da capa sai do caminho da requisição.
+            process_book_cover.enqueue(book_id=book.pk, using=book._state.db)
     return book
 
 
-def search_books(query):
+def delete_book(book_id, owner_profile):
+    """Exclui um livro do dono (e suas trocas), deixando as lápides no ChangeLog."""
+    try:
+        shard = locate(Book, book_id)
+    except Book.DoesNotExist:
+        raise BookRemovalError("Livro não encontrado.")
+
+    with transaction.atomic(using=shard):
+        book = Book.objects.using(shard).select_for_update().filter(id=book_id).first()
+        if book is None:
+            raise BookRemovalError("Livro não encontrado.")
+        if book.owner_id != owner_profile.id:
+            raise BookRemovalError("Somente o dono pode excluir o livro.")
+        exchanges = list(BookExchange.objects.using(shard).filter(book=book))
+        record_changes(shard, ChangeKind.EXCHANGE, ChangeAction.DELETED, exchanges)
+        # Pedidos ainda pendentes ficam encerrados no histórico das duas partes.
+        for exchange in exchanges:
+            exchange.book = book
+        record_events(
+            shard,
+            [
+                (exchange, ExchangeEventType.CLOSED)
+                for exchange in exchanges
+                if exchange.status == StatusBook.IN_EXCHANGE.value
+            ],
+        )
+        record_book(book, ChangeAction.DELETED)
+        book.delete()
+
+
+def get_book(book_id):
+    """Busca um livro pelo id no shard onde ele está."""
+    shard = locate(Book, book_id)
+    return with_profiles(Book.objects.using(shard), "owner").get(id=book_id)
+
+
+async def aget_book(book_id):
+    """Versão assíncrona de get_book."""
+    shard = await alocate(Book, book_id)
+    return await with_profiles(Book.objects.using(shard), "owner").aget(id=book_id)
+
+
+def get_book_recommendations(book_id):
+    """Vizinhos pré-calculados do livro, numa consulta pelo índice."""
+    return [
+        display_book_image(recommendation)
+        for recommendation in BookRecommendation.objects.filter(book_id=book_id)
+    ]
+
+
+async def aget_book_recommendations(book_id):
+    """Versão assíncrona de get_book_recommendations."""
+    queryset = BookRecommendation.objects.filter(book_id=book_id)
+    return [display_book_image(recommendation) async for recommendation in queryset]
+
+
+def get_similar_books(book_id):
+    """Livros parecidos pelo texto (library.similarity), numa consulta pelo índice."""
+    return [
+        display_book_image(similar)
+        for similar in SimilarBook.objects.filter(book_id=book_id)
+    ]
+
+
+async def aget_similar_books(book_id):
+    """Versão assíncrona de get_similar_books."""
+    queryset = SimilarBook.objects.filter(book_id=book_id)
+    return [display_book_image(similar) async for similar in queryset]
+
+
+def get_profile_recommendations(profile):
+    """Sugestões pré-calculadas para o perfil, numa consulta pelo índice."""
+    return [
+        display_book_image(recommendation)
+        for recommendation in ProfileRecommendation.objects.filter(profile=profile)
+    ]
+
+
+def _nearby(books, owner_ids):
+    """Só os livros disponíveis dos donos próximos (library.geo)."""
+    if owner_ids is None:
+        return books
+    return books.filter(owner_id__in=owner_ids, status=StatusBook.AVAILABLE.value)
+
+
+def _home_feed_queryset(owner_ids=None):
+    def build_queryset(alias):
+        books = with_profiles(Book.objects.using(alias), "owner")
+        return _nearby(books, owner_ids).order_by("-created_at", "-id")
+
+    return build_queryset
+
+
+def get_home_feed(owner_ids=None):
+    """
+    Livros mais recentes primeiro, na ordem do índice book_recent_idx. Com
+    ``owner_ids``, só os disponíveis desses donos.
+    """
+    return fan_out(_home_feed_queryset(owner_ids), key=_newest_first)
+
+
+async def aget_home_feed(owner_ids=None):
+    """Versão assíncrona de get_home_feed; devolve uma lista."""
+    return await afan_out(_home_feed_queryset(owner_ids), key=_newest_first)
+
+
+def get_owner_books(owner_profile):
+    """Livros de um usuário, na ordem do índice book_owner_recent_idx."""
+    return (
+        Book.objects.using(shard_for_owner(owner_profile.id))
+        .filter(owner=owner_profile)
+        .order_by("-created_at", "-id")
+    )
+
+
+def _search_queryset(query, owner_ids=None):
+    def build_queryset(alias):
+        books_author = Book.objects.using(alias).filter(author__icontains=query)
+        books_title = Book.objects.using(alias).filter(title__icontains=query)
+        books = (books_author | books_title).distinct()
+        return _nearby(books, owner_ids).order_by("-id")
+
+    return build_queryset
+
+
+def search_books(query, owner_ids=None):
     if not query:
         return []
 
-    books_author = Book.objects.filter(author__icontains=query)
-    books_title = Book.objects.filter(title__icontains=query)
-    books = (books_author | books_title).distinct()
+    books = fan_out(_search_queryset(query, owner_ids), key=lambda book: book.id)
 
     processed_books = []
     for book in books:
         processed_book = display_book_image(book)
         processed_books.append(processed_book)
     return processed_books
+
+
+async def asearch_books(query, owner_ids=None):
+    """Versão assíncrona de search_books."""
+    if not query:
+        return []
+
+    books = await afan_out(_search_queryset(query, owner_ids), key=lambda book: book.id)
+    return [display_book_image(book) for book in books]
+
+
+def _page_queryset(fields, after, query, owner_ids):
+    def build_queryset(alias):
+        books = Book.objects.using(alias)
+        if query:
+            books = books.filter(Q(author__icontains=query) | Q(title__icontains=query))
+        books = _nearby(books, owner_ids)
+        if after:
+            created_at, book_id = after
+            books = books.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=book_id)
+            )
+        return books.order_by("-created_at", "-id").values(*fields)
+
+    return build_queryset
+
+
+def get_book_page(fields, after=None, limit=20, query=None, owner_ids=None):
+    """
+    Página de livros como dicionários só com ``fields``, mais recentes
+    primeiro (book_recent_idx). ``after`` é a chave ``(created_at, id)`` do
+    último livro da página anterior; devolve ``(linhas, chave da próxima
+    página ou None)``. Uma consulta por shard, qualquer que seja a página.
+    """
+    fields = list(dict.fromkeys(["id", "created_at", *fields]))
+    build = _page_queryset(fields, after, query, owner_ids)
+    merged = fan_out(
+        lambda alias: build(alias)[: limit + 1], key=itemgetter("created_at", "id")
+    )
+    rows = list(islice(merged, limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], (last["created_at"], last["id"])
+
+
+def get_book_values(book_id, fields):
+    """Um livro como dicionário, como nas linhas de get_book_page."""
+    shard = locate(Book, book_id)
+    fields = dict.fromkeys(["id", "created_at", *fields])
+    return Book.objects.using(shard).values(*fields).get(id=book_id)
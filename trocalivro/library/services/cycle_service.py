@@ -0,0 +1,176 @@
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from library.changes import record_book, record_exchange
+from library.events import publish_exchange_event
+from library.history import record_events
+from library.models import (
+    Book,
+    BookExchange,
+    ChangeAction,
+    CycleStatus,
+    ExchangeCycle,
+    ExchangeCycleLeg,
+    ExchangeEventType,
+    StatusBook,
+)
+from library.notifications import notify_exchange
+from library.sharding import locate
+
+
+class ExchangeCycleError(Exception):
+    """Exceção de domínio para erros nas trocas em cadeia."""
+
+
+def get_proposed_cycles(profile):
+    """Propostas em aberto de que o perfil participa, com as etapas."""
+    cycle_ids = ExchangeCycleLeg.objects.filter(
+        receiver=profile, cycle__status=CycleStatus.PROPOSED
+    ).values("cycle_id")
+    return (
+        ExchangeCycle.objects.filter(id__in=cycle_ids)
+        .prefetch_related("legs__receiver", "legs__giver")
+        .order_by("-id")
+    )
+
+
+def _locked_cycle(cycle_id, profile):
+    try:
+        cycle = ExchangeCycle.objects.select_for_update().get(id=cycle_id)
+    except ExchangeCycle.DoesNotExist:
+        raise ExchangeCycleError("Troca em cadeia não encontrada.")
+    legs = list(cycle.legs.select_related("receiver", "giver"))
+    leg = next((leg for leg in legs if leg.receiver_id == profile.id), None)
+    if leg is None:
+        raise ExchangeCycleError("Você não participa desta troca em cadeia.")
+    if cycle.status != CycleStatus.PROPOSED:
+        raise ExchangeCycleError("A troca em cadeia já foi encerrada.")
+    return cycle, legs, leg
+
+
+def decline_cycle(cycle_id, profile):
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        cycle, _, _ = _locked_cycle(cycle_id, profile)
+        cycle.status = CycleStatus.CANCELLED
+        cycle.save(update_fields=["status"])
+    return cycle
+
+
+def confirm_cycle(cycle_id, profile):
+    """
+    Registra a confirmação do perfil. A última confirmação cria as trocas
+    de todas as etapas, já aceitas; se algum livro deixou de estar
+    disponível, a proposta é cancelada.
+    """
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        cycle, legs, leg = _locked_cycle(cycle_id, profile)
+        if leg.confirmed_at is None:
+            leg.confirmed_at = timezone.now()
+            leg.save(update_fields=["confirmed_at"])
+        if any(other.confirmed_at is None for other in legs):
+            return cycle
+
+        try:
+            _create_exchanges(legs)
+        except ExchangeCycleError as e:
+            cycle.status = CycleStatus.CANCELLED
+            cycle.save(update_fields=["status"])
+            error = e
+        else:
+            cycle.status = CycleStatus.CONFIRMED
+            cycle.save(update_fields=["status"])
+            return cycle
+    raise error
+
+
+def _available_for(leg, book, shard):
+    """
+    O livro entra na etapa se está disponível ou se a única solicitação
+    pendente é a de quem o recebe na cadeia; senão a cadeia o tiraria de quem
+    ainda espera resposta do dono.
+    """
+    if book is None or book.owner_id != leg.giver_id:
+        return False
+    if book.status == StatusBook.AVAILABLE.value:
+        return True
+    if book.status != StatusBook.IN_EXCHANGE.value:
+        return False
+    requesters = set(
+        BookExchange.objects.using(shard)
+        .filter(book=book, status=StatusBook.IN_EXCHANGE.value)
+        .values_list("requester_id", flat=True)
+    )
+    return requesters <= {leg.receiver_id}
+
+
+def _create_exchanges(legs):
+    try:
+        shards = {leg.book_id: locate(Book, leg.book_id) for leg in legs}
+    except Book.DoesNotExist:
+        raise ExchangeCycleError("Um dos livros da troca em cadeia foi removido.")
+
+    # Uma transação por shard envolvido. Com shards em bancos diferentes o
+    # commit não é atômico entre eles: uma falha no meio do commit pode deixar
+    # parte das trocas criada (as transações são abertas e fechadas juntas,
+    # então a janela é só a do commit).
+    with ExitStack() as stack:
+        for shard in sorted(set(shards.values()), key=str):
+            stack.enter_context(transaction.atomic(using=shard))
+
+        books = {}
+        for leg in legs:
+            books[leg.id] = (
+                Book.objects.using(shards[leg.book_id])
+                .select_for_update()
+                .filter(id=leg.book_id)
+                .first()
+            )
+            if not _available_for(leg, books[leg.id], shards[leg.book_id]):
+                raise ExchangeCycleError(
+                    f"O livro “{leg.book_title}” não está mais disponível."
+                )
+
+        events = defaultdict(list)
+        for leg in legs:
+            book = books[leg.id]
+            shard = shards[leg.book_id]
+            exchange = (
+                BookExchange.objects.using(shard)
+                .filter(
+                    book=book,
+                    requester_id=leg.receiver_id,
+                    status=StatusBook.IN_EXCHANGE.value,
+                )
+                .first()
+            ) or BookExchange(
+                book=book, requester_id=leg.receiver_id, owner_id=book.owner_id
+            )
+            # BookExchange.save() também marca o livro como indisponível.
+            exchange.book = book
+            exchange.status = StatusBook.UNAVAILABLE.value
+            exchange.message = f"Troca em cadeia #{leg.cycle_id}"
+            exchange.closed_at = timezone.now()
+            created = exchange.pk is None
+            exchange.save(using=shard)
+            record_exchange(
+                exchange, ChangeAction.CREATED if created else ChangeAction.UPDATED
+            )
+            record_book(book, ChangeAction.UPDATED)
+            if created:
+                events[shard].append((exchange, ExchangeEventType.CREATED))
+            events[shard].append((exchange, ExchangeEventType.ACCEPTED))
+
+            leg.exchange_id = exchange.id
+            leg.save(update_fields=["exchange_id"])
+            publish_exchange_event("exchange.updated", exchange, using=shard)
+            notify_exchange(
+                "exchange.updated",
+                exchange,
+                actor_name=leg.giver.firstname,
+                using=shard,
+            )
+        for shard, entries in events.items():
+            record_events(shard, entries)
@@ -1,94 +1,372 @@
-from django.db import transaction
-from library.models import Book, BookExchange, StatusBook
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from library.changes import record_book, record_exchange
+from library.events import publish_exchange_event
+from library.history import record_events
+from library.models import (
+    ArchivedExchange,
+    Book,
+    BookExchange,
+    ChangeAction,
+    ExchangeEventType,
+    StatusBook,
+)
+from library.notifications import notify_exchange
+from library.sharding import (
+    afan_out,
+    ashard_for_owner,
+    fan_out,
+    get_shards,
+    is_sharded,
+    locate,
+    shard_for_owner,
+    with_profiles,
+)
+
+HISTORY_PAGE_SIZE = 20
+INBOX_PAGE_SIZE = 20
+
+# Abas das caixas de solicitações. Cada aba é um único status, lido em
+# ordem pela faixa dos índices (requester|owner, status, -id).
+INBOX_TABS = {
+    "pending": StatusBook.IN_EXCHANGE.value,
+    "accepted": StatusBook.UNAVAILABLE.value,
+    "rejected": StatusBook.AVAILABLE.value,
+    "expired": StatusBook.EXPIRED.value,
+}
 
 
 class BookExchangeError(Exception):
     """Exceção de domínio para erros de troca de livro."""
 
-    pass
+
+DUPLICATE_REQUEST_MESSAGE = (
+    "Você já tem uma solicitação de troca pendente para este livro."
+)
+
+
+def get_pending_requests(book: Book, requester_profile):
+    """Solicitações pendentes de um solicitante para um livro."""
+    return BookExchange.objects.using(book._state.db).filter(
+        book=book, requester=requester_profile, status=StatusBook.IN_EXCHANGE.value
+    )
 
 
 def validate_exchange_request(book: Book, requester_profile):
-    if book.owner == requester_profile:
+    if book.owner_id == requester_profile.id:
         raise BookExchangeError("Você não pode solicitar a troca do seu próprio livro.")
-    if BookExchange.objects.filter(
-        book=book, requester=requester_profile, status=StatusBook.IN_EXCHANGE.value
-    ).exists():
-        raise BookExchangeError(
-            "Você já tem uma solicitação de troca pendente para este livro."
-        )
     if book.status != StatusBook.AVAILABLE.value:
+        # A duplicidade é garantida pela constraint do banco; só consultamos
+        # aqui para dar uma mensagem mais precisa quando o pedido é recusado.
+        if get_pending_requests(book, requester_profile).exists():
+            raise BookExchangeError(DUPLICATE_REQUEST_MESSAGE)
         raise BookExchangeError("O livro não está disponível para troca.")
 
 
-@transaction.atomic
 def create_exchange_request(book_id: int, requester_profile):
     try:
-        book = Book.objects.select_for_update().get(id=book_id)
+        shard = locate(Book, book_id)
     except Book.DoesNotExist:
         raise BookExchangeError("Livro não encontrado.")
 
-    validate_exchange_request(book, requester_profile)
+    with transaction.atomic(using=shard):
+        try:
+            book = Book.objects.using(shard).select_for_update().get(id=book_id)
+        except Book.DoesNotExist:
+            raise BookExchangeError("Livro não encontrado.")
 
-    exchange = BookExchange.objects.create(
-        book=book,
-        requester=requester_profile,
-        owner=book.owner,
-        status=StatusBook.IN_EXCHANGE.value,
-    )
+        validate_exchange_request(book, requester_profile)
+
+        try:
+            with transaction.atomic(using=shard):
+                exchange = BookExchange.objects.using(shard).create(
+                    book=book,
+                    requester=requester_profile,
+                    owner_id=book.owner_id,
+                    status=StatusBook.IN_EXCHANGE.value,
+                )
+        except IntegrityError:
+            raise BookExchangeError(DUPLICATE_REQUEST_MESSAGE)
+        record_exchange(exchange, ChangeAction.CREATED)
+        record_book(book, ChangeAction.UPDATED)
+        record_events(shard, [(exchange, ExchangeEventType.CREATED)])
+        publish_exchange_event("exchange.created", exchange, using=shard)
+        notify_exchange(
+            "exchange.created",
+            exchange,
+            actor_name=requester_profile.firstname,
+            using=shard,
+        )
 
     return exchange
 
 
-def get_sent_requests(requester_profile):
-    """Lista solicitações enviadas pelo usuário."""
+def _sent_requests_queryset(requester_profile):
+    def build_queryset(alias):
+        return with_profiles(
+            BookExchange.objects.using(alias)
+            .filter(requester=requester_profile)
+            .select_related("book"),
+            "owner",
+        ).order_by("-id")
+
+    return build_queryset
+
+
+def _received_requests_queryset(owner_profile, shard):
+    return with_profiles(
+        BookExchange.objects.using(shard)
+        .filter(owner=owner_profile)
+        .select_related("book"),
+        "requester",
+    ).order_by("-id")
+
+
+def _archived_sent_queryset(requester_profile):
+    def build_queryset(alias):
+        return with_profiles(
+            ArchivedExchange.objects.using(alias).filter(requester=requester_profile),
+            "owner",
+        ).order_by("-id")
+
+    return build_queryset
+
+
+def _archived_received_queryset(owner_profile, shard):
+    return with_profiles(
+        ArchivedExchange.objects.using(shard).filter(owner=owner_profile),
+        "requester",
+    ).order_by("-id")
+
+
+def _history_page(querysets, before, limit):
+    """
+    Junta as páginas das tabelas quente e fria (todas ordenadas por -id)
+    abaixo do id ``before``; devolve ``(trocas, id da próxima página ou None)``.
+    """
+    pages = []
+    for queryset in querysets:
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        pages.append(queryset[: limit + 1])
+    merged = heapq.merge(*pages, key=attrgetter("id"), reverse=True)
+    return _split_page(islice(merged, limit + 1), limit)
+
+
+def _split_page(rows, limit):
+    """``limit + 1`` linhas viram ``(página, id para a próxima ou None)``."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], rows[limit - 1].id
+
+
+def _tab_page(queryset, tab, before, limit):
+    queryset = queryset.filter(status=INBOX_TABS[tab])
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    return queryset[: limit + 1]
+
+
+def _tab_counts():
+    # Uma agregação condicional: COUNT(CASE WHEN status = ...) por aba.
+    return {
+        tab: Count("id", filter=Q(status=status)) for tab, status in INBOX_TABS.items()
+    }
+
+
+def get_sent_page(requester_profile, tab, before=None, limit=INBOX_PAGE_SIZE):
+    """
+    Página da aba ``tab`` das solicitações enviadas, abaixo do id ``before``;
+    devolve ``(trocas, id da próxima página ou None)``.
+    """
+    rows = fan_out(
+        lambda alias: _tab_page(
+            _sent_requests_queryset(requester_profile)(alias), tab, before, limit
+        ),
+        key=attrgetter("id"),
+    )
+    return _split_page(islice(rows, limit + 1), limit)
+
+
+async def aget_sent_page(requester_profile, tab, before=None, limit=INBOX_PAGE_SIZE):
+    """Versão assíncrona de get_sent_page."""
+    rows = await afan_out(
+        lambda alias: _tab_page(
+            _sent_requests_queryset(requester_profile)(alias), tab, before, limit
+        ),
+        key=attrgetter("id"),
+    )
+    return _split_page(rows[: limit + 1], limit)
+
+
+def get_received_page(owner_profile, tab, before=None, limit=INBOX_PAGE_SIZE):
+    """Página da aba ``tab`` das solicitações recebidas (ver get_sent_page)."""
+    queryset = _received_requests_queryset(
+        owner_profile, shard_for_owner(owner_profile.id)
+    )
+    return _split_page(_tab_page(queryset, tab, before, limit), limit)
+
+
+async def aget_received_page(owner_profile, tab, before=None, limit=INBOX_PAGE_SIZE):
+    """Versão assíncrona de get_received_page."""
+    shard = await ashard_for_owner(owner_profile.id)
+    queryset = _tab_page(
+        _received_requests_queryset(owner_profile, shard), tab, before, limit
+    )
+    return _split_page([exchange async for exchange in queryset], limit)
+
+
+def get_sent_counts(requester_profile):
+    """Quantidade de solicitações enviadas por aba (uma consulta por shard)."""
+    counts = dict.fromkeys(INBOX_TABS, 0)
+    for alias in get_shards() if is_sharded() else [None]:
+        row = (
+            BookExchange.objects.using(alias)
+            .filter(requester=requester_profile)
+            .aggregate(**_tab_counts())
+        )
+        for tab in counts:
+            counts[tab] += row[tab]
+    return counts
+
+
+async def aget_sent_counts(requester_profile):
+    """Versão assíncrona de get_sent_counts."""
+    counts = dict.fromkeys(INBOX_TABS, 0)
+    for alias in get_shards() if is_sharded() else [None]:
+        row = (
+            await BookExchange.objects.using(alias)
+            .filter(requester=requester_profile)
+            .aaggregate(**_tab_counts())
+        )
+        for tab in counts:
+            counts[tab] += row[tab]
+    return counts
+
+
+def get_received_counts(owner_profile):
+    """Quantidade de solicitações recebidas por aba, numa única consulta."""
     return (
-        BookExchange.objects.filter(requester=requester_profile)
-        .select_related("book", "owner")
-        .order_by("-id")
+        BookExchange.objects.using(shard_for_owner(owner_profile.id))
+        .filter(owner=owner_profile)
+        .aggregate(**_tab_counts())
     )
 
 
-def get_received_requests(owner_profile):
-    """Lista solicitações recebidas pelo dono do livro."""
+async def aget_received_counts(owner_profile):
+    """Versão assíncrona de get_received_counts."""
+    shard = await ashard_for_owner(owner_profile.id)
     return (
-        BookExchange.objects.filter(owner=owner_profile)
-        .select_related("book", "requester")
-        .order_by("-id")
+        await BookExchange.objects.using(shard)
+        .filter(owner=owner_profile)
+        .aaggregate(**_tab_counts())
+    )
+
+
+def get_sent_history(requester_profile, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Solicitações enviadas, inclusive as arquivadas (library.archive), em
+    páginas de ``limit`` pela chave ``-id``.
+    """
+    querysets = []
+    for alias in get_shards() if is_sharded() else [None]:
+        querysets.append(_sent_requests_queryset(requester_profile)(alias))
+        querysets.append(_archived_sent_queryset(requester_profile)(alias))
+    return _history_page(querysets, before, limit)
+
+
+def get_received_history(owner_profile, before=None, limit=HISTORY_PAGE_SIZE):
+    """Solicitações recebidas, inclusive as arquivadas, em páginas de ``limit``."""
+    shard = shard_for_owner(owner_profile.id)
+    querysets = [
+        _received_requests_queryset(owner_profile, shard),
+        _archived_received_queryset(owner_profile, shard),
+    ]
+    return _history_page(querysets, before, limit)
+
+
+def iter_exchange_history(profile, chunk_size=2000):
+    """
+    Trocas enviadas e recebidas pelo usuário, inclusive as arquivadas, mais
+    recentes primeiro, lidas em blocos de ``chunk_size`` (exportação sem
+    carregar o histórico todo).
+    """
+    shard = shard_for_owner(profile.id)
+    sources = [
+        fan_out(_sent_requests_queryset(profile), key=attrgetter("id")),
+        fan_out(_archived_sent_queryset(profile), key=attrgetter("id")),
+        _received_requests_queryset(profile, shard),
+        _archived_received_queryset(profile, shard),
+    ]
+    return heapq.merge(
+        *(
+            rows.iterator(chunk_size=chunk_size) if hasattr(rows, "iterator") else rows
+            for rows in sources
+        ),
+        key=attrgetter("id"),
+        reverse=True,
     )
 
 
-@transaction.atomic
 def respond_to_exchange_request(
     exchange_id: int, owner_profile, action: str, message: str = ""
 ):
     try:
-        exchange = (
-            BookExchange.objects.select_for_update()
-            .select_related("book")
-            .get(id=exchange_id)
-        )
+        shard = locate(BookExchange, exchange_id)
     except BookExchange.DoesNotExist:
         raise BookExchangeError("Solicitação não encontrada.")
 
-    if exchange.owner != owner_profile:
-        raise BookExchangeError("Somente o dono do livro pode responder a solicitação.")
+    with transaction.atomic(using=shard):
+        try:
+            exchange = (
+                BookExchange.objects.using(shard)
+                .select_for_update()
+                .select_related("book")
+                .get(id=exchange_id)
+            )
+        except BookExchange.DoesNotExist:
+            raise BookExchangeError("Solicitação não encontrada.")
+
+        if exchange.owner_id != owner_profile.id:
+            raise BookExchangeError(
+                "Somente o dono do livro pode responder a solicitação."
+            )
 
-    if exchange.status != StatusBook.IN_EXCHANGE.value:
-        raise BookExchangeError("A solicitação já foi respondida.")
+        if exchange.status != StatusBook.IN_EXCHANGE.value:
+            raise BookExchangeError("A solicitação já foi respondida.")
 
-    if action not in ("accept", "reject"):
-        raise BookExchangeError("Ação inválida.")
+        if action not in ("accept", "reject"):
+            raise BookExchangeError("Ação inválida.")
 
-    if action == "accept":
-        exchange.status = StatusBook.UNAVAILABLE.value
-        exchange.book.status = StatusBook.UNAVAILABLE.value
-    else:
-        exchange.status = StatusBook.AVAILABLE.value
-        exchange.book.status = StatusBook.AVAILABLE.value
+        if action == "accept":
+            exchange.status = StatusBook.UNAVAILABLE.value
+            exchange.book.status = StatusBook.UNAVAILABLE.value
+            event = ExchangeEventType.ACCEPTED
+        else:
+            exchange.status = StatusBook.AVAILABLE.value
+            exchange.book.status = StatusBook.AVAILABLE.value
+            event = ExchangeEventType.REJECTED
 
-    exchange.message = message or ""
-    exchange.book.save()
-    exchange.save()
+        exchange.message = message or ""
+        exchange.closed_at = timezone.now()
+        exchange.book.save()
+        exchange.save()
+        record_exchange(exchange, ChangeAction.UPDATED)
+        record_book(exchange.book, ChangeAction.UPDATED)
+        record_events(shard, [(exchange, event)])
+        publish_exchange_event("exchange.updated", exchange, using=shard)
+        notify_exchange(
+            "exchange.updated",
+            exchange,
+            actor_name=owner_profile.firstname,
+            using=shard,
+        )
 
     return exchange
@@ -0,0 +1,30 @@
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from library.imports import start_import
+from library.models import BookImport, ImportStatus
+from library.tasks import import_books
+
+
+def queue_upload(upload, owner):
+    """Guarda o arquivo enviado e agenda a importação (ou a retomada) na fila."""
+    directory = Path(settings.BOOK_IMPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    suffix = Path(upload.name).suffix.lower()
+    path = directory / f"{uuid.uuid4().hex}{suffix}"
+    with open(path, "wb") as destination:
+        destination.writelines(upload.chunks())
+
+    book_import = start_import(path, owner)
+    if book_import.source != str(path):
+        # Mesmo arquivo de antes: a importação anterior continua com ele.
+        path.unlink()
+    if book_import.status != ImportStatus.DONE:
+        import_books.enqueue(import_id=book_import.id)
+    return book_import
+
+
+def get_recent_imports(limit=20):
+    return BookImport.objects.select_related("owner__user").order_by("-id")[:limit]
@@ -0,0 +1,170 @@
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from library.middleware import forget_profiles
+from library.models import (
+    ArchivedExchange,
+    BookExchange,
+    ExchangeRating,
+    Profile,
+    StatusBook,
+)
+from library.sharding import locate
+
+MIN_SCORE = 1
+MAX_SCORE = 5
+# Média bayesiana: todo perfil começa com PRIOR_WEIGHT notas "virtuais" de
+# valor PRIOR_SCORE, então a reputação de quem tem poucas avaliações fica
+# perto da inicial e uma nota isolada não a derruba.
+PRIOR_SCORE = 5
+PRIOR_WEIGHT = 2
+REPAIR_BATCH_SIZE = 1000
+
+
+class RatingError(Exception):
+    """Exceção de domínio para erros na avaliação de trocas."""
+
+
+def reputation(rating_sum, rating_count):
+    """
+    Reputação a partir da soma e da quantidade de notas; aceita números ou
+    expressões F(), para ser calculada dentro do próprio UPDATE.
+    """
+    return (PRIOR_SCORE * PRIOR_WEIGHT * 1.0 + rating_sum) / (
+        PRIOR_WEIGHT + rating_count
+    )
+
+
+def _score(score):
+    try:
+        score = int(score)
+    except (TypeError, ValueError):
+        raise RatingError("Nota inválida.")
+    if not MIN_SCORE <= score <= MAX_SCORE:
+        raise RatingError(f"A nota deve ser de {MIN_SCORE} a {MAX_SCORE}.")
+    return score
+
+
+def _find_exchange(exchange_id):
+    """A troca na tabela quente ou, se já foi arquivada, no arquivo."""
+    for model in (BookExchange, ArchivedExchange):
+        try:
+            shard = locate(model, exchange_id)
+            return model.objects.using(shard).get(id=exchange_id)
+        except model.DoesNotExist:
+            continue
+    raise RatingError("Troca não encontrada.")
+
+
+def rate_exchange(exchange_id: int, rater_profile, score, comment: str = ""):
+    """
+    Registra a nota de uma das partes para a outra numa troca aceita (ainda
+    na tabela quente ou já arquivada) e soma a nota à reputação do avaliado
+    com um único UPDATE atômico.
+    """
+    score = _score(score)
+    exchange = _find_exchange(exchange_id)
+
+    if rater_profile.id == exchange.owner_id:
+        rated_id = exchange.requester_id
+    elif rater_profile.id == exchange.requester_id:
+        rated_id = exchange.owner_id
+    else:
+        raise RatingError("Somente as partes da troca podem avaliá-la.")
+    if exchange.status != StatusBook.UNAVAILABLE.value:
+        raise RatingError("Só é possível avaliar trocas aceitas.")
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        try:
+            rating = ExchangeRating.objects.using(DEFAULT_DB_ALIAS).create(
+                exchange_id=exchange.id,
+                rater_id=rater_profile.id,
+                rated_id=rated_id,
+                score=score,
+                comment=comment or "",
+            )
+        except IntegrityError:
+            raise RatingError("Você já avaliou esta troca.")
+        # No UPDATE as colunas à direita ainda têm os valores antigos.
+        Profile.objects.using(DEFAULT_DB_ALIAS).filter(id=rated_id).update(
+            rating_sum=F("rating_sum") + score,
+            rating_count=F("rating_count") + 1,
+            reputation=reputation(F("rating_sum") + score, F("rating_count") + 1),
+        )
+        # O UPDATE não passa pelo save(); o usuário em cache ficaria velho.
+        transaction.on_commit(
+            lambda: forget_profiles([rated_id]), using=DEFAULT_DB_ALIAS
+        )
+    return rating
+
+
+def get_rated_exchange_ids(profile, exchanges):
+    """Ids das trocas aceitas de ``exchanges`` que o perfil já avaliou."""
+    ids = [e.id for e in exchanges if e.status == StatusBook.UNAVAILABLE.value]
+    if not ids:
+        return set()
+    return set(
+        ExchangeRating.objects.filter(rater=profile, exchange_id__in=ids).values_list(
+            "exchange_id", flat=True
+        )
+    )
+
+
+async def aget_rated_exchange_ids(profile, exchanges):
+    """Versão assíncrona de get_rated_exchange_ids."""
+    ids = [e.id for e in exchanges if e.status == StatusBook.UNAVAILABLE.value]
+    if not ids:
+        return set()
+    rated = ExchangeRating.objects.filter(
+        rater=profile, exchange_id__in=ids
+    ).values_list("exchange_id", flat=True)
+    return {exchange_id async for exchange_id in rated}
+
+
+def rebuild_reputations(batch_size=REPAIR_BATCH_SIZE):
+    """
+    Recalcula soma, quantidade e reputação de todos os perfis a partir das
+    avaliações, ``batch_size`` perfis por vez; devolve quantos foram gravados.
+    """
+    profile_ids = (
+        Profile.objects.using(DEFAULT_DB_ALIAS)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    total = 0
+    batch = []
+    for profile_id in profile_ids.iterator(chunk_size=batch_size):
+        batch.append(profile_id)
+        if len(batch) == batch_size:
+            total += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        total += _rebuild_batch(batch)
+    return total
+
+
+def _rebuild_batch(profile_ids):
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        totals = {
+            row["rated_id"]: (row["total"], row["count"])
+            for row in ExchangeRating.objects.using(DEFAULT_DB_ALIAS)
+            .filter(rated_id__in=profile_ids)
+            .values("rated_id")
+            .annotate(total=Sum("score"), count=Count("id"))
+        }
+        profiles = []
+        for profile_id in profile_ids:
+            rating_sum, rating_count = totals.get(profile_id, (0, 0))
+            profiles.append(
+                Profile(
+                    id=profile_id,
+                    rating_sum=rating_sum,
+                    rating_count=rating_count,
+                    reputation=reputation(rating_sum, rating_count),
+                )
+            )
+        Profile.objects.using(DEFAULT_DB_ALIAS).bulk_update(
+            profiles, ["rating_sum", "rating_count", "reputation"]
+        )
+    forget_profiles(profile_ids)
+    return len(profiles)
@@ -0,0 +1,52 @@
+from operator import attrgetter
+
+from library.forms import WishlistForm
+from library.models import Book, Wishlist, WishlistMatch
+from library.sharding import fan_out
+
+
+class WishlistError(Exception):
+    """Exceção de domínio para erros na lista de desejos."""
+
+
+def add_wishlist_entry(data, profile):
+    form = WishlistForm(data)
+    if not form.is_valid():
+        raise WishlistError("Informe título, autor ou gênero do livro desejado.")
+    entry = form.save(commit=False)
+    entry.profile = profile
+    entry.save()
+    return entry
+
+
+def remove_wishlist_entry(entry_id, profile):
+    deleted, _ = Wishlist.objects.filter(id=entry_id, profile=profile).delete()
+    if not deleted:
+        raise WishlistError("Pedido não encontrado.")
+
+
+def get_wishlist(profile):
+    """Pedidos do perfil, cada um com os livros já encontrados em ``matched_books``."""
+    entries = list(Wishlist.objects.filter(profile=profile).order_by("-id"))
+    matches = WishlistMatch.objects.filter(wishlist__in=entries).values_list(
+        "wishlist_id", "book_id"
+    )
+    book_ids = {}
+    for wishlist_id, book_id in matches:
+        book_ids.setdefault(wishlist_id, []).append(book_id)
+
+    all_ids = [book_id for ids in book_ids.values() for book_id in ids]
+    books = {}
+    if all_ids:
+        found = fan_out(
+            lambda alias: (
+                Book.objects.using(alias).filter(id__in=all_ids).order_by("-id")
+            ),
+            key=attrgetter("id"),
+        )
+        books = {book.id: book for book in found}
+    for entry in entries:
+        entry.matched_books = [
+            books[book_id] for book_id in book_ids.get(entry.id, []) if book_id in books
+        ]
+    return entries
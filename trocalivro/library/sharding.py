@@ -0,0 +1,275 @@
+"""
+Particionamento horizontal de livros e trocas pelo perfil do dono.
+
+Cada dono tem seus livros (e as trocas desses livros) em um único banco da
+lista DATABASE_SHARDS. Perfis, usuários e o mapa de shards ficam sempre no
+banco "default". Com um único shard (a configuração padrão) as funções que
+escolhem um banco devolvem None sem consultar nada, e os roteadores decidem
+(primário ou réplica) como antes.
+
+Com vários shards, os ids são reservados por shard e ordenados pelo tempo:
+``(tique << SHARD_INDEX_BITS) | índice``, em que o tique de cada tabela em
+cada shard cresce a partir de ``segundos desde ID_EPOCH << TICK_BITS``. Ids
+de shards diferentes ficam na ordem em que foram criados (com resolução de um
+segundo), então "mais recentes primeiro" por id vale entre shards, e o shard
+de origem sai dos bits baixos do id; só linhas movidas por
+``move_owner_shard`` precisam de busca nos demais shards. Ids menores que
+LEGACY_ID_LIMIT vêm do esquema anterior, em faixas ``índice << 40``.
+"""
+
+import asyncio
+import heapq
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+SHARD_INDEX_BITS = 4
+MAX_SHARDS = 1 << SHARD_INDEX_BITS
+# 2^16 ids por segundo em cada tabela de cada shard antes de o tique passar à
+# frente do relógio; com 4 bits de shard os ids cabem em 2^53 (números exatos
+# em JavaScript) por mais de 270 anos a partir de ID_EPOCH.
+TICK_BITS = 16
+ID_EPOCH = 1577836800  # 2020-01-01 UTC
+LEGACY_ID_BITS = 40
+LEGACY_ID_LIMIT = 1 << 46
+CACHE_KEY_PREFIX = "library:owner-shard:"
+FAN_OUT_CHUNK_SIZE = 500
+
+
+def get_shards():
+    return list(getattr(settings, "DATABASE_SHARDS", [DEFAULT_DB_ALIAS]))
+
+
+def is_sharded():
+    return len(get_shards()) > 1
+
+
+def is_sharded_model(model):
+    from library.models import ArchivedExchange, Book, BookExchange
+
+    return model in (Book, BookExchange, ArchivedExchange)
+
+
+def shard_for_owner(profile_id):
+    """Shard que guarda os livros do perfil, atribuindo um na primeira vez."""
+    shards = get_shards()
+    if len(shards) == 1:
+        return None
+
+    key = f"{CACHE_KEY_PREFIX}{profile_id}"
+    shard = cache.get(key)
+    if shard is None:
+        from library.models import OwnerShard
+
+        assignment, _ = OwnerShard.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+            profile_id=profile_id,
+            defaults={"shard": shards[profile_id % len(shards)]},
+        )
+        shard = assignment.shard
+        cache.set(key, shard, None)
+    return shard
+
+
+async def ashard_for_owner(profile_id):
+    """Versão assíncrona de shard_for_owner."""
+    shards = get_shards()
+    if len(shards) == 1:
+        return None
+
+    key = f"{CACHE_KEY_PREFIX}{profile_id}"
+    shard = await cache.aget(key)
+    if shard is None:
+        from library.models import OwnerShard
+
+        assignment, _ = await OwnerShard.objects.using(DEFAULT_DB_ALIAS).aget_or_create(
+            profile_id=profile_id,
+            defaults={"shard": shards[profile_id % len(shards)]},
+        )
+        shard = assignment.shard
+        await cache.aset(key, shard, None)
+    return shard
+
+
+def forget_owner_shard(profile_id):
+    cache.delete(f"{CACHE_KEY_PREFIX}{profile_id}")
+
+
+def shard_for_id(pk):
+    """Shard onde o id foi gerado (pode não ser o atual, se o dono mudou)."""
+    shards = get_shards()
+    pk = int(pk)
+    if pk < LEGACY_ID_LIMIT:
+        index = pk >> LEGACY_ID_BITS
+    else:
+        index = pk & (MAX_SHARDS - 1)
+    return shards[index] if index < len(shards) else shards[0]
+
+
+def locate(model, pk):
+    """
+    Shard que contém a linha ``pk``; levanta ``model.DoesNotExist`` se ela
+    não está em nenhum.
+    """
+    shards = get_shards()
+    if len(shards) == 1:
+        return None
+    origin = shard_for_id(pk)
+    candidates = [origin] + [alias for alias in shards if alias != origin]
+    for alias in candidates:
+        if model._base_manager.using(alias).filter(pk=pk).exists():
+            return alias
+    raise model.DoesNotExist(f"{model.__name__} {pk} não encontrado.")
+
+
+async def alocate(model, pk):
+    """Versão assíncrona de locate."""
+    shards = get_shards()
+    if len(shards) == 1:
+        return None
+    origin = shard_for_id(pk)
+    candidates = [origin] + [alias for alias in shards if alias != origin]
+    for alias in candidates:
+        if await model._base_manager.using(alias).filter(pk=pk).aexists():
+            return alias
+    raise model.DoesNotExist(f"{model.__name__} {pk} não encontrado.")
+
+
+def with_profiles(queryset, *fields):
+    """
+    Carrega os perfis relacionados: JOIN com um único banco, ou uma consulta
+    extra ao "default" por shard quando os perfis estão em outro banco.
+    """
+    if is_sharded():
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+def fan_out(build_queryset, key):
+    """
+    Executa ``build_queryset(alias)`` em todos os shards e devolve um iterador
+    que intercala os resultados, já ordenados de forma decrescente por
+    ``key``. Com um único shard é o iterador do próprio queryset, para que o
+    chamador não dependa da configuração.
+    """
+    shards = get_shards()
+    if len(shards) == 1:
+        return build_queryset(None).iterator(chunk_size=FAN_OUT_CHUNK_SIZE)
+    return heapq.merge(
+        *(
+            build_queryset(alias).iterator(chunk_size=FAN_OUT_CHUNK_SIZE)
+            for alias in shards
+        ),
+        key=key,
+        reverse=True,
+    )
+
+
+async def afan_out(build_queryset, key):
+    """
+    Versão assíncrona de fan_out: consulta os shards em paralelo com
+    aiterator() e devolve a lista já intercalada.
+    """
+
+    async def collect(alias):
+        queryset = build_queryset(alias)
+        return [obj async for obj in queryset.aiterator(chunk_size=FAN_OUT_CHUNK_SIZE)]
+
+    shards = get_shards()
+    if len(shards) == 1:
+        return await collect(None)
+    results = await asyncio.gather(*(collect(alias) for alias in shards))
+    return list(heapq.merge(*results, key=key, reverse=True))
+
+
+def allocate_ids(model, using, count=1):
+    """
+    Reserva ``count`` ids de ``model`` no shard ``using``, em ordem crescente.
+
+    Usado no lugar do AUTOINCREMENT quando há vários shards: linhas movidas de
+    outro shard mantêm seus ids sem empurrar a sequência local. O tique nunca
+    volta, mesmo que o relógio volte.
+    """
+    from library.models import ShardSequence
+
+    shards = get_shards()
+    if len(shards) > MAX_SHARDS:
+        raise ValueError(f"No máximo {MAX_SHARDS} shards.")
+    index = shards.index(using)
+    floor = int(time.time() - ID_EPOCH) << TICK_BITS
+    name = model._meta.db_table
+    sequences = ShardSequence.objects.using(using)
+    with transaction.atomic(using=using):
+        # O UPDATE vem antes da leitura para segurar o lock de escrita.
+        updated = sequences.filter(name=name).update(
+            last_value=Greatest(F("last_value"), floor - 1) + count
+        )
+        if not updated:
+            sequences.create(name=name, last_value=floor - 1 + count)
+        last = sequences.values_list("last_value", flat=True).get(name=name)
+    first = last - count + 1
+    return [(tick << SHARD_INDEX_BITS) | index for tick in range(first, last + 1)]
+
+
+@receiver(pre_save)
+def assign_sharded_id(sender, instance, raw=False, using=None, **kwargs):
+    if raw or instance.pk is not None or not is_sharded_model(sender):
+        return
+    if is_sharded():
+        (instance.pk,) = allocate_ids(sender, using)
+
+
+def move_owner(profile_id, target, batch_size=500):
+    """
+    Move livros e trocas de um dono para o shard ``target``.
+
+    Copia em lotes para o destino, troca o mapa e só então apaga a origem;
+    repetir o comando depois de uma falha completa a limpeza.
+    """
+    from library.models import ArchivedExchange, Book, BookExchange, OwnerShard
+
+    shards = get_shards()
+    if target not in shards:
+        raise ValueError(f"Shard desconhecido: {target}")
+
+    source = shard_for_owner(profile_id) or shards[0]
+    moved = 0
+    if source != target:
+        for model in (Book, BookExchange, ArchivedExchange):
+            rows = model._base_manager.using(source).filter(owner_id=profile_id)
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    moved += _copy_batch(model, batch, target)
+                    batch = []
+            moved += _copy_batch(model, batch, target)
+
+    OwnerShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        profile_id=profile_id, defaults={"shard": target}
+    )
+    forget_owner_shard(profile_id)
+
+    for alias in shards:
+        if alias == target:
+            continue
+        with transaction.atomic(using=alias):
+            BookExchange._base_manager.using(alias).filter(owner_id=profile_id).delete()
+            ArchivedExchange._base_manager.using(alias).filter(
+                owner_id=profile_id
+            ).delete()
+            Book._base_manager.using(alias).filter(owner_id=profile_id).delete()
+    return moved
+
+
+def _copy_batch(model, rows, target):
+    if not rows:
+        return 0
+    with transaction.atomic(using=target):
+        model._base_manager.using(target).bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
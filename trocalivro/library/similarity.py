@@ -0,0 +1,345 @@
+"""
+Livros parecidos pelo texto: TF-IDF de título, autor, gênero e descrição.
+
+A reconstrução completa (comando build_similarity_index, toda noite) gera a
+matriz livro × termo normalizada em float32 e a grava em arquivos .npy
+numa pasta versionada de SIMILARITY_INDEX_DIR. Os workers abrem os arrays
+com ``mmap_mode="r"``: vários processos compartilham as mesmas páginas do
+cache do sistema em vez de cada um carregar sua cópia. Os K vizinhos de
+cada livro saem de produtos esparsos em blocos de linhas (cosseno, já que
+as linhas têm norma 1) e vão para SimilarBook, que a página lê numa única
+consulta pelo índice.
+
+Livros novos entram de forma incremental (job index_new_book): o vetor é
+calculado com o vocabulário e o IDF da última reconstrução, comparado com
+a matriz, e guardado num segmento "delta" pequeno até a próxima
+reconstrução. O livro ganha sua lista e entra nas listas dos vizinhos em
+que supera o último colocado.
+"""
+
+import json
+import os
+import shutil
+from collections import Counter
+from functools import lru_cache
+from operator import attrgetter
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from scipy import sparse
+
+from library.locks import file_lock
+from library.models import Book, SimilarBook, StatusBook
+from library.recommendations import (
+    concat_parts,
+    recommendation_rows,
+    replace_table,
+    top_n,
+)
+from library.sharding import fan_out
+from library.wishlists import words
+
+# Peso de cada campo na contagem de termos: título e autor dizem mais sobre
+# o livro que uma palavra solta da descrição.
+FIELD_WEIGHTS = (("title", 3), ("author", 2), ("genre", 2), ("description", 1))
+TEXT_FIELDS = [field for field, _ in FIELD_WEIGHTS]
+# Termos presentes em mais da metade dos livros não distinguem nada (e
+# deixariam o produto de matrizes quase denso). Só vale em catálogos maiores.
+MAX_DF = 0.5
+MIN_DOCS_FOR_MAX_DF = 50
+BLOCK_SIZE = 256
+ARRAYS = ("book_ids", "data", "indices", "indptr")
+
+
+def index_dir():
+    default = settings.BASE_DIR / "similarity_index"
+    return Path(getattr(settings, "SIMILARITY_INDEX_DIR", default))
+
+
+def _top_k():
+    return getattr(settings, "SIMILAR_BOOKS_TOP_K", 8)
+
+
+def term_counts(fields):
+    """Contagem ponderada das palavras de um livro (dict campo → texto)."""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for word in words(fields.get(field)):
+            counts[word] += weight
+    return counts
+
+
+def fit(documents):
+    """Vocabulário ``{termo: coluna}`` e IDF suavizado (float32)."""
+    df = Counter(term for counts in documents for term in counts)
+    total = len(documents)
+    limit = MAX_DF * total if total >= MIN_DOCS_FOR_MAX_DF else total
+    terms = sorted(term for term, count in df.items() if count <= limit)
+    vocabulary = {term: col for col, term in enumerate(terms)}
+    frequencies = np.array([df[term] for term in terms], dtype=np.float32)
+    idf = (np.log((1 + total) / (1 + frequencies)) + 1).astype(np.float32)
+    return vocabulary, idf
+
+
+def transform(documents, vocabulary, idf):
+    """Matriz CSR float32 com as linhas TF-IDF normalizadas (norma 1)."""
+    rows, cols, counts = [], [], []
+    for row, document in enumerate(documents):
+        for term, count in document.items():
+            col = vocabulary.get(term)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+                counts.append(count)
+    cols = np.array(cols, dtype=np.int64)
+    # TF sublinear: repetir a palavra ajuda, mas cada vez menos.
+    values = (1 + np.log(np.array(counts, dtype=np.float32))) * idf[cols]
+    matrix = sparse.csr_matrix(
+        (values.astype(np.float32), (rows, cols)),
+        shape=(len(documents), len(vocabulary)),
+        dtype=np.float32,
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags((1 / norms).astype(np.float32)) @ matrix).tocsr()
+
+
+def batched_top_k(matrix, k, allowed, block_size=BLOCK_SIZE):
+    """
+    Os ``k`` vizinhos de cada linha pelo cosseno, calculando ``bloco @ Mᵀ``
+    para no máximo ``block_size`` linhas por vez.
+    """
+    transposed = matrix.T.tocsr()
+    parts = []
+    for start in range(0, matrix.shape[0], block_size):
+        block = (matrix[start : start + block_size] @ transposed).tocoo()
+        rows = block.row + start
+        keep = (rows != block.col) & allowed[block.col] & (block.data > 0)
+        parts.append(top_n(rows[keep], block.col[keep], block.data[keep], k))
+    return concat_parts(parts)
+
+
+class SimilarityIndex:
+    """Uma versão gravada do índice, com a matriz aberta por mmap."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.vocabulary = json.loads((self.path / "vocabulary.json").read_text())
+        self.idf = np.load(self.path / "idf.npy")
+        arrays = {
+            name: np.load(self.path / f"{name}.npy", mmap_mode="r") for name in ARRAYS
+        }
+        self.book_ids = arrays["book_ids"]
+        self.matrix = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=(len(self.book_ids), len(self.vocabulary)),
+            copy=False,
+        )
+
+    @property
+    def delta_path(self):
+        return self.path / "delta.npz"
+
+    def load_delta(self):
+        """Livros incluídos depois da reconstrução: (ids, matriz CSR)."""
+        if not self.delta_path.exists():
+            return np.array([], dtype=np.int64), sparse.csr_matrix(
+                (0, len(self.vocabulary)), dtype=np.float32
+            )
+        with np.load(self.delta_path) as delta:
+            matrix = sparse.csr_matrix(
+                (delta["data"], delta["indices"], delta["indptr"]),
+                shape=(len(delta["book_ids"]), len(self.vocabulary)),
+            )
+            return delta["book_ids"], matrix
+
+    def save_delta(self, book_ids, matrix):
+        temporary = self.path / "delta.tmp.npz"
+        np.savez(
+            temporary,
+            book_ids=book_ids,
+            data=matrix.data,
+            indices=matrix.indices,
+            indptr=matrix.indptr,
+        )
+        os.replace(temporary, self.delta_path)
+
+    def delta_lock(self):
+        # Vários workers podem incluir livros ao mesmo tempo.
+        return file_lock(self.path / "delta.lock")
+
+
+@lru_cache(maxsize=2)
+def _open(path):
+    return SimilarityIndex(path)
+
+
+def load_index():
+    """Versão atual do índice, ou None se ele ainda não foi construído."""
+    try:
+        version = (index_dir() / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return _open(str(index_dir() / version))
+
+
+def save_index(vocabulary, idf, book_ids, matrix):
+    """Grava uma nova versão e a torna a atual; apaga as anteriores."""
+    root = index_dir()
+    version = timezone.now().strftime("%Y%m%d%H%M%S%f")
+    path = root / version
+    path.mkdir(parents=True)
+    (path / "vocabulary.json").write_text(json.dumps(vocabulary))
+    np.save(path / "idf.npy", idf)
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    np.save(path / "book_ids.npy", np.asarray(book_ids, dtype=np.int64))
+    np.save(path / "data.npy", matrix.data.astype(np.float32))
+    np.save(path / "indices.npy", matrix.indices.astype(index_dtype))
+    np.save(path / "indptr.npy", matrix.indptr.astype(index_dtype))
+
+    temporary = root / "CURRENT.tmp"
+    temporary.write_text(version)
+    os.replace(temporary, root / "CURRENT")
+    # Processos que ainda têm a versão antiga aberta por mmap continuam
+    # lendo os arquivos apagados até fecharem.
+    for old in root.iterdir():
+        if old.is_dir() and old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def _catalog():
+    rows = fan_out(
+        lambda alias: (
+            Book.objects.using(alias)
+            .order_by("-id")
+            .values_list("id", "status", "image", *TEXT_FIELDS)
+        ),
+        key=lambda row: row[0],
+    )
+    ids, allowed, meta, documents = [], [], [], []
+    for book_id, status, image, *texts in rows:
+        fields = dict(zip(TEXT_FIELDS, texts))
+        ids.append(book_id)
+        allowed.append(status != StatusBook.UNAVAILABLE.value)
+        meta.append((fields["title"], fields["author"] or "", image or ""))
+        documents.append(term_counts(fields))
+    return np.array(ids, dtype=np.int64), np.array(allowed, dtype=bool), meta, documents
+
+
+def rebuild_index():
+    """Reconstrói o índice e a tabela SimilarBook; devolve quantas linhas gravou."""
+    ids, allowed, meta, documents = _catalog()
+    vocabulary, idf = fit(documents)
+    matrix = transform(documents, vocabulary, idf)
+    save_index(vocabulary, idf, ids, matrix)
+
+    rows, cols, scores, ranks = batched_top_k(matrix, _top_k(), allowed)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        replace_table(
+            SimilarBook,
+            recommendation_rows(
+                SimilarBook, "book_id", ids[rows], ranks, cols, scores, meta, ids
+            ),
+        )
+    return len(rows)
+
+
+def _entry(book_id, target, score):
+    return SimilarBook(
+        book_id=book_id,
+        recommended_id=target.id,
+        score=score,
+        title=target.title,
+        author=target.author or "",
+        image=target.image.name or "",
+    )
+
+
+def _rewrite(book_id, entries):
+    """Regrava a lista de um livro, em ordem de nota, com os ranks refeitos."""
+    entries = sorted(entries, key=attrgetter("score"), reverse=True)[: _top_k()]
+    for rank, entry in enumerate(entries):
+        entry.pk = None
+        entry.book_id = book_id
+        entry.rank = rank
+    manager = SimilarBook.objects.using(DEFAULT_DB_ALIAS)
+    manager.filter(book_id=book_id).delete()
+    manager.bulk_create(entries)
+
+
+def add_book(book):
+    """Inclui um livro novo no índice atual e nas listas de parecidos."""
+    index = load_index()
+    if index is None:
+        return []
+    fields = {field: getattr(book, field) for field in TEXT_FIELDS}
+    vector = transform([term_counts(fields)], index.vocabulary, index.idf)
+    if not vector.nnz:
+        return []
+
+    with index.delta_lock():
+        delta_ids, delta = index.load_delta()
+        keep = delta_ids != book.id
+        delta_ids, delta = delta_ids[keep], delta[np.flatnonzero(keep)]
+        ids = np.concatenate([index.book_ids, delta_ids])
+        scores = np.concatenate(
+            [
+                (index.matrix @ vector.T).toarray().ravel(),
+                (delta @ vector.T).toarray().ravel(),
+            ]
+        )
+        index.save_delta(
+            np.append(delta_ids, book.id), sparse.vstack([delta, vector]).tocsr()
+        )
+
+    scores[ids == book.id] = 0
+    k = _top_k()
+    best = np.argsort(-scores)[:k]
+    best = best[scores[best] > 0]
+    neighbour_scores = dict(zip(ids[best].tolist(), scores[best].tolist()))
+    if not neighbour_scores:
+        return []
+
+    neighbours = {
+        target.id: target
+        for target in fan_out(
+            lambda alias: (
+                Book.objects.using(alias)
+                .filter(id__in=list(neighbour_scores))
+                .only("id", "title", "author", "image", "status")
+                .order_by("-id")
+            ),
+            key=attrgetter("id"),
+        )
+    }
+    lists = {}
+    for entry in SimilarBook.objects.using(DEFAULT_DB_ALIAS).filter(
+        book_id__in=list(neighbours)
+    ):
+        lists.setdefault(entry.book_id, []).append(entry)
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        _rewrite(
+            book.id,
+            [
+                _entry(book.id, target, neighbour_scores[target.id])
+                for target in neighbours.values()
+                if target.status != StatusBook.UNAVAILABLE.value
+            ],
+        )
+        for target_id, score in neighbour_scores.items():
+            if target_id not in neighbours:
+                continue
+            current = [
+                entry
+                for entry in lists.get(target_id, [])
+                if entry.recommended_id != book.id
+            ]
+            if len(current) >= k and score <= min(entry.score for entry in current):
+                continue
+            _rewrite(target_id, current + [_entry(target_id, book, score)])
+    return list(neighbour_scores)
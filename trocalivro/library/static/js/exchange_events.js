@@ -0,0 +1,64 @@
+// Atualiza as páginas de solicitações com os eventos de troca (SSE),
+// sem recarregar a página inteira.
+(function () {
+  const container = document.querySelector(".books-container[data-events-url]");
+  if (!container || !container.dataset.eventsUrl || !window.EventSource) {
+    return;
+  }
+
+  const labels = {
+    "IN EXCHANGE": ["status-pending", "⏳ Aguardando resposta"],
+    UNAVAILABLE: ["status-accepted", "✓ Solicitação aceita"],
+    AVAILABLE: ["status-rejected", "✗ Solicitação recusada"],
+    EXPIRED: ["status-rejected", "⌛ Solicitação expirada"],
+  };
+
+  function renderStatus(card, status) {
+    const form = card.querySelector(".book-response-form");
+    if (!labels[status] || (form && status === "IN EXCHANGE")) {
+      return;
+    }
+    if (form) {
+      form.remove();
+    }
+    let box = card.querySelector(".exchange-status");
+    if (!box) {
+      box = document.createElement("div");
+      box.className = "exchange-status";
+      card.appendChild(box);
+    }
+    const span = document.createElement("span");
+    span.className = labels[status][0];
+    span.textContent = labels[status][1];
+    box.replaceChildren(span);
+  }
+
+  async function reloadCards() {
+    // Troca nova: busca a página e substitui só a lista de cartões.
+    const response = await fetch(window.location.href, { credentials: "same-origin" });
+    if (!response.ok) {
+      return;
+    }
+    const page = new DOMParser().parseFromString(await response.text(), "text/html");
+    const fresh = page.querySelector(".books-container");
+    if (fresh) {
+      container.replaceChildren(...fresh.childNodes);
+    }
+  }
+
+  function handle(message) {
+    const event = JSON.parse(message.data);
+    const card = container.querySelector(
+      `.user-book[data-exchange-id="${event.exchange_id}"]`
+    );
+    if (card) {
+      renderStatus(card, event.status);
+    } else {
+      reloadCards();
+    }
+  }
+
+  const source = new EventSource(container.dataset.eventsUrl);
+  source.addEventListener("exchange.created", handle);
+  source.addEventListener("exchange.updated", handle);
+})();
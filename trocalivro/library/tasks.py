@@ -0,0 +1,127 @@
+"""Tarefas executadas pelo worker da fila (library.jobs)."""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from library.changes import record_book
+from library.covers import resize_image
+from library.jobs import job
+from library.models import Book, ChangeAction
+from library.sharding import locate
+
+
+@job()
+def process_book_cover(book_id):
+    """Reduz capas grandes para BOOK_COVER_MAX_SIZE."""
+    try:
+        book = Book.objects.using(locate(Book, book_id)).get(pk=book_id)
+    except Book.DoesNotExist:
+        # Livro apagado antes do processamento: nada a fazer.
+        return
+    if not book.image:
+        return
+
+    max_size = tuple(getattr(settings, "BOOK_COVER_MAX_SIZE", (600, 900)))
+    with book.image.open("rb") as source:
+        image = Image.open(source)
+        image.load()
+    resized = resize_image(image, max_size)
+    if resized is None:
+        return
+
+    # A capa reduzida vai para um arquivo novo (o nome que o storage devolve)
+    # e a antiga só é apagada depois que o livro aponta para ela; um save que
+    # falhe deixa a capa original intacta.
+    storage, old_name = book.image.storage, book.image.name
+    new_name = storage.save(old_name, ContentFile(resized))
+    if new_name == old_name:
+        return
+    with transaction.atomic(using=book._state.db):
+        # Se a capa foi trocada durante o processamento, a nova fica.
+        replaced = (
+            Book.objects.using(book._state.db)
+            .filter(pk=book.pk, image=old_name)
+            .update(image=new_name)
+        )
+        if replaced:
+            book.image.name = new_name
+            record_book(book, ChangeAction.UPDATED)
+    storage.delete(old_name if replaced else new_name)
+
+
+@job(name="library.compute_recommendations", priority=-2, max_attempts=2)
+def compute_recommendations():
+    """Recalcula as recomendações (agendada toda noite pelo cron)."""
+    # NumPy e SciPy só são importados por quem executa o cálculo.
+    from library.recommendations import compute_recommendations as compute
+
+    return compute()
+
+
+@job(name="library.index_new_book", priority=-1)
+def index_new_book(book_id):
+    """Inclui um livro novo no índice de livros parecidos (library.similarity)."""
+    from library.similarity import add_book
+
+    try:
+        book = Book.objects.using(locate(Book, book_id)).get(pk=book_id)
+    except Book.DoesNotExist:
+        return []
+    return add_book(book)
+
+
+@job(name="library.rebuild_similarity_index", priority=-2, max_attempts=2)
+def rebuild_similarity_index():
+    """Reconstrói o índice de livros parecidos (agendada toda noite pelo cron)."""
+    from library.similarity import rebuild_index
+
+    return rebuild_index()
+
+
+@job(name="library.index_imported_books", priority=-1)
+def index_imported_books(book_ids):
+    """Listas de desejos e índice de parecidos para um lote importado."""
+    from library.wishlists import match_new_book
+
+    for book_id in book_ids:
+        match_new_book(book_id)
+        index_new_book(book_id)
+
+
+@job(name="library.import_books", max_attempts=3)
+def import_books(import_id):
+    """Importa um catálogo enviado pela página da equipe (library.imports)."""
+    from library.imports import run_import
+    from library.models import BookImport
+
+    try:
+        book_import = BookImport.objects.select_related("owner").get(pk=import_id)
+    except BookImport.DoesNotExist:
+        return None
+    # Uma nova tentativa depois de falha continua do ponto de controle.
+    book_import = run_import(
+        book_import, batch_size=getattr(settings, "BOOK_IMPORT_BATCH_SIZE", 500)
+    )
+    return {"imported": book_import.imported, "failed": book_import.failed}
+
+
+@job(name="library.expire_stale_requests", priority=-1, max_attempts=2)
+def expire_stale_requests(repeat=True):
+    """
+    Expira as solicitações de troca vencidas (library.expiry) e, com
+    ``repeat``, agenda a próxima varredura para EXCHANGE_EXPIRY_INTERVAL.
+    """
+    from library.expiry import expire_stale_requests as expire
+
+    expired = expire()
+    interval = getattr(settings, "EXCHANGE_EXPIRY_INTERVAL", 3600)
+    if repeat and interval:
+        expire_stale_requests.enqueue(
+            repeat=True, run_at=timezone.now() + timedelta(seconds=interval)
+        )
+    return expired
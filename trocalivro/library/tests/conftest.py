@@ -1,6 +1,75 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save
+from django.test import override_settings
 from pytest_factoryboy import register
-from .factories import UserFactory, ProfileFactory, BookFactory
+
+from library.models import OwnerShard, Profile
+
+from .factories import BookFactory, ProfileFactory, UserFactory
 
 register(UserFactory)
 register(ProfileFactory)
 register(BookFactory)
+
+
+def pytest_collection_modifyitems(items):
+    # Com shards (TROCALIVRO_SHARDS), livros e trocas ficam em outros bancos:
+    # os testes com banco precisam de acesso a todos eles.
+    if len(settings.DATABASE_SHARDS) < 2:
+        return
+    for item in items:
+        marker = item.get_closest_marker("django_db")
+        if marker is not None and "databases" not in marker.kwargs:
+            item.add_marker(
+                pytest.mark.django_db(
+                    *marker.args, **marker.kwargs, databases="__all__"
+                ),
+                append=False,
+            )
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # Uploads dos testes vão para um diretório temporário, não para static/.
+    settings.MEDIA_ROOT = tmp_path / "media"
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(scope="session", autouse=True)
+def local_cache():
+    # Cache em memória nos testes mesmo com TROCALIVRO_CACHE_BACKEND; vale já
+    # na criação dos bancos de teste (createcachetable).
+    with override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    ):
+        yield
+
+
+def _owner_in_default_shard(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        OwnerShard.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+            profile_id=instance.pk, defaults={"shard": DEFAULT_DB_ALIAS}
+        )
+
+
+@pytest.fixture(autouse=True)
+def owners_in_default_shard():
+    # Com shards, os testes em geral rodam o roteamento, o fan-out e os ids
+    # por shard, mas com os donos no "default", onde as consultas diretas dos
+    # testes os encontram; test_sharding distribui os donos entre os shards.
+    if len(settings.DATABASE_SHARDS) < 2:
+        yield
+        return
+    post_save.connect(_owner_in_default_shard, sender=Profile)
+    yield
+    post_save.disconnect(_owner_in_default_shard, sender=Profile)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Os bancos voltam ao estado inicial a cada teste; o cache também.
+    yield
+    cache.clear()
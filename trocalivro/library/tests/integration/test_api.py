@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.models import StatusBook
+from library.sharding import is_sharded
+
+
+@pytest.fixture
+def books(book_factory):
+    titles = ["Dom Casmurro", "Iracema", "O Cortiço", "Vidas Secas", "Senhora"]
+    return [book_factory(title=title, author="Autor") for title in titles]
+
+
+def get_json(client, url, **params):
+    response = client.get(url, params)
+    return response.status_code, response.json()
+
+
+@pytest.mark.django_db
+def test_cursor_pages_cover_all_books_with_one_query_each(
+    client, books, django_assert_num_queries
+):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        with django_assert_num_queries(1):
+            status, page = get_json(client, reverse("api-books"), **params)
+        assert status == 200
+        seen += [row["id"] for row in page["results"]]
+        cursor = page["next"]
+        if cursor is None:
+            break
+
+    assert seen == sorted((book.id for book in books), reverse=True)
+
+
+@pytest.mark.django_db
+def test_fields_shape_the_select(client, books):
+    with CaptureQueriesContext(connection) as queries:
+        status, page = get_json(client, reverse("api-books"), fields="title")
+
+    assert status == 200
+    assert set(page["results"][0]) == {"id", "created_at", "title"}
+    sql = queries.captured_queries[-1]["sql"]
+    assert '"title"' in sql
+    assert '"description"' not in sql
+
+
+@pytest.mark.django_db
+def test_status_is_sent_as_label(client, books):
+    _, page = get_json(client, reverse("api-books"), fields="status", limit=1)
+    _, book = get_json(
+        client, reverse("api-book-detail", args=[books[0].id]), fields="status"
+    )
+
+    assert page["results"][0]["status"] == "AVAILABLE"
+    assert book["status"] == "AVAILABLE"
+
+
+@pytest.mark.django_db
+def test_search_and_bad_parameters(client, books):
+    _, page = get_json(client, reverse("api-books"), q="cortiço", fields="title")
+    bad_field, _ = get_json(client, reverse("api-books"), fields="title,password")
+    bad_cursor, error = get_json(client, reverse("api-books"), cursor="abc")
+
+    assert [row["title"] for row in page["results"]] == ["O Cortiço"]
+    assert bad_field == 400
+    assert (bad_cursor, error) == (400, {"error": "Cursor inválido."})
+
+
+@pytest.mark.django_db
+def test_book_detail(client, books, django_assert_num_queries):
+    # Com vários shards, locate() procura o shard do livro antes.
+    with django_assert_num_queries(2 if is_sharded() else 1):
+        status, book = get_json(
+            client, reverse("api-book-detail", args=[books[0].id]), fields="title,image"
+        )
+    missing, _ = get_json(client, reverse("api-book-detail", args=[999999]))
+
+    assert status == 200
+    assert book["title"] == "Dom Casmurro"
+    assert book["image"].endswith("images/no-image.png")
+    assert missing == 404
+
+
+@pytest.mark.django_db
+def test_request_and_respond_to_exchange(client, books, profile_factory):
+    requester = profile_factory()
+    book = books[0]
+
+    anonymous = client.post(reverse("api-book-request", args=[book.id]))
+    client.force_login(requester.user)
+    created = client.post(reverse("api-book-request", args=[book.id]))
+    duplicate = client.post(reverse("api-book-request", args=[book.id]))
+    exchange_id = created.json()["id"]
+    stranger = client.post(
+        reverse("api-exchange-respond", args=[exchange_id]),
+        json.dumps({"action": "accept"}),
+        content_type="application/json",
+    )
+    client.force_login(book.owner.user)
+    accepted = client.post(
+        reverse("api-exchange-respond", args=[exchange_id]),
+        json.dumps({"action": "accept", "message": "Combinado!"}),
+        content_type="application/json",
+    )
+
+    assert anonymous.status_code == 401
+    assert created.status_code == 201
+    assert created.json()["status"] == StatusBook.IN_EXCHANGE.label
+    assert duplicate.status_code == 400
+    assert stranger.status_code == 400
+    assert accepted.status_code == 200
+    assert accepted.json()["status"] == "UNAVAILABLE"
+    assert accepted.json()["message"] == "Combinado!"
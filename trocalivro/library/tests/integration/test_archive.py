@@ -0,0 +1,159 @@
+from datetime import timedelta
+from functools import partial
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from library.archive import archive_closed_exchanges
+from library.changes import changes_since
+from library.exports import exchange_records
+from library.models import ArchivedExchange, BookExchange, StatusBook
+from library.services.exchange_service import (
+    create_exchange_request,
+    get_received_history,
+    get_received_page,
+    get_sent_history,
+    get_sent_page,
+    iter_exchange_history,
+    respond_to_exchange_request,
+)
+from library.services.rating_service import rate_exchange
+from library.sharding import is_sharded
+
+
+@pytest.fixture
+def exchanges(profile_factory, book_factory):
+    """Cinco trocas do mesmo par: as três primeiras encerradas há um ano."""
+    owner, requester = profile_factory(), profile_factory()
+    created = []
+    for n in range(5):
+        book = book_factory(owner=owner, title=f"Livro {n}", author="Autor")
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+        if n < 4:
+            respond_to_exchange_request(exchange.id, owner, "reject")
+        created.append(exchange)
+    BookExchange.objects.filter(id__in=[e.id for e in created[:3]]).update(
+        closed_at=timezone.now() - timedelta(days=365)
+    )
+    return owner, requester, created
+
+
+@pytest.mark.django_db
+def test_closed_exchanges_move_to_the_archive(exchanges):
+    owner, requester, created = exchanges
+
+    assert archive_closed_exchanges(batch_size=2) == 3
+    assert archive_closed_exchanges() == 0
+
+    old = [e.id for e in created[:3]]
+    assert not BookExchange.objects.filter(id__in=old).exists()
+    archived = ArchivedExchange.objects.get(id=old[0])
+    assert (archived.book_title, archived.book_author) == ("Livro 0", "Autor")
+    assert archived.status == StatusBook.AVAILABLE.value
+    assert archived.closed_at < timezone.now() - timedelta(days=300)
+    # As caixas leem só a tabela quente.
+    assert [e.id for e in get_sent_page(requester, "rejected")[0]] == [created[3].id]
+    assert [e.id for e in get_received_page(owner, "rejected")[0]] == [created[3].id]
+
+
+@pytest.mark.django_db
+def test_archived_exchanges_are_synced_as_deleted(exchanges):
+    _, requester, created = exchanges
+    _, cursor, _ = changes_since(None, ["id"], profile_id=requester.id)
+
+    archive_closed_exchanges()
+    changes, _, _ = changes_since(cursor, ["id"], profile_id=requester.id)
+
+    assert sorted(changes["exchanges"]["deleted"]) == sorted(e.id for e in created[:3])
+    assert changes["exchanges"]["updated"] == []
+
+
+@pytest.mark.django_db
+def test_archived_exchange_can_still_be_rated(profile_factory, book_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = book_factory(owner=owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    respond_to_exchange_request(exchange.id, owner, "accept")
+    BookExchange.objects.filter(id=exchange.id).update(
+        closed_at=timezone.now() - timedelta(days=365)
+    )
+    archive_closed_exchanges()
+
+    rating = rate_exchange(exchange.id, requester, 4)
+
+    assert (rating.exchange_id, rating.rated_id) == (exchange.id, owner.id)
+    owner.refresh_from_db()
+    assert owner.rating_count == 1
+
+
+@pytest.mark.django_db
+def test_pending_exchanges_are_never_archived(exchanges):
+    _, _, created = exchanges
+
+    call_command("archive_exchanges", days=0)
+
+    assert list(BookExchange.objects.values_list("id", flat=True)) == [created[4].id]
+
+
+@pytest.mark.django_db
+def test_history_pages_merge_hot_and_archive(
+    exchanges, django_assert_num_queries, django_assert_max_num_queries
+):
+    owner, requester, created = exchanges
+    archive_closed_exchanges()
+    # Tabela quente e arquivo; com shards, os perfis de cada uma vêm do
+    # "default" numa consulta à parte (que não ocorre se a página é vazia).
+    if is_sharded():
+        page_queries = partial(django_assert_max_num_queries, 4)
+    else:
+        page_queries = partial(django_assert_num_queries, 2)
+
+    seen, before = [], None
+    while True:
+        with page_queries():
+            rows, before = get_sent_history(requester, before=before, limit=2)
+        seen += [(row.id, row.book.title, row.owner.firstname) for row in rows]
+        if before is None:
+            break
+    received, _ = get_received_history(owner, limit=10)
+
+    expected = [e.id for e in reversed(created)]
+    assert [row_id for row_id, _, _ in seen] == expected
+    assert {name for _, _, name in seen} == {owner.firstname}
+    assert seen[-1][1] == "Livro 0"
+    assert [row.id for row in received] == expected
+
+
+@pytest.mark.django_db
+def test_export_includes_archived_exchanges(exchanges):
+    _, requester, created = exchanges
+    archive_closed_exchanges()
+
+    records = list(exchange_records(iter_exchange_history(requester), requester))
+
+    assert [record["id"] for record in records] == [e.id for e in reversed(created)]
+    assert records[-1]["book_title"] == "Livro 0"
+    assert records[-1]["status"] == "AVAILABLE"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("url_name", "profile_index"), [("send-books", 1), ("received-books", 0)]
+)
+def test_history_tab_lists_archived_exchanges(
+    client, exchanges, url_name, profile_index
+):
+    archive_closed_exchanges()
+    client.force_login(exchanges[profile_index].user)
+
+    response = client.get(reverse(url_name), {"tab": "all"})
+
+    assert response.status_code == 200
+    assert [e.id for e in response.context["exchanges"]] == [
+        e.id for e in reversed(exchanges[2])
+    ]
+    assert "Livro 0" in response.content.decode()
+    pending = client.get(reverse(url_name))
+    assert [e.id for e in pending.context["exchanges"]] == [exchanges[2][4].id]
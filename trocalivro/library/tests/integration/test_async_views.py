@@ -0,0 +1,148 @@
+import datetime
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import Http404
+from django.test import RequestFactory
+
+from library import async_views
+from library.models import BookExchange, StatusBook
+from library.services.exchange_service import create_exchange_request
+
+
+def build_request(method, path, user=None, data=None):
+    request = getattr(RequestFactory(), method)(path, data or {})
+    request.user = user or AnonymousUser()
+    request.session = SessionStore()
+    request._messages = FallbackStorage(request)
+
+    async def auser():
+        return request.user
+
+    request.auser = auser
+    return request
+
+
+def call(view, request, *args):
+    return async_to_sync(view)(request, *args)
+
+
+def book_titles(response):
+    return [book.title for book in response.context_data["book_list"]]
+
+
+@pytest.fixture(autouse=True)
+def capture_context(monkeypatch):
+    # As views devolvem HttpResponse; guarda o contexto para as asserções.
+    def render(request, template_name, context):
+        response = original(request, template_name, context)
+        response.context_data = context
+        return response
+
+    original = async_views.render
+    monkeypatch.setattr(async_views, "_render", async_views.sync_to_async(render))
+
+
+@pytest.mark.django_db
+def test_index_lists_newest_books_first(book_factory):
+    today = datetime.date.today()
+    book_factory(title="Antigo", created_at=today - datetime.timedelta(days=2))
+    book_factory(title="Novo", created_at=today)
+
+    response = call(async_views.index, build_request("get", "/"))
+
+    assert response.status_code == 200
+    assert book_titles(response) == ["Novo", "Antigo"]
+    assert response.context_data["num_books"] == 2
+
+
+@pytest.mark.django_db
+def test_search_book_filters_by_title_or_author(book_factory):
+    book_factory(title="Dom Casmurro", author="Machado de Assis")
+    book_factory(title="Iracema", author="José de Alencar")
+
+    response = call(
+        async_views.search_book, build_request("get", "/", data={"q": "Machado"})
+    )
+
+    assert book_titles(response) == ["Dom Casmurro"]
+
+
+@pytest.mark.django_db
+def test_book_detail_view_raises_404_for_missing_book():
+    with pytest.raises(Http404):
+        call(async_views.book_detail_view, build_request("get", "/"), 999)
+
+
+@pytest.mark.django_db
+def test_book_detail_view_includes_logged_profile(
+    user_factory, profile_factory, book_factory
+):
+    user = user_factory()
+    profile = profile_factory(user=user)
+    book = book_factory()
+
+    response = call(
+        async_views.book_detail_view, build_request("get", "/", user), book.id
+    )
+
+    assert response.context_data["book_info"]["book"] == book
+    assert response.context_data["book_info"]["user"] == profile
+
+
+@pytest.mark.django_db
+def test_send_books_redirects_anonymous_users():
+    response = call(async_views.send_books, build_request("get", "/profile/sends"))
+
+    assert response.status_code == 302
+    assert "/login" in response.url
+
+
+@pytest.mark.django_db
+def test_send_and_received_books_list_requests(
+    user_factory, profile_factory, book_factory
+):
+    requester_user, owner_user = user_factory(), user_factory()
+    requester = profile_factory(user=requester_user)
+    owner = profile_factory(user=owner_user)
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    sent = call(async_views.send_books, build_request("get", "/", requester_user))
+    received = call(async_views.received_books, build_request("get", "/", owner_user))
+
+    assert sent.context_data["exchanges"][0].id == exchange.id
+    assert sent.context_data["exchanges"][0].get_status_display() == "IN EXCHANGE"
+    assert sent.context_data["tabs"][0] == {
+        "key": "pending",
+        "label": "Pendentes",
+        "count": 1,
+    }
+    assert received.context_data["exchanges"][0].book == book
+
+
+@pytest.mark.django_db
+def test_received_books_post_still_responds_to_request(
+    user_factory, profile_factory, book_factory
+):
+    owner_user = user_factory()
+    owner = profile_factory(user=owner_user)
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    exchange = create_exchange_request(
+        book_id=book.id, requester_profile=profile_factory()
+    )
+
+    request = build_request(
+        "post",
+        "/profile/received",
+        owner_user,
+        data={"exchange_id": exchange.id, "action": "reject"},
+    )
+    response = call(async_views.received_books, request)
+
+    assert response.status_code == 302
+    exchange = BookExchange.objects.get(pk=exchange.pk)
+    assert exchange.status == StatusBook.AVAILABLE
@@ -0,0 +1,127 @@
+import pytest
+from django.db import transaction
+from django.urls import reverse
+
+from library.changes import changes_since
+from library.models import ChangeLog
+from library.services.books_management_service import add_new_book, delete_book
+from library.services.exchange_service import (
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+
+FIELDS = ["id", "title", "status"]
+
+
+def book_data(title):
+    return {"title": title, "description": "-", "author": "Autor", "genre": "Romance"}
+
+
+def sync(positions, profile=None, **kwargs):
+    profile_id = profile.id if profile else None
+    return changes_since(positions, FIELDS, profile_id=profile_id, **kwargs)
+
+
+@pytest.mark.django_db
+def test_changes_since_cursor_collapse_per_object(profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    old = add_new_book(book_data("Antigo"), owner)
+    _, cursor, _ = sync(None)
+
+    new = add_new_book(book_data("Novo"), owner)
+    exchange = create_exchange_request(book_id=old.id, requester_profile=requester)
+    changes, cursor, more = sync(cursor, requester)
+
+    assert [row["title"] for row in changes["books"]["created"]] == ["Novo"]
+    assert [row["id"] for row in changes["books"]["updated"]] == [old.id]
+    assert [row["id"] for row in changes["exchanges"]["created"]] == [exchange.id]
+    assert not more
+
+    respond_to_exchange_request(exchange.id, owner, "reject")
+    changes, cursor, _ = sync(cursor, requester)
+
+    assert [row["id"] for row in changes["exchanges"]["updated"]] == [exchange.id]
+    assert sync(cursor, requester)[0]["books"] == {
+        "created": [],
+        "updated": [],
+        "deleted": [],
+    }
+    assert new.id not in {row["id"] for row in changes["books"]["updated"]}
+
+
+@pytest.mark.django_db
+def test_exchanges_only_reach_the_people_involved(profile_factory):
+    owner, requester, stranger = profile_factory(), profile_factory(), profile_factory()
+    book = add_new_book(book_data("Iracema"), owner)
+    _, cursor, _ = sync(None)
+    create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    for profile, expected in ((owner, 1), (requester, 1), (stranger, 0), (None, 0)):
+        changes, _, _ = sync(cursor, profile)
+        assert len(changes["exchanges"]["created"]) == expected
+
+
+@pytest.mark.django_db
+def test_deleted_book_leaves_tombstones(profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = add_new_book(book_data("Senhora"), owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    _, cursor, _ = sync(None)
+
+    delete_book(book.id, owner)
+    changes, _, _ = sync(cursor, requester)
+
+    assert changes["books"]["deleted"] == [book.id]
+    assert changes["exchanges"]["deleted"] == [exchange.id]
+
+
+@pytest.mark.django_db
+def test_change_log_rolls_back_with_the_write(profile_factory):
+    with pytest.raises(RuntimeError), transaction.atomic():
+        add_new_book(book_data("Desfeito"), profile_factory())
+        raise RuntimeError
+
+    assert not ChangeLog.objects.exists()
+
+
+@pytest.mark.django_db
+def test_limit_pages_through_changes_with_fixed_queries(
+    profile_factory, django_assert_num_queries
+):
+    owner = profile_factory()
+    _, cursor, _ = sync(None)
+    books = [add_new_book(book_data(f"Livro {n}"), owner) for n in range(3)]
+
+    seen = []
+    more = True
+    while more:
+        # Última linha do log, linhas novas e estado atual dos livros.
+        with django_assert_num_queries(3):
+            changes, cursor, more = sync(cursor, limit=2)
+        seen += [row["id"] for row in changes["books"]["created"]]
+
+    assert seen == [book.id for book in books]
+
+
+@pytest.mark.django_db
+def test_changes_endpoint_and_book_deletion(client, profile_factory):
+    owner = profile_factory()
+    head = client.get(reverse("api-changes")).json()
+    book = add_new_book(book_data("Lucíola"), owner)
+
+    changes = client.get(reverse("api-changes"), {"cursor": head["next"]}).json()
+    anonymous = client.delete(reverse("api-book-detail", args=[book.id]))
+    client.force_login(profile_factory().user)
+    stranger = client.delete(reverse("api-book-detail", args=[book.id]))
+    client.force_login(owner.user)
+    deleted = client.delete(reverse("api-book-detail", args=[book.id]))
+    after = client.get(reverse("api-changes"), {"cursor": changes["next"]}).json()
+    bad = client.get(reverse("api-changes"), {"cursor": "x"})
+
+    assert [row["title"] for row in changes["books"]["created"]] == ["Lucíola"]
+    assert changes["books"]["created"][0]["image"].endswith("no-image.png")
+    assert changes["books"]["created"][0]["status"] == "AVAILABLE"
+    assert (anonymous.status_code, stranger.status_code) == (401, 400)
+    assert deleted.status_code == 204
+    assert after["books"]["deleted"] == [book.id]
+    assert bad.status_code == 400
@@ -0,0 +1,195 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from library.cycles import find_cycles, propose_cycles, strongly_connected_components
+from library.models import (
+    BookExchange,
+    CycleStatus,
+    ExchangeCycle,
+    StatusBook,
+    Wishlist,
+    WishlistMatch,
+)
+from library.services.cycle_service import (
+    ExchangeCycleError,
+    confirm_cycle,
+    decline_cycle,
+    get_proposed_cycles,
+)
+
+
+def test_components_skip_nodes_outside_cycles():
+    graph = {1: {2: 10}, 2: {3: 20}, 3: {1: 30}, 4: {1: 40}, 5: {}}
+
+    components = strongly_connected_components(graph)
+
+    assert [sorted(component) for component in components] == [[1, 2, 3]]
+
+
+def test_find_cycles_prefers_longest_disjoint_cycles():
+    # 1↔2 é uma troca direta, mas 1→2→3→1 move três livros.
+    graph = {
+        1: {2: 10},
+        2: {1: 20, 3: 21},
+        3: {1: 30},
+        4: {5: 40},
+        5: {4: 50},
+    }
+
+    cycles = find_cycles(graph, max_length=3)
+
+    assert sorted(sorted(cycle) for cycle in cycles) == [
+        [(1, 2, 10), (2, 3, 21), (3, 1, 30)],
+        [(4, 5, 40), (5, 4, 50)],
+    ]
+
+
+def test_find_cycles_respects_max_length():
+    graph = {1: {2: 10}, 2: {3: 20}, 3: {4: 30}, 4: {1: 40}}
+
+    assert find_cycles(graph, max_length=3) == []
+    assert len(find_cycles(graph, max_length=4)) == 1
+
+
+@pytest.fixture
+def triangle(profile_factory, book_factory):
+    """Ana quer o livro de Bia, Bia o de Caio e Caio o de Ana."""
+    ana, bia, caio = (
+        profile_factory(firstname=name) for name in ("Ana", "Bia", "Caio")
+    )
+    books = {
+        "ana": book_factory(owner=ana, title="Iracema"),
+        "bia": book_factory(owner=bia, title="Dom Casmurro"),
+        "caio": book_factory(owner=caio, title="O Cortiço"),
+    }
+    BookExchange.objects.create(
+        book=books["bia"],
+        requester=ana,
+        owner=bia,
+        status=StatusBook.IN_EXCHANGE.value,
+    )
+    BookExchange.objects.create(
+        book=books["caio"],
+        requester=bia,
+        owner=caio,
+        status=StatusBook.IN_EXCHANGE.value,
+    )
+    wishlist = Wishlist.objects.create(profile=caio, title="Iracema")
+    WishlistMatch.objects.create(wishlist=wishlist, book_id=books["ana"].id)
+    return (ana, bia, caio), books
+
+
+@pytest.mark.django_db
+def test_command_proposes_cycle_from_requests_and_wishlists(triangle):
+    (ana, bia, caio), _ = triangle
+
+    call_command("find_exchange_cycles")
+
+    cycle = ExchangeCycle.objects.get()
+    assert cycle.status == CycleStatus.PROPOSED
+    assert {
+        (leg.receiver_id, leg.giver_id, leg.book_title) for leg in cycle.legs.all()
+    } == {
+        (ana.id, bia.id, "Dom Casmurro"),
+        (bia.id, caio.id, "O Cortiço"),
+        (caio.id, ana.id, "Iracema"),
+    }
+    # Quem já está numa proposta não entra em outra.
+    assert propose_cycles() == []
+
+
+@pytest.mark.django_db
+def test_last_confirmation_creates_accepted_exchanges(
+    triangle, django_capture_on_commit_callbacks
+):
+    (ana, bia, caio), books = triangle
+    (cycle,) = propose_cycles()
+
+    confirm_cycle(cycle.id, ana)
+    confirm_cycle(cycle.id, bia)
+    assert not BookExchange.objects.filter(status=StatusBook.UNAVAILABLE).exists()
+    with django_capture_on_commit_callbacks(execute=True):
+        confirm_cycle(cycle.id, caio)
+
+    cycle.refresh_from_db()
+    assert cycle.status == CycleStatus.CONFIRMED
+    exchanges = BookExchange.objects.filter(status=StatusBook.UNAVAILABLE.value)
+    assert {(e.requester_id, e.book_id) for e in exchanges} == {
+        (ana.id, books["bia"].id),
+        (bia.id, books["caio"].id),
+        (caio.id, books["ana"].id),
+    }
+    # As solicitações pendentes viram as trocas da cadeia.
+    assert BookExchange.objects.count() == 3
+    assert all(leg.exchange_id for leg in cycle.legs.all())
+    for book in books.values():
+        book.refresh_from_db()
+        assert book.status == StatusBook.UNAVAILABLE.value
+
+
+@pytest.mark.django_db
+def test_unavailable_book_cancels_cycle(triangle):
+    (ana, bia, caio), books = triangle
+    (cycle,) = propose_cycles()
+    books["ana"].status = StatusBook.UNAVAILABLE.value
+    books["ana"].save()
+
+    confirm_cycle(cycle.id, ana)
+    confirm_cycle(cycle.id, bia)
+    with pytest.raises(ExchangeCycleError, match="Iracema"):
+        confirm_cycle(cycle.id, caio)
+
+    cycle.refresh_from_db()
+    assert cycle.status == CycleStatus.CANCELLED
+    assert not BookExchange.objects.filter(status=StatusBook.UNAVAILABLE).exists()
+
+
+@pytest.mark.django_db
+def test_book_requested_by_outsider_cancels_cycle(triangle, profile_factory):
+    (ana, bia, caio), books = triangle
+    (cycle,) = propose_cycles()
+    outsider = BookExchange.objects.create(
+        book=books["ana"],
+        requester=profile_factory(),
+        owner=ana,
+        status=StatusBook.IN_EXCHANGE.value,
+    )
+
+    confirm_cycle(cycle.id, ana)
+    confirm_cycle(cycle.id, bia)
+    with pytest.raises(ExchangeCycleError, match="Iracema"):
+        confirm_cycle(cycle.id, caio)
+
+    cycle.refresh_from_db()
+    outsider.refresh_from_db()
+    books["ana"].refresh_from_db()
+    assert cycle.status == CycleStatus.CANCELLED
+    assert outsider.status == StatusBook.IN_EXCHANGE.value
+    assert books["ana"].status == StatusBook.IN_EXCHANGE.value
+    assert not BookExchange.objects.filter(status=StatusBook.UNAVAILABLE).exists()
+
+
+@pytest.mark.django_db
+def test_only_participants_can_answer(triangle, profile_factory):
+    (ana, _, _), _ = triangle
+    (cycle,) = propose_cycles()
+
+    with pytest.raises(ExchangeCycleError):
+        confirm_cycle(cycle.id, profile_factory())
+
+    decline_cycle(cycle.id, ana)
+    assert not get_proposed_cycles(ana).exists()
+
+
+@pytest.mark.django_db
+def test_cycles_page_lists_and_confirms(client, triangle):
+    (ana, _, _), _ = triangle
+    (cycle,) = propose_cycles()
+    client.force_login(ana.user)
+
+    response = client.get(reverse("exchange-cycles"))
+    assert "Dom Casmurro" in response.content.decode()
+
+    client.post(reverse("exchange-cycles"), {"cycle_id": cycle.id})
+    assert cycle.legs.get(receiver=ana).confirmed_at is not None
@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from library import async_views
+from library.events import InMemoryBroker, SQLiteBroker, get_broker
+from library.models import StatusBook
+from library.services.exchange_service import (
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+
+
+class RecordingBroker:
+    def __init__(self, **options):
+        self.published = []
+
+    def publish(self, profile_id, event):
+        self.published.append((profile_id, event["type"], event["status"]))
+
+
+@pytest.fixture
+def broker(settings):
+    settings.EVENT_BROKER = (
+        "library.tests.integration.test_exchange_events.RecordingBroker"
+    )
+    settings.EVENT_BROKER_OPTIONS = {}
+    get_broker.cache_clear()
+    yield get_broker()
+    get_broker.cache_clear()
+
+
+def receive(broker, profile_id, publish, timeout=1, last_event_id=None):
+    async def run():
+        with broker.subscribe(profile_id, last_event_id) as subscription:
+            # O SQLiteBroker marca a posição inicial na primeira leitura.
+            await subscription.next(0)
+            await asyncio.to_thread(publish)
+            return await subscription.next(timeout)
+
+    return async_to_sync(run)()
+
+
+def test_in_memory_broker_delivers_only_to_the_profile():
+    broker = InMemoryBroker()
+
+    def publish():
+        broker.publish(2, {"type": "exchange.updated"})
+        broker.publish(1, {"type": "exchange.created"})
+
+    event_id, event = receive(broker, 1, publish)
+
+    assert event == {"type": "exchange.created"}
+    assert event_id == 2
+
+
+def test_subscription_times_out_without_events():
+    assert receive(InMemoryBroker(), 1, lambda: None, timeout=0.05) is None
+
+
+def test_sqlite_broker_shares_events_between_instances(tmp_path):
+    path = tmp_path / "events.sqlite3"
+    subscriber = SQLiteBroker(path, poll_interval=0.01)
+    publisher = SQLiteBroker(path)
+
+    event_id, event = receive(
+        subscriber, 1, lambda: publisher.publish(1, {"type": "exchange.created"})
+    )
+
+    assert event == {"type": "exchange.created"}
+    # Reconexão com Last-Event-ID retoma depois do último evento recebido.
+    publisher.publish(1, {"type": "exchange.updated"})
+    resumed = receive(subscriber, 1, lambda: None, last_event_id=str(event_id - 1))
+    assert resumed == (event_id, event)
+
+
+@pytest.mark.django_db
+def test_exchange_services_publish_after_commit(
+    broker, profile_factory, book_factory, django_capture_on_commit_callbacks
+):
+    owner = profile_factory()
+    requester = profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    assert broker.published == []
+
+    callbacks[0]()
+    with django_capture_on_commit_callbacks(execute=True):
+        respond_to_exchange_request(
+            exchange_id=exchange.id, owner_profile=owner, action="accept"
+        )
+
+    assert sorted(broker.published) == sorted(
+        [
+            (requester.id, "exchange.created", "IN EXCHANGE"),
+            (owner.id, "exchange.created", "IN EXCHANGE"),
+            (requester.id, "exchange.updated", "UNAVAILABLE"),
+            (owner.id, "exchange.updated", "UNAVAILABLE"),
+        ]
+    )
+
+
+@pytest.mark.django_db
+def test_event_stream_view_sends_events_for_logged_profile(
+    settings, user_factory, profile_factory
+):
+    settings.EVENT_BROKER = "library.events.InMemoryBroker"
+    settings.EVENT_HEARTBEAT = 0.05
+    get_broker.cache_clear()
+    user = user_factory()
+    profile = profile_factory(user=user)
+    request = RequestFactory().get("/profile/events")
+
+    async def auser():
+        return user
+
+    request.auser = auser
+
+    async def run():
+        response = await async_views.exchange_events(request)
+        stream = aiter(response.streaming_content)
+        chunks = [await anext(stream), await anext(stream)]
+        get_broker().publish(profile.id, {"type": "exchange.updated", "status": "X"})
+        chunks.append(await anext(stream))
+        await stream.aclose()
+        return response, chunks
+
+    response, chunks = async_to_sync(run)()
+    get_broker.cache_clear()
+
+    assert response["Content-Type"] == "text/event-stream"
+    assert chunks[0] == b"retry: 3000\n\n"
+    assert chunks[1] == b": keep-alive\n\n"
+    assert chunks[2].startswith(b"id: 1\nevent: exchange.updated\ndata: ")
+    assert json.loads(chunks[2].split(b"data: ")[1]) == {
+        "type": "exchange.updated",
+        "status": "X",
+    }
+
+
+def test_event_stream_rejects_anonymous_users():
+    request = RequestFactory().get("/profile/events")
+
+    async def auser():
+        return AnonymousUser()
+
+    request.auser = auser
+
+    assert async_to_sync(async_views.exchange_events)(request).status_code == 403
@@ -20,9 +20,9 @@ def test_send_books_lists_sent_requests(
 
     assert response.status_code == 200
     assert "send_books.html" in [t.name for t in response.templates]
-    user_books = response.context["user_books"]
-    assert len(user_books) == 1
-    assert user_books[0]["book"] == book
+    exchanges = response.context["exchanges"]
+    assert len(exchanges) == 1
+    assert exchanges[0].book == book
 
 
 @pytest.mark.django_db
@@ -49,9 +49,9 @@ def test_received_books_lists_requests_and_accepts(
     response = client.get(reverse("received-books"))
     assert response.status_code == 200
     assert "received_books.html" in [t.name for t in response.templates]
-    user_books = response.context["user_books"]
-    assert user_books[0]["book"] == book
-    assert user_books[0]["requester_name"] == requester_profile.firstname
+    exchanges = response.context["exchanges"]
+    assert exchanges[0].book == book
+    assert exchanges[0].requester.firstname == requester_profile.firstname
 
     post_response = client.post(
         reverse("received-books"),
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from library.expiry import expire_stale_requests
+from library.jobs import run_next
+from library.models import (
+    Book,
+    BookExchange,
+    ChangeLog,
+    ExchangeEvent,
+    ExchangeEventType,
+    Job,
+    Notification,
+    StatusBook,
+)
+from library.services.exchange_service import create_exchange_request
+from library.tasks import expire_stale_requests as expire_job
+
+TTL = timedelta(days=14)
+
+
+def request(book, requester, age):
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    BookExchange.objects.filter(id=exchange.id).update(created_at=timezone.now() - age)
+    return exchange
+
+
+@pytest.mark.django_db
+def test_stale_requests_expire_and_release_the_book(
+    profile_factory, book_factory, django_capture_on_commit_callbacks
+):
+    requester = profile_factory()
+    stale_book, fresh_book = book_factory(), book_factory()
+    stale = request(stale_book, requester, TTL + timedelta(hours=1))
+    fresh = request(fresh_book, requester, TTL - timedelta(hours=1))
+    ChangeLog.objects.all().delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert expire_stale_requests(pause=0) == 1
+
+    stale.refresh_from_db()
+    fresh.refresh_from_db()
+    assert stale.status == StatusBook.EXPIRED.value
+    assert fresh.status == StatusBook.IN_EXCHANGE.value
+    assert Book.objects.get(id=stale_book.id).status == StatusBook.AVAILABLE.value
+    assert Book.objects.get(id=fresh_book.id).status == StatusBook.IN_EXCHANGE.value
+    assert ExchangeEvent.objects.filter(
+        exchange_id=stale.id, event=ExchangeEventType.EXPIRED
+    ).exists()
+    assert sorted(ChangeLog.objects.values_list("object_id", flat=True)) == sorted(
+        [stale.id, stale_book.id]
+    )
+    notification = Notification.objects.get(kind="exchange.expired")
+    assert notification.recipient_id == requester.id
+
+
+@pytest.mark.django_db
+def test_book_with_another_pending_request_stays_reserved(
+    profile_factory, book_factory
+):
+    book = book_factory()
+    old = request(book, profile_factory(), TTL * 2)
+    # O serviço recusa um segundo pedido; dados antigos podem ter vários.
+    BookExchange.objects.create(
+        book=book,
+        owner=book.owner,
+        requester=profile_factory(),
+        status=StatusBook.IN_EXCHANGE.value,
+    )
+
+    expire_stale_requests(pause=0)
+
+    old.refresh_from_db()
+    assert old.status == StatusBook.EXPIRED.value
+    assert Book.objects.get(id=book.id).status == StatusBook.IN_EXCHANGE.value
+
+
+@pytest.mark.django_db
+def test_sweep_runs_in_batches_of_bulk_updates(profile_factory, book_factory):
+    requester = profile_factory()
+    for _ in range(5):
+        request(book_factory(), requester, TTL * 2)
+
+    with CaptureQueriesContext(connection) as context:
+        assert expire_stale_requests(batch_size=2, pause=0) == 5
+
+    exchange_updates = [
+        q["sql"]
+        for q in context.captured_queries
+        if q["sql"].startswith('UPDATE "library_bookexchange"')
+    ]
+    assert len(exchange_updates) == 3
+    assert not BookExchange.objects.filter(status=StatusBook.IN_EXCHANGE.value).exists()
+
+
+@pytest.mark.django_db
+def test_periodic_job_reschedules_itself(
+    profile_factory, book_factory, django_capture_on_commit_callbacks, settings
+):
+    settings.EXCHANGE_EXPIRY_INTERVAL = 600
+    request(book_factory(), profile_factory(), TTL * 2)
+
+    for _ in range(2):
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command("expire_exchanges", "--schedule")
+    assert Job.objects.filter(name="library.expire_stale_requests").count() == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        while run_next("w1"):
+            pass
+
+    job = Job.objects.get(name="library.expire_stale_requests")
+    assert job.run_at > timezone.now() + timedelta(seconds=500)
+    assert BookExchange.objects.get().status == StatusBook.EXPIRED.value
+    assert expire_job(repeat=False) == 0
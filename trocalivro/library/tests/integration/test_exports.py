@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+
+import pytest
+from django.urls import reverse
+
+from library.services.exchange_service import create_exchange_request
+
+
+def content(response):
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.fixture
+def reader(profile_factory):
+    profile = profile_factory()
+    profile.firstname, profile.lastname = "Ana", "Souza"
+    profile.save()
+    return profile
+
+
+@pytest.mark.django_db
+def test_books_export_streams_csv(client, reader, book_factory):
+    book_factory(owner=reader, title="Dom Casmurro", author="Machado de Assis")
+    book_factory(owner=reader, title="Iracema, a virgem", author="José de Alencar")
+    book_factory(title="De outro usuário")
+    client.force_login(reader.user)
+
+    response = client.get(reverse("export-books"))
+
+    assert response.streaming
+    assert response["Content-Type"].startswith("text/csv")
+    assert 'filename="livros.csv"' in response["Content-Disposition"]
+    rows = list(csv.DictReader(io.StringIO(content(response))))
+    assert [row["title"] for row in rows] == ["Iracema, a virgem", "Dom Casmurro"]
+    assert rows[0]["status"] == "AVAILABLE"
+
+
+@pytest.mark.django_db
+def test_header_is_sent_before_any_query(
+    client, reader, book_factory, django_assert_num_queries
+):
+    book_factory(owner=reader)
+    client.force_login(reader.user)
+    response = client.get(reverse("export-books"))
+    lines = iter(response.streaming_content)
+
+    with django_assert_num_queries(0):
+        assert next(lines).startswith(b"id,title")
+    with django_assert_num_queries(1):
+        next(lines)
+
+
+@pytest.mark.django_db
+def test_exchange_history_export_as_ndjson(
+    client, reader, profile_factory, book_factory
+):
+    other = profile_factory()
+    other.firstname = "Bruno"
+    other.save()
+    wanted = book_factory(owner=other, title="Vidas Secas")
+    own = book_factory(owner=reader, title="O Cortiço")
+    sent = create_exchange_request(book_id=wanted.id, requester_profile=reader)
+    received = create_exchange_request(book_id=own.id, requester_profile=other)
+    client.force_login(reader.user)
+
+    response = client.get(reverse("export-exchanges"), {"format": "ndjson"})
+
+    assert response["Content-Type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in content(response).splitlines()]
+    assert [(r["id"], r["role"], r["book_title"]) for r in records] == [
+        (received.id, "received", "O Cortiço"),
+        (sent.id, "sent", "Vidas Secas"),
+    ]
+    assert records[0]["other_party"] == "Bruno"
+    assert records[0]["status"] == "IN EXCHANGE"
+
+
+@pytest.mark.django_db
+def test_staff_can_export_another_user(client, reader, profile_factory, book_factory):
+    book_factory(owner=reader, title="Dom Casmurro")
+    staff = profile_factory().user
+    staff.is_staff = True
+    staff.save()
+    client.force_login(staff)
+
+    response = client.get(reverse("export-books"), {"user": reader.user.username})
+
+    assert "Dom Casmurro" in content(response)
+
+
+@pytest.mark.django_db
+def test_users_cannot_export_others(client, reader, profile_factory):
+    client.force_login(profile_factory().user)
+
+    other = client.get(reverse("export-books"), {"user": reader.user.username})
+    unknown = client.get(reverse("export-books"), {"format": "xlsx"})
+
+    assert other.status_code == 403
+    assert unknown.status_code == 404
@@ -0,0 +1,121 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from library.history import get_history_page
+from library.models import (
+    ExchangeEvent,
+    ExchangeEventType,
+    ExchangeHistory,
+    HistoryRole,
+)
+from library.services.books_management_service import add_new_book, delete_book
+from library.services.exchange_service import (
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+
+
+def book_data(title):
+    return {"title": title, "description": "-", "author": "Autor", "genre": "Romance"}
+
+
+@pytest.mark.django_db
+def test_each_transition_is_appended_with_its_message(profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = add_new_book(book_data("Dom Casmurro"), owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    respond_to_exchange_request(exchange.id, owner, "accept", "Combinado!")
+
+    events = ExchangeEvent.objects.filter(exchange_id=exchange.id).order_by("id")
+
+    assert [(event.event, event.message) for event in events] == [
+        (ExchangeEventType.CREATED, ""),
+        (ExchangeEventType.ACCEPTED, "Combinado!"),
+    ]
+    assert {event.book_title for event in events} == {"Dom Casmurro"}
+
+
+@pytest.mark.django_db
+def test_history_rows_for_both_parties(profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = add_new_book(book_data("Iracema"), owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    respond_to_exchange_request(exchange.id, owner, "reject", "Já troquei.")
+
+    sent, _ = get_history_page(requester)
+    received, _ = get_history_page(owner)
+
+    assert [row.event for row in sent] == [
+        ExchangeEventType.REJECTED,
+        ExchangeEventType.CREATED,
+    ]
+    assert {row.role for row in sent} == {HistoryRole.SENT}
+    assert {row.role for row in received} == {HistoryRole.RECEIVED}
+    assert sent[0].other_party_name == owner.firstname
+    assert received[0].other_party_name == requester.firstname
+    assert sent[0].message == "Já troquei."
+
+
+@pytest.mark.django_db
+def test_pages_by_id_with_one_query_each(profile_factory, django_assert_num_queries):
+    owner, requester = profile_factory(), profile_factory()
+    for n in range(5):
+        book = add_new_book(book_data(f"Livro {n}"), owner)
+        create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    seen, before = [], None
+    while True:
+        with django_assert_num_queries(1):
+            rows, before = get_history_page(requester, before=before, limit=2)
+        seen += [row.book_title for row in rows]
+        if before is None:
+            break
+
+    assert seen == [f"Livro {n}" for n in reversed(range(5))]
+
+
+@pytest.mark.django_db
+def test_deleting_a_book_closes_pending_requests(profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = add_new_book(book_data("Senhora"), owner)
+    create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    delete_book(book.id, owner)
+    rows, _ = get_history_page(requester)
+
+    assert rows[0].event == ExchangeEventType.CLOSED
+    assert rows[0].book_title == "Senhora"
+
+
+@pytest.mark.django_db
+def test_rebuild_backfills_old_exchanges(profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = add_new_book(book_data("Lucíola"), owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    respond_to_exchange_request(exchange.id, owner, "accept")
+    ExchangeEvent.objects.all().delete()
+    ExchangeHistory.objects.all().delete()
+
+    call_command("rebuild_exchange_history")
+    rows, _ = get_history_page(owner)
+
+    assert [row.event for row in rows] == [
+        ExchangeEventType.ACCEPTED,
+        ExchangeEventType.CREATED,
+    ]
+    assert ExchangeHistory.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_history_page(client, profile_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = add_new_book(book_data("O Cortiço"), owner)
+    create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    client.force_login(requester.user)
+    response = client.get(reverse("exchange-history"), {"before": "x"})
+
+    assert response.status_code == 200
+    assert "O Cortiço" in response.content.decode()
+    assert "Solicitação enviada" in response.content.decode()
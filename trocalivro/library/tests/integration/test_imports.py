@@ -0,0 +1,221 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+
+from library import imports
+from library.imports import run_import, start_import
+from library.jobs import run_next
+from library.models import Book, BookImport, ImportStatus, Wishlist, WishlistMatch
+
+CSV = """title,description,genre,author
+Dom Casmurro,Bentinho e Capitu,Romance,Machado de Assis
+,Sem título,Romance,Anônimo
+Iracema,Lenda do Ceará,Romance,José de Alencar
+O Cortiço,Vida no cortiço,,Aluísio Azevedo
+Vidas Secas,Fabiano e Baleia,Romance,Graciliano Ramos
+"""
+
+
+@pytest.fixture(autouse=True)
+def storage_dirs(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.SIMILARITY_INDEX_DIR = tmp_path / "index"
+    settings.BOOK_IMPORT_DIR = tmp_path / "uploads"
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / "catalogo.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return path
+
+
+def run_jobs():
+    while run_next("w1"):
+        pass
+
+
+@pytest.mark.django_db
+def test_import_validates_rows_like_the_book_form(catalog_file, profile_factory):
+    owner = profile_factory()
+
+    book_import = run_import(start_import(catalog_file, owner), batch_size=2)
+
+    assert book_import.status == ImportStatus.DONE
+    assert (book_import.position, book_import.imported, book_import.failed) == (
+        5,
+        3,
+        2,
+    )
+    assert [line for line, _ in book_import.errors] == [2, 4]
+    assert book_import.errors[0][1].startswith("title:")
+    assert set(Book.objects.filter(owner=owner).values_list("title", flat=True)) == {
+        "Dom Casmurro",
+        "Iracema",
+        "Vidas Secas",
+    }
+
+
+@pytest.mark.django_db
+def test_import_resumes_after_crash(catalog_file, profile_factory, monkeypatch):
+    owner = profile_factory()
+    write_batch = imports._write_batch
+    calls = []
+
+    def crash_on_second_batch(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("queda do processo")
+        return write_batch(*args)
+
+    monkeypatch.setattr(imports, "_write_batch", crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        run_import(start_import(catalog_file, owner), batch_size=2)
+
+    book_import = BookImport.objects.get()
+    assert (book_import.status, book_import.position) == (ImportStatus.FAILED, 2)
+    monkeypatch.setattr(imports, "_write_batch", write_batch)
+
+    book_import = run_import(start_import(catalog_file, owner), batch_size=2)
+
+    assert book_import.imported == 3
+    assert Book.objects.filter(owner=owner, title="Dom Casmurro").count() == 1
+    assert Book.objects.filter(owner=owner).count() == 3
+
+
+@pytest.mark.django_db
+def test_json_lines_import_resizes_covers(tmp_path, settings, profile_factory):
+    settings.BOOK_COVER_MAX_SIZE = (60, 90)
+    covers = tmp_path / "capas"
+    covers.mkdir()
+    Image.new("RGB", (300, 300), "red").save(covers / "iracema.png")
+    book = {"description": "-", "genre": "Romance", "author": "José de Alencar"}
+    rows = [
+        {**book, "title": "Iracema", "cover": "iracema.png"},
+        {**book, "title": "Ubirajara", "cover": "ausente.png"},
+        {**book, "title": "Senhora", "cover": "../fora.png"},
+    ]
+    path = tmp_path / "catalogo.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n{quebrado\n")
+
+    book_import = run_import(start_import(path, profile_factory()), covers_dir=covers)
+
+    assert book_import.imported == 1
+    assert [line for line, _ in book_import.errors] == [2, 3, 4]
+    book = Book.objects.get(title="Iracema")
+    with book.image.open("rb") as image:
+        assert Image.open(image).size == (60, 60)
+
+
+@pytest.mark.django_db
+def test_unexpected_cover_failure_only_fails_its_row(
+    tmp_path, profile_factory, monkeypatch
+):
+    covers = tmp_path / "capas"
+    covers.mkdir()
+    for name in ("iracema.png", "senhora.png"):
+        Image.new("RGB", (10, 10)).save(covers / name)
+    prepare_cover = imports.prepare_cover
+
+    def fail_on_senhora(path, max_size):
+        if path.name == "senhora.png":
+            raise MemoryError("sem memória")
+        return prepare_cover(path, max_size)
+
+    monkeypatch.setattr(imports, "prepare_cover", fail_on_senhora)
+    monkeypatch.setattr(imports, "ProcessPoolExecutor", ThreadPoolExecutor)
+    path = tmp_path / "catalogo.csv"
+    path.write_text(
+        "title,description,genre,author,cover\n"
+        "Iracema,-,Romance,José de Alencar,iracema.png\n"
+        "Senhora,-,Romance,José de Alencar,senhora.png\n",
+        encoding="utf-8",
+    )
+
+    for workers in (0, 1):
+        book_import = run_import(
+            start_import(path, profile_factory()), covers_dir=covers, workers=workers
+        )
+
+        assert book_import.status == ImportStatus.DONE
+        assert (book_import.imported, book_import.failed) == (1, 1)
+        [[line, message]] = book_import.errors
+        assert line == 2
+        assert "senhora.png" in message
+
+
+@pytest.mark.django_db
+def test_imported_books_fill_wishlists(
+    catalog_file, profile_factory, django_capture_on_commit_callbacks
+):
+    reader = profile_factory()
+    wishlist = Wishlist.objects.create(profile=reader, title="Vidas Secas")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        run_import(start_import(catalog_file, profile_factory()))
+    run_jobs()
+
+    book = Book.objects.get(title="Vidas Secas")
+    assert WishlistMatch.objects.filter(wishlist=wishlist, book_id=book.id).exists()
+
+
+@pytest.mark.django_db
+def test_command_reports_progress_and_uses_process_pool(
+    tmp_path, catalog_file, profile_factory, capsys
+):
+    owner = profile_factory()
+    Image.new("RGB", (10, 10)).save(tmp_path / "capa.png")
+    catalog_file.write_text(
+        CSV + "Senhora,Aurélia,Romance,José de Alencar,capa.png\n", encoding="utf-8"
+    )
+    catalog_file.write_text(
+        catalog_file.read_text().replace("author\n", "author,cover\n", 1)
+    )
+
+    call_command(
+        "import_books", str(catalog_file), owner=owner.user.username, workers=1
+    )
+    call_command("import_books", str(catalog_file), owner=owner.user.username)
+
+    out, err = capsys.readouterr()
+    assert "linha 6: 4 importado(s), 2 com erro" in out
+    assert "já concluída" in out
+    assert "linha 2: title:" in err
+    assert Book.objects.get(title="Senhora").image
+
+
+@pytest.mark.django_db
+def test_staff_upload_queues_import(
+    client, profile_factory, django_capture_on_commit_callbacks
+):
+    owner = profile_factory()
+    staff = profile_factory().user
+    staff.is_staff = True
+    staff.save()
+    client.force_login(staff)
+    upload = SimpleUploadedFile("catalogo.csv", CSV.encode())
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            reverse("staff-import"), {"owner": owner.user.username, "file": upload}
+        )
+    run_jobs()
+
+    assert response.status_code == 302
+    assert BookImport.objects.get().status == ImportStatus.DONE
+    assert Book.objects.filter(owner=owner).count() == 3
+    assert "3 importado(s)" in client.get(reverse("staff-import")).content.decode()
+
+
+@pytest.mark.django_db
+def test_import_page_requires_staff(client, profile_factory):
+    client.force_login(profile_factory().user)
+
+    response = client.get(reverse("staff-import"))
+
+    assert response.status_code == 302
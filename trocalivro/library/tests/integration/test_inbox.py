@@ -0,0 +1,108 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.models import BookExchange, StatusBook
+from library.services.exchange_service import (
+    create_exchange_request,
+    get_received_counts,
+    get_received_page,
+    get_sent_counts,
+    get_sent_page,
+    respond_to_exchange_request,
+)
+from library.sharding import is_sharded
+
+
+def make_exchanges(book_factory, owner, requester, count, answer=None):
+    exchanges = []
+    for _ in range(count):
+        book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+        if answer:
+            respond_to_exchange_request(exchange.id, owner, answer)
+        exchanges.append(exchange)
+    return exchanges
+
+
+@pytest.fixture
+def inbox(profile_factory, book_factory):
+    owner, requester = profile_factory(), profile_factory()
+    pending = make_exchanges(book_factory, owner, requester, 3)
+    accepted = make_exchanges(book_factory, owner, requester, 2, "accept")
+    rejected = make_exchanges(book_factory, owner, requester, 1, "reject")
+    return owner, requester, pending, accepted, rejected
+
+
+@pytest.mark.django_db
+def test_counts_come_from_one_aggregate(inbox, django_assert_num_queries):
+    owner, requester, *_ = inbox
+    BookExchange.objects.filter(id=inbox[2][0].id).update(
+        status=StatusBook.EXPIRED.value
+    )
+    expected = {"pending": 2, "accepted": 2, "rejected": 1, "expired": 1}
+
+    with django_assert_num_queries(1):
+        assert get_sent_counts(requester) == expected
+    with django_assert_num_queries(1):
+        assert get_received_counts(owner) == expected
+
+
+@pytest.mark.django_db
+def test_tab_pages_by_keyset(inbox, django_assert_num_queries):
+    owner, requester, pending, accepted, _ = inbox
+
+    seen, before = [], None
+    while True:
+        # Com shards, os perfis vêm do "default" numa consulta à parte.
+        with django_assert_num_queries(2 if is_sharded() else 1):
+            rows, before = get_sent_page(requester, "pending", before, limit=2)
+        seen += [row.id for row in rows]
+        if before is None:
+            break
+    received, _ = get_received_page(owner, "accepted")
+
+    assert seen == [e.id for e in reversed(pending)]
+    assert [row.id for row in received] == [e.id for e in reversed(accepted)]
+
+
+@pytest.mark.django_db
+def test_inbox_query_count_does_not_grow_with_history(
+    client, profile_factory, book_factory
+):
+    owner, requester = profile_factory(), profile_factory()
+    client.force_login(owner.user)
+
+    def page_queries():
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse("received-books"), {"tab": "accepted"})
+        assert response.status_code == 200
+        return len(context.captured_queries)
+
+    make_exchanges(book_factory, owner, requester, 2, "accept")
+    page_queries()  # Aquece o cache do usuário da sessão.
+    small = page_queries()
+    make_exchanges(book_factory, owner, requester, 25, "accept")
+
+    assert page_queries() == small
+
+
+@pytest.mark.django_db
+def test_tabs_and_pager_on_the_page(client, inbox):
+    _, requester, pending, *_ = inbox
+    client.force_login(requester.user)
+
+    first = client.get(reverse("send-books"))
+    rejected = client.get(reverse("send-books"), {"tab": "rejected"})
+    unknown = client.get(reverse("send-books"), {"tab": "x", "before": "y"})
+
+    assert [tab["count"] for tab in first.context["tabs"]] == [3, 2, 1, 0, None]
+    assert [e.id for e in first.context["exchanges"]] == [
+        e.id for e in reversed(pending)
+    ]
+    assert first.context["next_before"] is None
+    assert [e.get_status_display() for e in rejected.context["exchanges"]] == [
+        "AVAILABLE"
+    ]
+    assert unknown.context["tab"] == "pending"
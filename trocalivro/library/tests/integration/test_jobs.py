@@ -0,0 +1,195 @@
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models import QuerySet
+from django.utils import timezone
+from PIL import Image
+
+from library.jobs import claim, enqueue, job, requeue_dead, run, run_next
+from library.models import Book, Job, JobStatus
+from library.services.books_management_service import add_new_book
+from library.tasks import process_book_cover
+
+calls = []
+
+
+@job(name="tests.record")
+def record(value):
+    calls.append(value)
+
+
+@job(name="tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("falhou")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.fixture
+def queue(django_capture_on_commit_callbacks):
+    # Os testes rodam dentro de uma transação; executa o on_commit na hora.
+    def queue(name, **kwargs):
+        with django_capture_on_commit_callbacks(execute=True):
+            enqueue(name, **kwargs)
+
+    return queue
+
+
+@pytest.mark.django_db
+def test_enqueue_waits_for_commit(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        record.enqueue(value=1)
+
+    assert not Job.objects.exists()
+    callbacks[0]()
+    assert Job.objects.get().kwargs == {"value": 1}
+
+
+@pytest.mark.django_db
+def test_claim_respects_priority_and_schedule(queue):
+    later = timezone.now() + timedelta(hours=1)
+    queue("tests.record", value="baixa")
+    queue("tests.record", value="alta", priority=10)
+    queue("tests.record", value="agendada", priority=99, run_at=later)
+
+    assert run_next("w1") and run_next("w1")
+    assert not run_next("w1")
+    assert calls == ["alta", "baixa"]
+    assert Job.objects.get().kwargs == {"value": "agendada"}
+
+
+@pytest.mark.django_db
+def test_claim_marks_job_running(queue):
+    queue("tests.record", value=1)
+
+    claimed = claim("w1")
+
+    assert claimed.status == JobStatus.RUNNING
+    assert claimed.locked_by == "w1"
+    assert claimed.attempts == 1
+    assert claim("w2") is None
+
+
+@pytest.mark.django_db
+def test_stale_running_job_is_claimed_again(settings, queue):
+    settings.JOB_LOCK_TIMEOUT = 60
+    queue("tests.record", value=1)
+    claim("w1")
+    Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+
+    assert claim("w2").locked_by == "w2"
+
+
+@pytest.mark.django_db
+def test_failures_retry_with_backoff_then_dead_letter(queue):
+    queue("tests.fail", max_attempts=2)
+
+    assert not run(claim("w1"))
+    retried = Job.objects.get()
+    assert retried.status == JobStatus.QUEUED
+    assert retried.run_at > timezone.now()
+    assert "RuntimeError: falhou" in retried.last_error
+
+    Job.objects.update(run_at=timezone.now())
+    run(claim("w1"))
+    assert Job.objects.get().status == JobStatus.DEAD
+
+    assert requeue_dead() == 1
+    assert Job.objects.get().attempts == 0
+
+
+@pytest.mark.django_db
+def test_unknown_job_goes_straight_to_dead_letter(queue):
+    queue("tests.desconhecido")
+
+    run_next("w1")
+
+    assert Job.objects.get().status == JobStatus.DEAD
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_worker_burst_drains_queue_with_threads():
+    for value in range(5):
+        enqueue("tests.record", value=value)
+
+    call_command("run_worker", "--burst", "--concurrency=2", "--poll-interval=0.01")
+
+    assert sorted(calls) == [0, 1, 2, 3, 4]
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_finalization_retries_until_job_is_deleted(monkeypatch):
+    enqueue("tests.record", value=1)
+    claimed = claim("w1")
+    delete = QuerySet.delete
+    failures = []
+
+    def flaky_delete(queryset):
+        if not failures:
+            failures.append(True)
+            raise OperationalError("database is locked")
+        return delete(queryset)
+
+    monkeypatch.setattr(QuerySet, "delete", flaky_delete)
+    monkeypatch.setattr("library.jobs.time.sleep", lambda seconds: None)
+
+    assert run(claimed)
+    assert calls == [1]
+    assert failures
+    assert not Job.objects.exists()
+
+
+@pytest.fixture
+def large_cover_book(settings, profile_factory, django_capture_on_commit_callbacks):
+    settings.BOOK_COVER_MAX_SIZE = (300, 300)
+    buffer = BytesIO()
+    Image.new("RGB", (1200, 600), "red").save(buffer, format="JPEG")
+    upload = SimpleUploadedFile("capa.jpg", buffer.getvalue(), "image/jpeg")
+    data = {
+        "title": "Dom Casmurro",
+        "description": "Romance",
+        "genre": "Romance",
+        "author": "Machado de Assis",
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        return add_new_book(data, profile_factory(), upload)
+
+
+@pytest.mark.django_db
+def test_large_cover_is_resized_by_worker(large_cover_book):
+    original = Path(large_cover_book.image.path)
+    with Image.open(original) as image:
+        assert image.size == (1200, 600)
+
+    while run_next("w1"):
+        pass
+    book = Book.objects.get(pk=large_cover_book.pk)
+    with Image.open(book.image.path) as resized:
+        assert resized.size == (300, 150)
+    assert book.image.name != large_cover_book.image.name
+    assert not original.exists()
+
+
+@pytest.mark.django_db
+def test_failed_cover_save_keeps_the_original(large_cover_book, monkeypatch):
+    def broken_save(self, name, content, max_length=None):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(FileSystemStorage, "save", broken_save)
+    with pytest.raises(OSError):
+        process_book_cover(large_cover_book.pk)
+
+    book = Book.objects.get(pk=large_cover_book.pk)
+    assert book.image.name == large_cover_book.image.name
+    with Image.open(book.image.path) as image:
+        assert image.size == (1200, 600)
@@ -0,0 +1,85 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from library.geo import profiles_within
+from library.models import Profile, StatusBook
+
+
+def located(profile, address):
+    profile.address = address
+    profile.save()
+    return profile
+
+
+@pytest.fixture
+def neighbours(user_factory, profile_factory, book_factory):
+    reader = user_factory()
+    located(reader.profile, "Av. Paulista, 1000, São Paulo - SP")
+    near = located(profile_factory(), "Rua Augusta, 500, 01305-000")
+    suburb = located(profile_factory(), "Santo André, 09010-000")
+    far = located(profile_factory(), "Rua da Praia, Porto Alegre")
+    books = {
+        "near": book_factory(owner=near, title="Dom Casmurro"),
+        "traded": book_factory(
+            owner=near, title="Dom Quixote", status=StatusBook.UNAVAILABLE.value
+        ),
+        "suburb": book_factory(owner=suburb, title="Dom Pedro"),
+        "far": book_factory(owner=far, title="Dom Casmurro comentado"),
+    }
+    return reader, {"near": near, "suburb": suburb, "far": far}, books
+
+
+@pytest.mark.django_db
+def test_profiles_within_radius(neighbours):
+    reader, profiles, _ = neighbours
+    lat, lon = reader.profile.latitude, reader.profile.longitude
+
+    assert set(profiles_within(lat, lon, 5)) == {reader.profile.id, profiles["near"].id}
+    assert profiles["suburb"].id in profiles_within(lat, lon, 25)
+    assert profiles["far"].id not in profiles_within(lat, lon, 100)
+
+
+@pytest.mark.django_db
+def test_home_feed_filters_available_books_nearby(client, neighbours):
+    reader, _, _ = neighbours
+    client.force_login(reader)
+
+    response = client.get(reverse("index"), {"km": 5})
+
+    titles = {book.title for book in response.context["book_list"]}
+    assert titles == {"Dom Casmurro"}
+    assert response.context["km"] == 5
+
+
+@pytest.mark.django_db
+def test_search_keeps_query_with_distance(client, neighbours):
+    reader, _, _ = neighbours
+    client.force_login(reader)
+
+    response = client.get(reverse("search-books"), {"q": "Dom", "km": 25})
+
+    titles = {book.title for book in response.context["book_list"]}
+    assert titles == {"Dom Casmurro", "Dom Pedro"}
+    assert 'name="q" value="Dom"' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_missing_location_shows_hint_and_keeps_feed(client, user_factory, neighbours):
+    client.force_login(user_factory())
+
+    response = client.get(reverse("index"), {"km": 10})
+
+    assert response.context["location_missing"]
+    assert len(response.context["book_list"]) == 4
+
+
+@pytest.mark.django_db
+def test_geocode_profiles_command_backfills(neighbours):
+    reader, _, _ = neighbours
+    Profile.objects.update(latitude=None, longitude=None, grid_cell=None)
+
+    call_command("geocode_profiles")
+
+    reader.profile.refresh_from_db()
+    assert reader.profile.has_location
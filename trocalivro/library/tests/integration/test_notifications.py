@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from library import notifications
+from library.jobs import run_next
+from library.models import Job, Notification, StatusBook
+from library.notifications import send_due_digests
+from library.services.exchange_service import (
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+
+
+@pytest.fixture
+def exchange_parties(profile_factory, book_factory):
+    owner = profile_factory()
+    owner.firstname, owner.email = "Olga", "olga@example.com"
+    owner.save()
+    requester = profile_factory()
+    requester.firstname, requester.email = "Rui", "rui@example.com"
+    requester.save()
+    books = [
+        book_factory(owner=owner, title=title, status=StatusBook.AVAILABLE.value)
+        for title in ("Dom Casmurro", "Iracema")
+    ]
+    return owner, requester, books
+
+
+@pytest.mark.django_db
+def test_events_are_coalesced_into_one_digest(
+    exchange_parties, django_capture_on_commit_callbacks, settings
+):
+    settings.NOTIFICATION_DIGEST_WINDOW = 60
+    _, requester, books = exchange_parties
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for book in books:
+            create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    # Só a primeira notificação pendente agenda o envio.
+    assert Job.objects.filter(name="library.send_due_digests").count() == 1
+    assert send_due_digests() == 0
+
+    later = timezone.now() + timedelta(seconds=61)
+    assert send_due_digests(now=later) == 1
+    assert len(mail.outbox) == 1
+    digest = mail.outbox[0]
+    assert digest.to == ["olga@example.com"]
+    assert digest.subject == "trocalivro: 2 novidades nas suas trocas"
+    assert 'Rui solicitou a troca do seu livro "Dom Casmurro"' in digest.body
+    assert 'Rui solicitou a troca do seu livro "Iracema"' in digest.body
+    assert not Notification.objects.filter(sent_at__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_responses_notify_the_requester(
+    exchange_parties, django_capture_on_commit_callbacks
+):
+    owner, requester, books = exchange_parties
+
+    with django_capture_on_commit_callbacks(execute=True):
+        exchange = create_exchange_request(
+            book_id=books[0].id, requester_profile=requester
+        )
+        respond_to_exchange_request(
+            exchange_id=exchange.id,
+            owner_profile=owner,
+            action="reject",
+            message="Já troquei",
+        )
+
+    call_command("send_digests", "--flush")
+
+    digests = {message.to[0]: message.body for message in mail.outbox}
+    assert (
+        'Sua solicitação do livro "Dom Casmurro" foi recusada.'
+        in digests["rui@example.com"]
+    )
+    assert "Mensagem: Já troquei" in digests["rui@example.com"]
+
+
+@pytest.mark.django_db
+def test_digests_share_one_connection(exchange_parties, monkeypatch):
+    owner, requester, _ = exchange_parties
+    for recipient in (owner, requester):
+        Notification.objects.create(
+            recipient=recipient,
+            kind="exchange.created",
+            exchange_id=1,
+            book_title="Dom Casmurro",
+            status=StatusBook.IN_EXCHANGE.value,
+        )
+    connections = []
+    original = notifications.get_connection
+
+    def counting_connection(*args, **kwargs):
+        connections.append(original(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(notifications, "get_connection", counting_connection)
+
+    assert send_due_digests(flush=True) == 2
+    assert len(connections) == 1
+
+
+@pytest.mark.django_db
+def test_scheduled_job_sends_with_file_backend(
+    exchange_parties, django_capture_on_commit_callbacks, settings, tmp_path
+):
+    settings.EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+    settings.EMAIL_FILE_PATH = tmp_path
+    settings.NOTIFICATION_DIGEST_WINDOW = 0
+    _, requester, books = exchange_parties
+
+    with django_capture_on_commit_callbacks(execute=True):
+        create_exchange_request(book_id=books[0].id, requester_profile=requester)
+
+    assert run_next("w1")
+    (sent,) = tmp_path.iterdir()
+    assert "olga@example.com" in sent.read_text()
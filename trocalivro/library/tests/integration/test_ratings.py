@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.models import ExchangeRating, Profile, StatusBook
+from library.services.exchange_service import (
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+from library.services.rating_service import (
+    RatingError,
+    rate_exchange,
+    reputation,
+)
+
+
+@pytest.fixture
+def accepted(profile_factory, book_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    respond_to_exchange_request(exchange.id, owner, "accept")
+    return exchange, owner, requester
+
+
+@pytest.mark.django_db
+def test_rating_updates_reputation_with_a_single_update(accepted):
+    exchange, owner, requester = accepted
+
+    with CaptureQueriesContext(connection) as context:
+        rate_exchange(exchange.id, requester, 2, "Atrasou a entrega.")
+    rate_exchange(exchange.id, owner, 4)
+
+    updates = [q["sql"] for q in context.captured_queries if "UPDATE" in q["sql"]]
+    assert len(updates) == 1
+    assert '"rating_sum" = ("library_profile"."rating_sum" + 2)' in updates[0]
+    owner.refresh_from_db()
+    requester.refresh_from_db()
+    assert (owner.rating_sum, owner.rating_count) == (2, 1)
+    assert owner.reputation == pytest.approx(reputation(2, 1)) == pytest.approx(4)
+    assert requester.reputation == pytest.approx(reputation(4, 1))
+
+
+@pytest.mark.django_db
+def test_only_parties_rate_accepted_exchanges_once(accepted, profile_factory):
+    exchange, owner, requester = accepted
+    rate_exchange(exchange.id, requester, 5)
+
+    for rater, score, message in (
+        (requester, 4, "Você já avaliou esta troca."),
+        (profile_factory(), 4, "Somente as partes da troca podem avaliá-la."),
+        (owner, 6, "A nota deve ser de 1 a 5."),
+        (owner, "x", "Nota inválida."),
+    ):
+        with pytest.raises(RatingError, match=message):
+            rate_exchange(exchange.id, rater, score)
+
+    owner.refresh_from_db()
+    assert owner.rating_count == 1
+
+
+@pytest.mark.django_db
+def test_pending_exchange_cannot_be_rated(profile_factory, book_factory):
+    owner, requester = profile_factory(), profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    with pytest.raises(RatingError, match="trocas aceitas"):
+        rate_exchange(exchange.id, requester, 5)
+
+
+@pytest.mark.django_db
+def test_rebuild_reputation_repairs_aggregates(accepted):
+    exchange, owner, requester = accepted
+    rate_exchange(exchange.id, requester, 1)
+    rate_exchange(exchange.id, owner, 3)
+    Profile.objects.update(rating_sum=0, rating_count=0, reputation=5)
+
+    call_command("rebuild_reputation", batch_size=1)
+
+    owner.refresh_from_db()
+    requester.refresh_from_db()
+    assert (owner.rating_sum, owner.rating_count) == (1, 1)
+    assert owner.reputation == pytest.approx(reputation(1, 1))
+    assert requester.reputation == pytest.approx(reputation(3, 1))
+
+
+@pytest.mark.django_db
+def test_rating_from_the_pages_and_the_api(client, accepted):
+    exchange, owner, requester = accepted
+
+    client.force_login(requester.user)
+    accepted_tab = {"tab": "accepted"}
+    page = client.get(reverse("send-books"), accepted_tab).content.decode()
+    response = client.post(
+        reverse("exchange-rate", args=[exchange.id]),
+        {"score": 4, "next": "send-books"},
+    )
+    after = client.get(reverse("send-books"), accepted_tab).content.decode()
+    client.force_login(owner.user)
+    api = client.post(
+        reverse("api-exchange-rate", args=[exchange.id]),
+        json.dumps({"score": 5}),
+        content_type="application/json",
+    )
+    again = client.post(
+        reverse("api-exchange-rate", args=[exchange.id]),
+        json.dumps({"score": 5}),
+        content_type="application/json",
+    )
+
+    assert reverse("exchange-rate", args=[exchange.id]) in page
+    assert response.url == reverse("send-books") + "?tab=accepted"
+    assert reverse("exchange-rate", args=[exchange.id]) not in after
+    assert api.status_code == 201
+    assert again.status_code == 400
+    assert ExchangeRating.objects.count() == 2
@@ -0,0 +1,107 @@
+import pytest
+from django.urls import reverse
+
+from library.models import (
+    BookExchange,
+    BookRecommendation,
+    ProfileRecommendation,
+    StatusBook,
+)
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from library.recommendations import top_n
+from library.tasks import compute_recommendations
+
+
+def test_top_n_ranks_each_row():
+    rows = np.array([0, 0, 0, 1, 1])
+    cols = np.array([1, 2, 3, 0, 2])
+    scores = np.array([0.2, 0.9, 0.5, 0.1, 0.3])
+
+    rows, cols, scores, ranks = top_n(rows, cols, scores, 2)
+
+    assert rows.tolist() == [0, 0, 1, 1]
+    assert cols.tolist() == [2, 3, 2, 0]
+    assert ranks.tolist() == [0, 1, 0, 1]
+
+
+@pytest.fixture
+def readers(profile_factory, book_factory):
+    """Quem pediu Dom Casmurro também pediu Memórias Póstumas."""
+    owner = profile_factory()
+    books = {
+        title: book_factory(owner=owner, title=title, genre=genre)
+        for title, genre in [
+            ("Dom Casmurro", "Romance"),
+            ("Memórias Póstumas", "Romance"),
+            ("Quincas Borba", "Romance"),
+            ("Química Geral", "Didático"),
+        ]
+    }
+    readers = [profile_factory() for _ in range(3)]
+    wanted = {
+        0: ["Dom Casmurro", "Memórias Póstumas"],
+        1: ["Dom Casmurro", "Memórias Póstumas", "Química Geral"],
+        2: ["Dom Casmurro"],
+    }
+    for index, titles in wanted.items():
+        for title in titles:
+            BookExchange.objects.create(
+                book=books[title],
+                requester=readers[index],
+                owner=owner,
+                status=StatusBook.AVAILABLE.value,
+            )
+    return books, readers
+
+
+@pytest.mark.django_db
+def test_neighbours_follow_co_requests(readers):
+    books, _ = readers
+
+    compute_recommendations()
+
+    neighbours = BookRecommendation.objects.filter(book_id=books["Dom Casmurro"].id)
+    assert [r.title for r in neighbours][:2] == ["Memórias Póstumas", "Química Geral"]
+    assert [r.rank for r in neighbours] == list(range(len(neighbours)))
+
+
+@pytest.mark.django_db
+def test_profile_suggestions_skip_books_already_requested(readers):
+    _, profiles = readers
+
+    compute_recommendations()
+
+    suggested = ProfileRecommendation.objects.filter(profile=profiles[2])
+    assert suggested[0].title == "Memórias Póstumas"
+    assert "Dom Casmurro" not in {r.title for r in suggested}
+
+
+@pytest.mark.django_db
+def test_recompute_replaces_previous_rows(readers):
+    compute_recommendations()
+    first = BookRecommendation.objects.count()
+
+    compute_recommendations()
+
+    assert BookRecommendation.objects.count() == first
+
+
+@pytest.mark.django_db
+def test_detail_and_profile_pages_show_recommendations(client, readers):
+    books, profiles = readers
+    compute_recommendations()
+
+    response = client.get(reverse("book-detail", args=[books["Dom Casmurro"].id]))
+    assert "Você também pode gostar" in response.content.decode()
+
+    client.force_login(profiles[2].user)
+    response = client.get(reverse("users-profile"))
+    assert "Sugestões para você" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_empty_catalog_writes_nothing():
+    assert compute_recommendations() == 0
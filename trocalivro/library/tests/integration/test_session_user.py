@@ -0,0 +1,149 @@
+import pickle
+
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.middleware import _cache_key
+from library.models import BookExchange, Profile, StatusBook
+from library.services.rating_service import rate_exchange
+
+
+def user_queries(context):
+    return [
+        query["sql"]
+        for query in context.captured_queries
+        if 'FROM "auth_user"' in query["sql"]
+        or 'FROM "library_profile"' in query["sql"]
+    ]
+
+
+@pytest.fixture(autouse=True)
+def session_user_cache(settings):
+    # Fora dos testes o cache da sessão depende de um cache compartilhado.
+    settings.SESSION_USER_CACHE_TIMEOUT = 300
+
+
+@pytest.fixture
+def logged_profile(user_factory, profile_factory):
+    user = user_factory(password=make_password("segredo"))
+    profile = profile_factory(user=user)
+    profile.firstname = "Ana"
+    profile.save()
+    return profile
+
+
+@pytest.fixture
+def logged_client(client, logged_profile):
+    client.force_login(logged_profile.user)
+    return client
+
+
+@pytest.mark.django_db
+def test_user_and_profile_loaded_in_one_query(logged_client, settings):
+    settings.SESSION_USER_CACHE_TIMEOUT = 0
+
+    with CaptureQueriesContext(connection) as context:
+        response = logged_client.get(reverse("users-profile"))
+
+    assert response.status_code == 200
+    queries = user_queries(context)
+    assert len(queries) == 1
+    assert "JOIN" in queries[0]
+
+
+@pytest.mark.django_db
+def test_cached_session_user_costs_no_queries(logged_client):
+    logged_client.get(reverse("users-profile"))
+
+    with CaptureQueriesContext(connection) as context:
+        response = logged_client.get(reverse("send-books"))
+
+    assert response.status_code == 200
+    assert user_queries(context) == []
+    assert response.context["user"].profile.firstname == "Ana"
+
+
+@pytest.mark.django_db
+def test_cached_session_user_has_no_password_hash(logged_client, logged_profile):
+    logged_client.get(reverse("users-profile"))
+
+    entry = cache.get(_cache_key(logged_profile.user_id))
+    password = User.objects.get(pk=logged_profile.user_id).password
+    assert "password" not in entry["user"]
+    assert password.encode() not in pickle.dumps(entry)
+    response = logged_client.get(reverse("users-profile"))
+    assert response.context["user"].check_password("segredo")
+
+
+@pytest.mark.django_db
+def test_edit_profile_invalidates_cached_user(logged_client):
+    logged_client.get(reverse("users-profile"))
+
+    logged_client.post(reverse("users-edit"), {"firstname": "Beatriz"})
+    response = logged_client.get(reverse("users-profile"))
+
+    assert response.context["user"].profile.firstname == "Beatriz"
+
+
+@pytest.mark.django_db
+def test_logout_discards_cached_user(logged_client):
+    logged_client.get(reverse("users-profile"))
+
+    logged_client.post(reverse("logout"))
+    response = logged_client.get(reverse("users-profile"))
+
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_profile_save_elsewhere_invalidates_cached_user(logged_client, logged_profile):
+    logged_client.get(reverse("users-profile"))
+
+    profile = Profile.objects.get(pk=logged_profile.pk)
+    profile.firstname = "Carla"
+    profile.save()
+    response = logged_client.get(reverse("users-profile"))
+
+    assert response.context["user"].profile.firstname == "Carla"
+
+
+@pytest.mark.django_db
+def test_deactivated_user_loses_cached_session(logged_client, logged_profile):
+    logged_client.get(reverse("users-profile"))
+
+    user = User.objects.get(pk=logged_profile.user_id)
+    user.is_active = False
+    user.save()
+    response = logged_client.get(reverse("users-profile"))
+
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_rating_refreshes_cached_reputation(
+    logged_client,
+    logged_profile,
+    profile_factory,
+    book_factory,
+    django_capture_on_commit_callbacks,
+):
+    requester = profile_factory()
+    book = book_factory(owner=logged_profile)
+    exchange = BookExchange.objects.create(
+        book=book,
+        owner=logged_profile,
+        requester=requester,
+        status=StatusBook.UNAVAILABLE.value,
+    )
+    logged_client.get(reverse("users-profile"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        rate_exchange(exchange.id, requester, 1)
+    response = logged_client.get(reverse("users-profile"))
+
+    assert response.context["user"].profile.rating_count == 1
@@ -0,0 +1,314 @@
+"""
+Testes do particionamento por dono (library.sharding).
+
+Os testes com vários bancos só rodam com shards configurados, como no job
+"sharded" da CI:
+    TROCALIVRO_SHARDS=2 pytest trocalivro
+"""
+
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+from library.archive import archive_closed_exchanges
+from library.changes import changes_since
+from library.cycles import propose_cycles
+from library.history import get_history_page
+from library.models import (
+    ArchivedExchange,
+    Book,
+    BookExchange,
+    ChangeLog,
+    CycleStatus,
+    ExchangeEvent,
+    OwnerShard,
+    StatusBook,
+)
+from library.services.books_management_service import (
+    add_new_book,
+    aget_book,
+    aget_home_feed,
+    get_book,
+    get_home_feed,
+    get_owner_books,
+)
+from library.services.cycle_service import confirm_cycle
+from library.services.exchange_service import (
+    create_exchange_request,
+    get_received_page,
+    get_sent_counts,
+    get_sent_history,
+    get_sent_page,
+    respond_to_exchange_request,
+)
+from library.sharding import (
+    ID_EPOCH,
+    LEGACY_ID_BITS,
+    SHARD_INDEX_BITS,
+    TICK_BITS,
+    fan_out,
+    locate,
+    move_owner,
+    shard_for_id,
+    shard_for_owner,
+)
+
+multiple_shards = pytest.mark.skipif(
+    len(settings.DATABASE_SHARDS) < 2, reason="Requer TROCALIVRO_SHARDS >= 1"
+)
+
+
+class FakeQuerySet:
+    def __init__(self, values):
+        self.values = values
+
+    def iterator(self, chunk_size=None):
+        return iter(self.values)
+
+
+def test_single_shard_defers_to_routers(settings):
+    settings.DATABASE_SHARDS = ["default"]
+
+    assert shard_for_owner(42) is None
+    assert locate(Book, 42) is None
+
+
+def test_shard_for_id_reads_the_low_bits(settings):
+    settings.DATABASE_SHARDS = ["default", "shard_1", "shard_2"]
+    tick = (1_700_000_000 - ID_EPOCH) << TICK_BITS
+
+    assert shard_for_id((tick << SHARD_INDEX_BITS) | 2) == "shard_2"
+    assert shard_for_id((tick + 1) << SHARD_INDEX_BITS) == "default"
+
+
+def test_shard_for_id_reads_legacy_ranges(settings):
+    settings.DATABASE_SHARDS = ["default", "shard_1", "shard_2"]
+
+    assert shard_for_id(7) == "default"
+    assert shard_for_id((2 << LEGACY_ID_BITS) + 7) == "shard_2"
+
+
+def test_fan_out_merges_sorted_shards(settings):
+    settings.DATABASE_SHARDS = ["default", "shard_1", "shard_2"]
+    rows = {"default": [9, 4, 1], "shard_1": [8, 7], "shard_2": [5, 2]}
+
+    merged = fan_out(lambda alias: FakeQuerySet(rows[alias]), key=lambda value: value)
+
+    assert list(merged) == [9, 8, 7, 5, 4, 2, 1]
+
+
+def test_fan_out_returns_an_iterator_with_one_shard(settings):
+    settings.DATABASE_SHARDS = ["default"]
+
+    rows = fan_out(lambda alias: FakeQuerySet([3, 2]), key=lambda value: value)
+
+    assert iter(rows) is rows
+    assert list(rows) == [3, 2]
+
+
+def book_data(title):
+    return {
+        "title": title,
+        "description": "Descrição",
+        "author": "Autor",
+        "genre": "Romance",
+    }
+
+
+def place_owner(profile, shard):
+    OwnerShard.objects.update_or_create(profile=profile, defaults={"shard": shard})
+    from library.sharding import forget_owner_shard
+
+    forget_owner_shard(profile.id)
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_books_and_exchanges_live_in_owner_shard(profile_factory):
+    owner = profile_factory()
+    requester = profile_factory()
+    place_owner(owner, "shard_1")
+    place_owner(requester, "default")
+
+    book = add_new_book(book_data("Dom Casmurro"), owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    assert book._state.db == "shard_1"
+    assert shard_for_id(book.id) == "shard_1"
+    assert Book.objects.using("shard_1").filter(id=book.id).exists()
+    assert not Book.objects.using("default").filter(id=book.id).exists()
+    assert BookExchange.objects.using("shard_1").filter(id=exchange.id).exists()
+    assert [e.id for e in get_sent_page(requester, "pending")[0]] == [exchange.id]
+    assert [e.id for e in get_received_page(owner, "pending")[0]] == [exchange.id]
+
+    respond_to_exchange_request(
+        exchange_id=exchange.id, owner_profile=owner, action="accept"
+    )
+    assert get_book(book.id).status == StatusBook.UNAVAILABLE.value
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_home_feed_merges_all_shards(profile_factory):
+    first_owner = profile_factory()
+    second_owner = profile_factory()
+    place_owner(first_owner, "default")
+    place_owner(second_owner, "shard_1")
+
+    older = add_new_book(book_data("Antigo"), first_owner)
+    newer = add_new_book(book_data("Novo"), second_owner)
+
+    feed = [book.id for book in get_home_feed()]
+
+    assert feed == [newer.id, older.id]
+    assert [book.id for book in async_to_sync(aget_home_feed)()] == feed
+    assert async_to_sync(aget_book)(newer.id).owner == second_owner
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_ids_follow_creation_time_across_shards(profile_factory, monkeypatch):
+    first_owner = profile_factory()
+    second_owner = profile_factory()
+    requester = profile_factory()
+    place_owner(first_owner, "shard_1")
+    place_owner(second_owner, "default")
+    clock = iter(range(1_800_000_000, 1_800_000_100))
+    monkeypatch.setattr("library.sharding.time.time", lambda: next(clock))
+
+    # O mais novo fica no shard de menor índice: a ordem não vem do shard.
+    older = add_new_book(book_data("Antigo"), first_owner)
+    newer = add_new_book(book_data("Novo"), second_owner)
+    sent = [
+        create_exchange_request(book_id=book.id, requester_profile=requester).id
+        for book in (older, newer)
+    ]
+
+    assert newer.id > older.id
+    assert [book.id for book in get_home_feed()] == [newer.id, older.id]
+    assert [e.id for e in get_sent_page(requester, "pending")[0]] == sent[::-1]
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_move_owner_keeps_ids(profile_factory):
+    owner = profile_factory()
+    requester = profile_factory()
+    place_owner(owner, "default")
+    book = add_new_book(book_data("Mudança"), owner)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    moved = move_owner(owner.id, "shard_1")
+
+    assert moved == 2
+    assert shard_for_owner(owner.id) == "shard_1"
+    assert not Book.objects.using("default").filter(owner=owner).exists()
+    assert [b.id for b in get_owner_books(owner)] == [book.id]
+    assert locate(BookExchange, exchange.id) == "shard_1"
+    assert get_book(book.id).title == "Mudança"
+
+    newer = add_new_book(book_data("Depois"), owner)
+    assert shard_for_id(newer.id) == "shard_1"
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_exchange_cycle_spans_shards(profile_factory):
+    first, second = profile_factory(), profile_factory()
+    place_owner(first, "default")
+    place_owner(second, "shard_1")
+    first_book = add_new_book(book_data("Iracema"), first)
+    second_book = add_new_book(book_data("Dom Casmurro"), second)
+    create_exchange_request(book_id=second_book.id, requester_profile=first)
+    create_exchange_request(book_id=first_book.id, requester_profile=second)
+
+    (cycle,) = propose_cycles()
+    confirm_cycle(cycle.id, first)
+    confirm_cycle(cycle.id, second)
+
+    cycle.refresh_from_db()
+    assert cycle.status == CycleStatus.CONFIRMED
+    assert get_book(first_book.id).status == StatusBook.UNAVAILABLE.value
+    assert get_book(second_book.id).status == StatusBook.UNAVAILABLE.value
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_change_log_lives_in_each_shard(profile_factory):
+    first, second = profile_factory(), profile_factory()
+    place_owner(first, "default")
+    place_owner(second, "shard_1")
+    _, cursor, _ = changes_since(None, ["id", "title"])
+
+    first_book = add_new_book(book_data("Iracema"), first)
+    second_book = add_new_book(book_data("Dom Casmurro"), second)
+    changes, positions, _ = changes_since(cursor, ["id", "title"])
+
+    assert ChangeLog.objects.using("shard_1").get().object_id == second_book.id
+    assert {row["id"] for row in changes["books"]["created"]} == {
+        first_book.id,
+        second_book.id,
+    }
+    assert positions["shard_1"] > cursor["shard_1"]
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_exchange_events_live_in_shard_and_history_in_default(
+    profile_factory, django_capture_on_commit_callbacks
+):
+    owner, requester = profile_factory(), profile_factory()
+    place_owner(owner, "shard_1")
+    place_owner(requester, "default")
+    book = add_new_book(book_data("Senhora"), owner)
+
+    with django_capture_on_commit_callbacks(using="shard_1", execute=True):
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    assert ExchangeEvent.objects.using("shard_1").get().exchange_id == exchange.id
+    assert not ExchangeEvent.objects.using("default").exists()
+    assert [row.exchange_id for row in get_history_page(requester)[0]] == [exchange.id]
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_archive_stays_in_the_exchange_shard(profile_factory):
+    first, second, requester = profile_factory(), profile_factory(), profile_factory()
+    place_owner(first, "default")
+    place_owner(second, "shard_1")
+    place_owner(requester, "default")
+    ids = []
+    for owner in (first, second):
+        book = add_new_book(book_data("Iracema"), owner)
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+        respond_to_exchange_request(exchange.id, owner, "reject")
+        ids.append(exchange.id)
+
+    assert archive_closed_exchanges(older_than=timedelta(0)) == 2
+
+    assert ArchivedExchange.objects.using("shard_1").get().id == ids[1]
+    assert not BookExchange.objects.using("shard_1").exists()
+    rows, _ = get_sent_history(requester)
+    assert [row.id for row in rows] == sorted(ids, reverse=True)
+
+
+@multiple_shards
+@pytest.mark.django_db(databases="__all__")
+def test_sent_inbox_tabs_merge_shards(profile_factory):
+    first, second, requester = profile_factory(), profile_factory(), profile_factory()
+    place_owner(first, "default")
+    place_owner(second, "shard_1")
+    ids = []
+    for owner in (first, second, first):
+        book = add_new_book(book_data("Senhora"), owner)
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+        ids.append(exchange.id)
+
+    first_page, before = get_sent_page(requester, "pending", limit=2)
+    second_page, last = get_sent_page(requester, "pending", before, limit=2)
+
+    assert [e.id for e in first_page + second_page] == sorted(ids, reverse=True)
+    assert last is None
+    assert get_sent_counts(requester)["pending"] == 3
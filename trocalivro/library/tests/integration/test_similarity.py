@@ -0,0 +1,137 @@
+import pytest
+from django.urls import reverse
+
+from library.jobs import run_next
+from library.models import SimilarBook, StatusBook
+from library.services.books_management_service import add_new_book
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from library.similarity import (
+    batched_top_k,
+    fit,
+    load_index,
+    rebuild_index,
+    term_counts,
+    transform,
+)
+
+CATALOG = [
+    ("Dom Casmurro", "Machado de Assis", "Romance", "Ciúme de Bentinho por Capitu"),
+    ("Memórias Póstumas", "Machado de Assis", "Romance", "Defunto autor narra"),
+    ("Química Geral", "Russell", "Didático", "Reações, átomos e ligações"),
+    ("Química Orgânica", "Solomons", "Didático", "Reações do carbono"),
+]
+
+
+@pytest.fixture
+def index_dir(settings, tmp_path):
+    settings.SIMILARITY_INDEX_DIR = tmp_path / "index"
+    return settings.SIMILARITY_INDEX_DIR
+
+
+@pytest.fixture
+def catalog(book_factory, index_dir):
+    return {
+        title: book_factory(title=title, author=author, genre=genre, description=text)
+        for title, author, genre, text in CATALOG
+    }
+
+
+def documents():
+    return [
+        term_counts(dict(zip(["title", "author", "genre", "description"], row)))
+        for row in CATALOG
+    ]
+
+
+def test_rows_are_float32_unit_vectors():
+    vocabulary, idf = fit(documents())
+
+    matrix = transform(documents(), vocabulary, idf)
+
+    assert matrix.dtype == np.float32
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    assert np.allclose(norms, 1)
+
+
+def test_batched_top_k_matches_single_block():
+    vocabulary, idf = fit(documents())
+    matrix = transform(documents(), vocabulary, idf)
+    allowed = np.ones(len(CATALOG), dtype=bool)
+
+    small = batched_top_k(matrix, 2, allowed, block_size=1)
+    large = batched_top_k(matrix, 2, allowed, block_size=100)
+
+    for a, b in zip(small, large):
+        assert np.allclose(a, b)
+    rows, cols, _, ranks = small
+    first = ranks == 0
+    assert dict(zip(rows[first].tolist(), cols[first].tolist())) == {
+        0: 1,
+        1: 0,
+        2: 3,
+        3: 2,
+    }
+
+
+@pytest.mark.django_db
+def test_rebuild_stores_neighbours_and_memory_maps_matrix(catalog):
+    rebuild_index()
+
+    similar = SimilarBook.objects.filter(book_id=catalog["Dom Casmurro"].id)
+    assert similar[0].title == "Memórias Póstumas"
+    assert similar[0].author == "Machado de Assis"
+    # A matriz usa os arrays abertos por mmap, sem cópia.
+    base = load_index().matrix.data
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+
+
+@pytest.mark.django_db
+def test_rebuild_skips_traded_books(catalog):
+    catalog["Memórias Póstumas"].status = StatusBook.UNAVAILABLE.value
+    catalog["Memórias Póstumas"].save()
+
+    rebuild_index()
+
+    similar = SimilarBook.objects.filter(book_id=catalog["Dom Casmurro"].id)
+    assert "Memórias Póstumas" not in {s.title for s in similar}
+
+
+@pytest.mark.django_db
+def test_new_book_is_indexed_incrementally(
+    catalog, profile_factory, django_capture_on_commit_callbacks
+):
+    rebuild_index()
+    data = {
+        "title": "Química Analítica",
+        "author": "Skoog",
+        "genre": "Didático",
+        "description": "Reações e equilíbrio",
+    }
+
+    with django_capture_on_commit_callbacks(execute=True):
+        book = add_new_book(data, profile_factory())
+    while run_next("w1"):
+        pass
+
+    own = SimilarBook.objects.filter(book_id=book.id)
+    assert own[0].title.startswith("Química")
+    other = SimilarBook.objects.filter(book_id=catalog["Química Geral"].id)
+    assert book.id in {s.recommended_id for s in other}
+    delta_ids, delta = load_index().load_delta()
+    assert delta_ids.tolist() == [book.id]
+    assert delta.shape[0] == 1
+
+
+@pytest.mark.django_db
+def test_detail_page_lists_similar_books(client, catalog):
+    rebuild_index()
+
+    response = client.get(reverse("book-detail", args=[catalog["Dom Casmurro"].id]))
+
+    assert "Livros parecidos" in response.content.decode()
+    assert "Memórias Póstumas" in response.content.decode()
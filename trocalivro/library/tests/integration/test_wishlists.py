@@ -0,0 +1,165 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.jobs import run_next
+from library.models import Notification, Wishlist, WishlistMatch
+from library.services.books_management_service import add_new_book
+from library.wishlists import (
+    find_matching_wishlists,
+    genre_wishlists,
+    index_key_for,
+    tokenize,
+)
+
+
+def book_data(title, author="", genre=""):
+    return {"title": title, "description": "-", "author": author, "genre": genre}
+
+
+def test_tokenize_normalizes_accents_and_drops_stopwords():
+    assert tokenize("O Cortiço de Aluísio Azevedo") == {"cortico", "aluisio", "azevedo"}
+
+
+def test_index_key_prefers_longest_title_or_author_word():
+    assert index_key_for(Wishlist(title="Dom Casmurro")) == "t:casmurro"
+    assert index_key_for(Wishlist(author="José de Alencar", genre="Romance")) == (
+        "a:alencar"
+    )
+    assert index_key_for(Wishlist(genre="Ficção científica")) == "g:cientifica"
+
+
+@pytest.mark.django_db
+def test_book_matches_wishlists_with_all_words(profile_factory, book_factory):
+    reader = profile_factory()
+    wanted = Wishlist.objects.create(profile=reader, title="casmurro", author="Machado")
+    Wishlist.objects.create(profile=reader, title="Memórias Póstumas")
+    Wishlist.objects.create(profile=reader, title="Dom Casmurro", genre="Poesia")
+    book = book_factory(
+        title="Dom Casmurro", author="Machado de Assis", genre="Romance"
+    )
+
+    assert find_matching_wishlists(book) == [wanted]
+
+
+@pytest.mark.django_db
+def test_owner_wishlist_is_ignored(profile_factory, book_factory):
+    owner = profile_factory()
+    Wishlist.objects.create(profile=owner, title="Iracema")
+
+    assert find_matching_wishlists(book_factory(owner=owner, title="Iracema")) == []
+
+
+@pytest.mark.django_db
+def test_lookup_uses_index_key_instead_of_scanning(profile_factory, book_factory):
+    reader = profile_factory()
+    Wishlist.objects.bulk_create(
+        Wishlist(profile=reader, title=f"livro {n}", index_key=f"t:livro{n}")
+        for n in range(200)
+    )
+    book = book_factory(title="Iracema", author="José de Alencar")
+
+    with CaptureQueriesContext(connection) as context:
+        find_matching_wishlists(book)
+
+    (query,) = context.captured_queries
+    plan = Wishlist.objects.filter(index_key__in=["t:iracema"]).explain()
+    assert "wishlist_index_key_idx" in plan
+    assert '"index_key" IN' in query["sql"]
+
+
+@pytest.mark.django_db
+def test_new_book_records_matches_and_notifies(
+    profile_factory, django_capture_on_commit_callbacks
+):
+    reader = profile_factory()
+    entry = Wishlist.objects.create(profile=reader, title="Iracema")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        book = add_new_book(
+            book_data("Iracema", "José de Alencar", "Romance"), profile_factory()
+        )
+    while run_next("w1"):
+        pass
+
+    assert list(WishlistMatch.objects.values_list("wishlist", "book_id")) == [
+        (entry.id, book.id)
+    ]
+    notification = Notification.objects.get(kind="wishlist.match")
+    assert notification.recipient == reader
+    assert notification.book_title == "Iracema"
+
+
+@pytest.mark.django_db
+def test_genre_only_wishlists_are_matched_in_capped_batches(
+    settings, profile_factory, django_capture_on_commit_callbacks
+):
+    settings.WISHLIST_GENRE_BATCH_SIZE = 2
+    settings.WISHLIST_GENRE_MATCH_LIMIT = 3
+    entries = [
+        Wishlist.objects.create(profile=profile_factory(), genre="Romance")
+        for _ in range(4)
+    ]
+    poetry = Wishlist.objects.create(profile=profile_factory(), genre="Poesia")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        book = add_new_book(
+            book_data("Iracema", "José de Alencar", "Romance"), profile_factory()
+        )
+    assert find_matching_wishlists(book) == []
+    # Cada job agenda o próximo lote no commit.
+    ran = True
+    while ran:
+        with django_capture_on_commit_callbacks(execute=True):
+            ran = run_next("w1")
+
+    # Os três mais novos, em dois jobs; o mais antigo passa do limite.
+    matched = set(WishlistMatch.objects.values_list("wishlist", flat=True))
+    assert matched == {entry.id for entry in entries[1:]}
+    assert poetry.id not in matched
+    assert Notification.objects.filter(kind="wishlist.match").count() == 3
+
+
+@pytest.mark.django_db
+def test_genre_batch_reads_the_index_newest_first(profile_factory, book_factory):
+    reader = profile_factory()
+    Wishlist.objects.create(profile=reader, genre="Romance")
+    book = book_factory(title="Iracema", genre="Romance")
+
+    with CaptureQueriesContext(connection) as context:
+        genre_wishlists(book, "g:romance", before=10**9, limit=2)
+
+    (query,) = context.captured_queries
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+    assert "wishlist_index_key_idx" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.django_db
+def test_wishlist_page_adds_lists_and_removes(client, user_factory, profile_factory):
+    user = user_factory()
+    profile = profile_factory(user=user)
+    client.force_login(user)
+
+    client.post(reverse("users-wishlist"), {"title": "Dom Casmurro"})
+    response = client.get(reverse("users-wishlist"))
+    (entry,) = response.context["entries"]
+    assert entry.profile == profile
+    assert entry.index_key == "t:casmurro"
+
+    client.post(reverse("users-wishlist"), {"action": "remove", "entry_id": entry.id})
+    assert not Wishlist.objects.exists()
+
+
+@pytest.mark.django_db
+def test_empty_wishlist_entry_is_rejected(client, user_factory, profile_factory):
+    user = user_factory()
+    profile_factory(user=user)
+    client.force_login(user)
+
+    client.post(reverse("users-wishlist"), {"title": "", "author": ""})
+
+    assert not Wishlist.objects.exists()
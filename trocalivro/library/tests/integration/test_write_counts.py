@@ -0,0 +1,134 @@
+"""
+Conta os UPDATEs emitidos por login, cadastro e transições de troca.
+
+As tabelas de sessão ficam de fora: interessam apenas as escritas em
+usuários, perfis, livros e trocas.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.models import Book, Profile, StatusBook
+from library.services.exchange_service import (
+    create_exchange_request,
+    respond_to_exchange_request,
+)
+
+
+def model_updates(context):
+    return [
+        query["sql"]
+        for query in context.captured_queries
+        if query["sql"].startswith("UPDATE")
+        and "django_session" not in query["sql"]
+        # Reserva de ids quando há vários shards (library.sharding).
+        and "library_shardsequence" not in query["sql"]
+    ]
+
+
+@pytest.mark.django_db
+def test_login_updates_only_last_login(client):
+    User.objects.create_user(username="leitor", password="senha")
+
+    with CaptureQueriesContext(connection) as context:
+        client.post(
+            reverse("custom_login"), {"username": "leitor", "password": "senha"}
+        )
+
+    updates = model_updates(context)
+    assert len(updates) == 1
+    assert 'SET "last_login"' in updates[0]
+    assert not any("library_profile" in q["sql"] for q in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_signup_writes_profile_once(client):
+    data = {
+        "username": "novousuario",
+        "firstname": "João",
+        "lastname": "Silva",
+        "email": "joao@example.com",
+        "phone_number": "11999999999",
+        "address": "Rua das Flores, 123",
+        "password1": "SenhaForte123",
+        "password2": "SenhaForte123",
+    }
+
+    with CaptureQueriesContext(connection) as context:
+        client.post(reverse("signup"), data)
+
+    updates = model_updates(context)
+    profile_updates = [sql for sql in updates if "library_profile" in sql]
+    user_updates = [sql for sql in updates if "auth_user" in sql]
+    assert len(profile_updates) == 1
+    assert '"reputation"' not in profile_updates[0]
+    assert len(user_updates) == 1  # last_login do login automático
+    assert User.objects.get(username="novousuario").check_password("SenhaForte123")
+
+
+@pytest.mark.django_db
+def test_exchange_transitions_write_only_changed_columns(profile_factory, book_factory):
+    owner = profile_factory()
+    requester = profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+
+    with CaptureQueriesContext(connection) as context:
+        exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    updates = model_updates(context)
+    assert len(updates) == 1
+    assert 'UPDATE "library_book" SET "status"' in updates[0]
+    assert '"title"' not in updates[0]
+
+    with CaptureQueriesContext(connection) as context:
+        respond_to_exchange_request(
+            exchange_id=exchange.id, owner_profile=owner, action="accept"
+        )
+    updates = model_updates(context)
+    assert len(updates) == 2
+    assert '"title"' not in updates[0]
+    assert '"book_id"' not in updates[1]
+
+
+@pytest.mark.django_db
+def test_unchanged_save_issues_no_query(book_factory):
+    book = Book.objects.get(pk=book_factory().pk)
+
+    with CaptureQueriesContext(connection) as context:
+        book.save()
+
+    assert len(context.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_saving_user_does_not_touch_unloaded_profile(user_factory):
+    user = User.objects.get(pk=user_factory().pk)
+    user.first_name = "Ana"
+
+    with CaptureQueriesContext(connection) as context:
+        user.save()
+
+    assert not any("library_profile" in q["sql"] for q in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_profile_change_through_user_is_still_saved(user_factory):
+    user = User.objects.get(pk=user_factory().pk)
+    user.profile.firstname = "Ana"
+    user.save()
+
+    assert Profile.objects.get(user=user).firstname == "Ana"
+
+
+@pytest.mark.django_db
+def test_refresh_resets_dirty_state(book_factory):
+    book = Book.objects.get(pk=book_factory(status=StatusBook.AVAILABLE.value).pk)
+    Book.objects.filter(pk=book.pk).update(status=StatusBook.UNAVAILABLE.value)
+    book.refresh_from_db()
+    book.status = StatusBook.AVAILABLE.value
+
+    book.save()
+
+    assert Book.objects.get(pk=book.pk).status == StatusBook.AVAILABLE.value
@@ -0,0 +1,139 @@
+import sqlite3
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from library import db_routers
+from library.db_routers import (
+    ReplicaRouter,
+    is_pinned,
+    pin_to_primary,
+    refresh_replica,
+    unpin,
+)
+from library.middleware import PINNED_COOKIE, ReplicaPinningMiddleware
+from library.models import Book
+
+
+@pytest.fixture
+def replicas(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ["replica_1", "replica_2"]
+    settings.REPLICA_MAX_LAG = 10
+    lags = {"replica_1": 1.0, "replica_2": 2.0}
+    monkeypatch.setattr(db_routers, "replica_lag", lags.get)
+    token = pin_to_primary(False)
+    yield lags
+    unpin(token)
+
+
+def test_reads_go_to_primary_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+    token = pin_to_primary(False)
+    try:
+        assert ReplicaRouter().db_for_read(Book) == "default"
+    finally:
+        unpin(token)
+
+
+def test_reads_go_to_fresh_replicas(replicas):
+    assert ReplicaRouter().db_for_read(Book) in {"replica_1", "replica_2"}
+
+
+def test_lagging_replicas_fall_back_to_primary(replicas):
+    replicas["replica_1"] = 60.0
+    replicas["replica_2"] = None  # arquivo ainda não copiado
+
+    assert ReplicaRouter().db_for_read(Book) == "default"
+
+
+def test_write_pins_following_reads_to_primary(replicas):
+    router = ReplicaRouter()
+
+    assert router.db_for_write(Book) == "default"
+    assert is_pinned()
+    assert router.db_for_read(Book) == "default"
+
+
+def test_select_for_update_uses_primary(replicas):
+    assert Book.objects.select_for_update().db == "default"
+
+
+def test_replicas_are_not_migrated(replicas):
+    router = ReplicaRouter()
+
+    assert router.allow_migrate("replica_1", "library") is False
+    assert router.allow_migrate("default", "library") is None
+
+
+def test_middleware_sets_sticky_cookie_after_write(replicas):
+    def view(request):
+        ReplicaRouter().db_for_write(Book)
+        return HttpResponse()
+
+    response = ReplicaPinningMiddleware(view)(RequestFactory().post("/"))
+
+    assert PINNED_COOKIE in response.cookies
+    assert not is_pinned()
+
+
+def test_middleware_pins_requests_with_cookie(replicas):
+    seen = {}
+
+    def view(request):
+        seen["db"] = ReplicaRouter().db_for_read(Book)
+        return HttpResponse()
+
+    request = RequestFactory().get("/")
+    request.COOKIES[PINNED_COOKIE] = "1"
+    ReplicaPinningMiddleware(view)(request)
+
+    assert seen["db"] == "default"
+
+
+def test_read_only_request_with_cookie_does_not_refresh_it(replicas):
+    def view(request):
+        ReplicaRouter().db_for_read(Book)
+        return HttpResponse()
+
+    request = RequestFactory().get("/")
+    request.COOKIES[PINNED_COOKIE] = "1"
+    response = ReplicaPinningMiddleware(view)(request)
+
+    assert PINNED_COOKIE not in response.cookies
+
+
+def test_read_only_request_is_not_pinned(replicas):
+    response = ReplicaPinningMiddleware(lambda request: HttpResponse())(
+        RequestFactory().get("/")
+    )
+
+    assert PINNED_COOKIE not in response.cookies
+
+
+def test_middleware_pins_async_views(replicas):
+    async def view(request):
+        ReplicaRouter().db_for_write(Book)
+        return HttpResponse()
+
+    middleware = ReplicaPinningMiddleware(view)
+    response = async_to_sync(middleware)(RequestFactory().post("/"))
+
+    assert iscoroutinefunction(middleware)
+    assert PINNED_COOKIE in response.cookies
+
+
+def test_refresh_replica_copies_with_backup_api(tmp_path):
+    primary = tmp_path / "primary.sqlite3"
+    replica = tmp_path / "replica.sqlite3"
+    with sqlite3.connect(primary) as connection:
+        connection.execute("CREATE TABLE livro (titulo TEXT)")
+        connection.execute("INSERT INTO livro VALUES ('Dom Casmurro')")
+    connection.close()
+
+    refresh_replica(primary, replica)
+
+    copy = sqlite3.connect(replica)
+    assert copy.execute("SELECT titulo FROM livro").fetchall() == [("Dom Casmurro",)]
+    copy.close()
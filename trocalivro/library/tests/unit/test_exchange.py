@@ -1,12 +1,14 @@
 import pytest
+from django.db import IntegrityError, transaction
+
+from library.models import Book, BookExchange, StatusBook
 from library.services.exchange_service import (
     BookExchangeError,
     create_exchange_request,
-    get_received_requests,
-    get_sent_requests,
+    get_received_page,
+    get_sent_page,
     respond_to_exchange_request,
 )
-from library.models import StatusBook
 
 
 @pytest.mark.django_db
@@ -62,6 +64,60 @@ def test_duplicate_request_not_allowed(book_factory, profile_factory):
     )
 
 
+@pytest.mark.django_db
+def test_pending_request_unique_constraint(book_factory, profile_factory):
+    owner = profile_factory()
+    requester = profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        BookExchange.objects.bulk_create(
+            [
+                BookExchange(
+                    book=book,
+                    requester=requester,
+                    owner=owner,
+                    status=StatusBook.IN_EXCHANGE.value,
+                )
+            ]
+        )
+
+
+@pytest.mark.django_db
+def test_duplicate_request_race_translated_to_domain_error(
+    book_factory, profile_factory
+):
+    owner = profile_factory()
+    requester = profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    create_exchange_request(book_id=book.id, requester_profile=requester)
+    # Simula uma transação concorrente que ainda viu o livro disponível.
+    Book.objects.filter(id=book.id).update(status=StatusBook.AVAILABLE.value)
+
+    with pytest.raises(BookExchangeError) as excinfo:
+        create_exchange_request(book_id=book.id, requester_profile=requester)
+    assert "Você já tem uma solicitação de troca pendente para este livro." in str(
+        excinfo.value
+    )
+    assert BookExchange.objects.filter(book=book).count() == 1
+
+
+@pytest.mark.django_db
+def test_new_request_allowed_after_rejection(book_factory, profile_factory):
+    owner = profile_factory()
+    requester = profile_factory()
+    book = book_factory(owner=owner, status=StatusBook.AVAILABLE.value)
+    exchange = create_exchange_request(book_id=book.id, requester_profile=requester)
+    respond_to_exchange_request(
+        exchange_id=exchange.id, owner_profile=owner, action="reject"
+    )
+
+    second = create_exchange_request(book_id=book.id, requester_profile=requester)
+
+    assert second.status == StatusBook.IN_EXCHANGE.value
+
+
 @pytest.mark.django_db
 def test_request_nonexistent_book(profile_factory):
     requester = profile_factory()
@@ -72,7 +128,7 @@ def test_request_nonexistent_book(profile_factory):
 
 
 @pytest.mark.django_db
-def test_get_sent_requests_returns_only_user_requests(profile_factory, book_factory):
+def test_get_sent_page_returns_only_user_requests(profile_factory, book_factory):
     owner = profile_factory()
     requester = profile_factory()
     other_requester = profile_factory()
@@ -87,15 +143,13 @@ def test_get_sent_requests_returns_only_user_requests(profile_factory, book_fact
         book_id=book_not_requested.id, requester_profile=other_requester
     )
 
-    sent_requests = list(get_sent_requests(requester))
+    sent_requests, _ = get_sent_page(requester, "pending")
 
     assert sent_requests == [sent_exchange]
 
 
 @pytest.mark.django_db
-def test_get_received_requests_returns_only_owner_requests(
-    profile_factory, book_factory
-):
+def test_get_received_page_returns_only_owner_requests(profile_factory, book_factory):
     owner = profile_factory()
     requester = profile_factory()
     other_owner = profile_factory()
@@ -108,7 +162,7 @@ def test_get_received_requests_returns_only_owner_requests(
     )
     create_exchange_request(book_id=other_book.id, requester_profile=requester)
 
-    received_requests = list(get_received_requests(owner))
+    received_requests, _ = get_received_page(owner, "pending")
 
     assert received_requests == [exchange]
 
@@ -0,0 +1,68 @@
+import pytest
+
+from library.geo import (
+    COLUMNS,
+    cell_ranges,
+    distance_km,
+    geocode,
+    grid_cell,
+)
+from library.models import Profile
+
+
+def test_geocode_prefers_postal_code():
+    assert geocode("Rua Bahia, 100 - CEP 30160-011") == (-19.9167, -43.9345)
+
+
+def test_geocode_uses_last_city_mentioned():
+    assert geocode("Rua São Paulo, 10, Centro, Belo Horizonte - MG") == (
+        -19.9167,
+        -43.9345,
+    )
+    assert geocode("Av. Paulista, 1000, São Paulo") == (-23.5505, -46.6333)
+    assert geocode("Endereço sem cidade conhecida") is None
+
+
+def test_distance_between_capitals():
+    rio, sao_paulo = (-22.9068, -43.1729), (-23.5505, -46.6333)
+
+    assert distance_km(*rio, *sao_paulo) == pytest.approx(357, abs=5)
+
+
+def test_cell_ranges_cover_circle_with_one_range_per_row():
+    latitude, longitude = -23.5505, -46.6333
+
+    ranges = cell_ranges(latitude, longitude, 25)
+
+    rows = {first // COLUMNS for first, _ in ranges}
+    assert len(rows) == len(ranges)
+    home = grid_cell(latitude, longitude)
+    assert any(first <= home <= last for first, last in ranges)
+    # Um ponto a ~20 km a leste também está coberto.
+    east = grid_cell(latitude, longitude + 0.19)
+    assert any(first <= east <= last for first, last in ranges)
+
+
+def test_cell_ranges_split_at_antimeridian():
+    ranges = cell_ranges(0, 179.99, 10)
+
+    assert any(last % COLUMNS == COLUMNS - 1 for _, last in ranges)
+    assert any(first % COLUMNS == 0 for first, _ in ranges)
+
+
+@pytest.mark.django_db
+def test_profile_location_follows_address(profile_factory):
+    profile = profile_factory()
+    profile.address = "Rua XV de Novembro, Curitiba"
+    profile.save()
+    assert profile.has_location
+    assert profile.grid_cell == grid_cell(-25.4284, -49.2733)
+
+    profile.address = "Sem endereço"
+    profile.save()
+    profile.refresh_from_db()
+    assert profile.latitude is None and profile.grid_cell is None
+
+    profile.address = "CEP 90010-000"
+    profile.save(update_fields=["address"])
+    assert Profile.objects.get(pk=profile.pk).latitude == -30.0346
@@ -0,0 +1,32 @@
+import threading
+
+from library.locks import file_lock
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = tmp_path / "delta.lock"
+    order = []
+
+    def other():
+        with file_lock(path):
+            order.append("other")
+
+    with file_lock(path):
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join(0.2)
+        order.append("first")
+    thread.join(30)
+
+    assert order == ["first", "other"]
+
+
+def test_file_lock_can_be_taken_again(tmp_path):
+    path = tmp_path / "delta.lock"
+
+    with file_lock(path):
+        pass
+    with file_lock(path):
+        pass
+
+    assert path.exists()
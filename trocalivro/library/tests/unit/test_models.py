@@ -0,0 +1,37 @@
+import pytest
+
+from library.models import Book, BookExchange, StatusBook
+
+
+def test_status_accepts_text_values():
+    book = Book(status="IN EXCHANGE")
+
+    assert book.status == StatusBook.IN_EXCHANGE
+    assert book.get_status_display() == "IN EXCHANGE"
+
+
+def test_status_accepts_enum_names():
+    exchange = BookExchange(status="UNAVAILABLE")
+
+    assert exchange.status == StatusBook.UNAVAILABLE.value
+
+
+def test_status_rejects_unknown_text():
+    with pytest.raises(ValueError):
+        Book(status="LOST")
+
+
+@pytest.mark.django_db
+def test_status_filter_accepts_text_values(book_factory):
+    book = book_factory(status=StatusBook.AVAILABLE.value)
+    book_factory(status=StatusBook.UNAVAILABLE.value)
+
+    assert list(Book.objects.filter(status="AVAILABLE")) == [book]
+
+
+@pytest.mark.django_db
+def test_status_is_stored_as_integer(book_factory):
+    book = book_factory(status="IN EXCHANGE")
+
+    stored = Book.objects.filter(pk=book.pk).values_list("status", flat=True).get()
+    assert stored == StatusBook.IN_EXCHANGE.value == 2
@@ -0,0 +1,122 @@
+"""
+Testes de regressão dos planos de consulta (EXPLAIN QUERY PLAN do SQLite).
+
+Cada consulta quente deve usar um índice: falham se o plano cair em uma
+varredura completa da tabela ou precisar ordenar com uma B-tree temporária.
+"""
+
+import re
+from contextlib import ExitStack
+
+import pytest
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from library.archive import closed_exchanges
+from library.expiry import stale_requests
+from library.geo import candidate_profiles
+from library.services.books_management_service import get_home_feed, get_owner_books
+from library.services.exchange_service import (
+    get_pending_requests,
+    get_received_counts,
+    get_received_page,
+    get_sent_page,
+)
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != "sqlite", reason="EXPLAIN QUERY PLAN é do SQLite"
+    ),
+]
+
+FULL_SCAN = re.compile(r"\bSCAN (\S+)(?!.*\bUSING\b.*\bINDEX\b)")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+
+def assert_uses_indexes(queryset):
+    assert_plan_uses_indexes(queryset.explain())
+
+
+def assert_plan_uses_indexes(plan):
+    for line in plan.splitlines():
+        assert not FULL_SCAN.search(line), f"Varredura completa:\n{plan}"
+        assert not TEMP_SORT.search(line), f"Ordenação sem índice:\n{plan}"
+
+
+def query_plans(run):
+    """Planos das consultas que ``run()`` faz, em todos os shards."""
+    with ExitStack() as stack:
+        contexts = {
+            alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in settings.DATABASE_SHARDS
+        }
+        run()
+    plans = []
+    for alias, context in contexts.items():
+        for query in context.captured_queries:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                plans.append("\n".join(str(row[-1]) for row in cursor.fetchall()))
+    assert plans
+    return plans
+
+
+def assert_queries_use_indexes(run):
+    for plan in query_plans(run):
+        assert_plan_uses_indexes(plan)
+
+
+@pytest.fixture
+def profiles(profile_factory, book_factory):
+    owner = profile_factory()
+    requester = profile_factory()
+    book = book_factory(owner=owner)
+    return owner, requester, book
+
+
+def test_pending_requests_plan(profiles):
+    _, requester, book = profiles
+    assert_uses_indexes(get_pending_requests(book, requester))
+
+
+def test_home_feed_plan(profiles):
+    assert_queries_use_indexes(lambda: list(get_home_feed()))
+
+
+def test_owner_books_plan(profiles):
+    owner, _, _ = profiles
+    assert_uses_indexes(get_owner_books(owner))
+
+
+def test_full_scan_is_detected():
+    plan_line = "2 0 0 SCAN library_book"
+    assert FULL_SCAN.search(plan_line)
+    assert not FULL_SCAN.search("2 0 0 SCAN library_book USING INDEX book_recent_idx")
+
+
+def test_nearby_profiles_plan(profiles):
+    assert_uses_indexes(candidate_profiles(-23.55, -46.63, 25))
+
+
+def test_stale_requests_plan(profiles):
+    assert_uses_indexes(stale_requests("default", timezone.now())[:200])
+
+
+def test_closed_exchanges_plan(profiles):
+    assert_uses_indexes(closed_exchanges("default", timezone.now())[:500])
+
+
+def test_inbox_tab_plan(profiles):
+    owner, requester, _ = profiles
+    assert_queries_use_indexes(lambda: get_sent_page(requester, "accepted"))
+    assert_queries_use_indexes(lambda: get_received_page(owner, "accepted"))
+
+
+def test_inbox_counts_plan(profiles):
+    owner, _, _ = profiles
+    (plan,) = query_plans(lambda: get_received_counts(owner))
+    assert_plan_uses_indexes(plan)
+    assert "COVERING INDEX" in plan
@@ -1,19 +1,62 @@
-from django.urls import path, include
-from library import views
+from django.conf import settings
+from django.urls import include, path
 
+from library import api_views, views
+
+# Sob ASGI as páginas de leitura usam as versões assíncronas.
+if settings.ASYNC_VIEWS:
+    from library import async_views as read_views
+else:
+    read_views = views
 
 urlpatterns = [
-    path("", views.index, name="index"),
-    path("search/", views.search_book, name="search-books"),
+    path("", read_views.index, name="index"),
+    path("search/", read_views.search_book, name="search-books"),
     path("book/", views.book_add, name="book-add"),
-    path("book/<int:id>", views.book_detail_view, name="book-detail"),
+    path("book/<int:id>", read_views.book_detail_view, name="book-detail"),
     path("profile/", views.profile, name="users-profile"),
     path("profile/edit", views.edit_profile, name="users-edit"),
-    path("profile/sends", views.send_books, name="send-books"),
-    path("profile/received", views.received_books, name="received-books"),
+    path("profile/wishlist", views.wishlist, name="users-wishlist"),
+    path("profile/sends", read_views.send_books, name="send-books"),
+    path("profile/received", read_views.received_books, name="received-books"),
+    path("profile/cycles", views.exchange_cycles, name="exchange-cycles"),
+    path("profile/history", views.exchange_history, name="exchange-history"),
+    path("profile/export/books", views.export_books, name="export-books"),
+    path("profile/export/exchanges", views.export_exchanges, name="export-exchanges"),
+    path("staff/import", views.import_books, name="staff-import"),
     path("login/", views.login_view, name="custom_login"),
     path("signup/", views.signup, name="signup"),
     path("accounts/", include("django.contrib.auth.urls")),
     # Path da solicitação de troca de um livro
     path("book/<int:id>/request/", views.request_exchange_view, name="book-request"),
+    path("exchange/<int:id>/rate", views.rate_exchange_view, name="exchange-rate"),
+    # API JSON do aplicativo (library.api_views).
+    path("api/books", api_views.books, name="api-books"),
+    path("api/books/<int:id>", api_views.book_detail, name="api-book-detail"),
+    path("api/changes", api_views.book_changes, name="api-changes"),
+    path(
+        "api/books/<int:id>/exchanges",
+        api_views.request_exchange,
+        name="api-book-request",
+    ),
+    path(
+        "api/exchanges/<int:id>/respond",
+        api_views.respond_exchange,
+        name="api-exchange-respond",
+    ),
+    path(
+        "api/exchanges/<int:id>/rating",
+        api_views.exchange_rating,
+        name="api-exchange-rate",
+    ),
 ]
+
+if settings.ASYNC_VIEWS:
+    # O stream SSE mantém a conexão aberta; só faz sentido sob ASGI.
+    urlpatterns.append(
+        path(
+            "profile/events",
+            read_views.exchange_events,
+            name="exchange-events",
+        )
+    )
@@ -1,37 +1,104 @@
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.exceptions import PermissionDenied
 from django.http import Http404
+from django.shortcuts import redirect, render
+from django.urls import reverse
+
+from library import exports
+from library.forms import (
+    BookForm,
+    EditProfile,
+    ImportBooksForm,
+    SignUpForm,
+    WishlistForm,
+)
+from library.geo import profiles_within
+from library.history import EVENT_DESCRIPTIONS, get_history_page
+from library.middleware import invalidate_session_user
 
-from library.forms import EditProfile, SignUpForm, BookForm
-from .models import Book
+from .models import Book, CycleStatus, Profile
+from .services.books_management_service import (
+    BookAdditionError,
+    add_new_book,
+    display_book_image,
+    get_book,
+    get_book_recommendations,
+    get_home_feed,
+    get_owner_books,
+    get_profile_recommendations,
+    get_similar_books,
+    search_books,
+)
+from .services.cycle_service import (
+    ExchangeCycleError,
+    confirm_cycle,
+    decline_cycle,
+    get_proposed_cycles,
+)
 from .services.exchange_service import (
+    INBOX_TABS,
     BookExchangeError,
     create_exchange_request,
-    get_received_requests,
-    get_sent_requests,
+    get_received_counts,
+    get_received_history,
+    get_received_page,
+    get_sent_counts,
+    get_sent_history,
+    get_sent_page,
+    iter_exchange_history,
     respond_to_exchange_request,
 )
-from .services.books_management_service import (
-    add_new_book,
-    search_books,
-    display_book_image,
-    BookAdditionError,
+from .services.import_service import get_recent_imports, queue_upload
+from .services.rating_service import (
+    RatingError,
+    get_rated_exchange_ids,
+    rate_exchange,
+)
+from .services.wishlist_service import (
+    WishlistError,
+    add_wishlist_entry,
+    get_wishlist,
+    remove_wishlist_entry,
 )
 
+DISTANCE_CHOICES_KM = (5, 10, 25, 50, 100)
 
-def index(request):
-    num_books = Book.objects.all().count()
-    book_list = Book.objects.all()
 
-    for book in book_list:
-        book = display_book_image(book)
+def distance_filter(profile, km):
+    """
+    Contexto do filtro "perto de mim" (``?km=``) e os ids dos donos no raio,
+    ou None sem filtro (compartilhado com async_views).
+    """
+    context = {"distance_choices": DISTANCE_CHOICES_KM, "km": None}
+    try:
+        km = int(km)
+    except (TypeError, ValueError):
+        return context, None
+    if km not in DISTANCE_CHOICES_KM or profile is None:
+        return context, None
+    context["km"] = km
+    if not profile.has_location:
+        context["location_missing"] = True
+        return context, None
+    return context, profiles_within(profile.latitude, profile.longitude, km)
+
+
+def _distance_filter(request):
+    profile = request.user.profile if request.user.is_authenticated else None
+    return distance_filter(profile, request.GET.get("km"))
 
-    book_list = list(reversed(book_list))
 
-    context = {"num_books": num_books, "book_list": book_list}
+def index(request):
+    context, owner_ids = _distance_filter(request)
+    book_list = [display_book_image(book) for book in get_home_feed(owner_ids)]
+    num_books = len(book_list)
+
+    context.update({"num_books": num_books, "book_list": book_list})
 
     return render(request, "index.html", context=context)
 
@@ -47,13 +114,10 @@ def signup(request):
             user.profile.phone_number = form.cleaned_data.get("phone_number")
             user.profile.address = form.cleaned_data.get("address")
 
+            # O UserCreationForm já grava o hash da senha; só os campos
+            # alterados do perfil são atualizados aqui.
             user.profile.save()
 
-            password = form.cleaned_data.get("password1")
-            if password:
-                user.set_password(password)
-                user.save()  # Save the user again to update the password hash
-
             login(request, user)
             return redirect("/")
         else:
@@ -65,14 +129,15 @@ def signup(request):
 
 @login_required
 def profile(request):
-    user_books = Book.objects.filter(owner=request.user.profile)
-
-    for book in user_books:
-        book = display_book_image(book)
-
-    user_books = list(reversed(user_books))
+    user_books = [
+        display_book_image(book) for book in get_owner_books(request.user.profile)
+    ]
 
-    return render(request, "profile.html", {"user_books": user_books})
+    context = {
+        "user_books": user_books,
+        "recommendations": get_profile_recommendations(request.user.profile),
+    }
+    return render(request, "profile.html", context)
 
 
 @login_required
@@ -86,6 +151,7 @@ def edit_profile(request):
         form = EditProfile(request.POST, request.FILES, instance=profile)
         if form.is_valid():
             form.save()
+            invalidate_session_user(request)
         return redirect("users-profile")
     else:
         # independente se não for enviada
@@ -95,6 +161,79 @@ def edit_profile(request):
     return render(request, "edit_profile.html", {"form": form})
 
 
+@login_required
+def wishlist(request):
+    profile = request.user.profile
+    if request.method == "POST":
+        try:
+            if request.POST.get("action") == "remove":
+                remove_wishlist_entry(int(request.POST.get("entry_id", 0)), profile)
+                messages.success(request, "Pedido removido da lista de desejos.")
+            else:
+                add_wishlist_entry(request.POST, profile)
+                messages.success(request, "Pedido adicionado à lista de desejos.")
+        except (WishlistError, ValueError) as e:
+            messages.warning(request, str(e))
+        return redirect("users-wishlist")
+
+    context = {"form": WishlistForm(), "entries": get_wishlist(profile)}
+    return render(request, "wishlist.html", context)
+
+
+@login_required
+def exchange_cycles(request):
+    profile = request.user.profile
+    if request.method == "POST":
+        try:
+            cycle_id = int(request.POST.get("cycle_id", 0))
+            if request.POST.get("action") == "decline":
+                decline_cycle(cycle_id, profile)
+                messages.success(request, "Troca em cadeia recusada.")
+            else:
+                cycle = confirm_cycle(cycle_id, profile)
+                if cycle.status == CycleStatus.CONFIRMED:
+                    messages.success(request, "Troca em cadeia confirmada por todos!")
+                else:
+                    messages.success(
+                        request, "Confirmação registrada; aguardando os demais."
+                    )
+        except (ExchangeCycleError, ValueError) as e:
+            messages.warning(request, str(e))
+        return redirect("exchange-cycles")
+
+    context = {"cycles": get_proposed_cycles(profile)}
+    return render(request, "exchange_cycles.html", context)
+
+
+@staff_member_required
+def import_books(request):
+    if request.method == "POST":
+        form = ImportBooksForm(request.POST, request.FILES)
+        if form.is_valid():
+            book_import = queue_upload(
+                form.cleaned_data["file"], form.cleaned_data["owner"]
+            )
+            messages.success(request, f"Importação #{book_import.id} agendada.")
+            return redirect("staff-import")
+    else:
+        form = ImportBooksForm()
+    context = {"form": form, "imports": get_recent_imports()}
+    return render(request, "import_books.html", context)
+
+
+@login_required
+def exchange_history(request):
+    try:
+        before = int(request.GET.get("before", 0)) or None
+    except ValueError:
+        before = None
+    rows, next_before = get_history_page(request.user.profile, before=before)
+    for row in rows:
+        row.description = EVENT_DESCRIPTIONS[row.event]
+    context = {"rows": rows, "next_before": next_before}
+    return render(request, "exchange_history.html", context)
+
+
 @login_required
 def book_add(request):
     if request.method == "POST":
@@ -111,63 +250,175 @@ def book_add(request):
     return render(request, "book_add.html", {"form": form})
 
 
+def _export_target(request):
+    """Perfil e formato da exportação; a equipe pode exportar outro usuário."""
+    export_format = request.GET.get("format", "csv")
+    if export_format not in exports.FORMATS:
+        raise Http404("Formato de exportação desconhecido.")
+    username = request.GET.get("user")
+    if not username or username == request.user.username:
+        return request.user.profile, export_format
+    if not request.user.is_staff:
+        raise PermissionDenied
+    try:
+        return Profile.objects.get(user__username=username), export_format
+    except Profile.DoesNotExist:
+        raise Http404("Usuário não encontrado.")
+
+
+@login_required
+def export_books(request):
+    profile, export_format = _export_target(request)
+    books = get_owner_books(profile).iterator(chunk_size=exports.CHUNK_SIZE)
+    return exports.export_response(
+        "livros", export_format, exports.BOOK_COLUMNS, exports.book_records(books)
+    )
+
+
+@login_required
+def export_exchanges(request):
+    profile, export_format = _export_target(request)
+    history = iter_exchange_history(profile, chunk_size=exports.CHUNK_SIZE)
+    return exports.export_response(
+        "trocas",
+        export_format,
+        exports.EXCHANGE_COLUMNS,
+        exports.exchange_records(history, profile),
+    )
+
+
+def exchange_events_url():
+    """Stream SSE das trocas; só existe sob ASGI (ASYNC_VIEWS)."""
+    return reverse("exchange-events") if settings.ASYNC_VIEWS else None
+
+
+INBOX_TAB_LABELS = (
+    ("pending", "Pendentes"),
+    ("accepted", "Aceitas"),
+    ("rejected", "Recusadas"),
+    ("expired", "Expiradas"),
+    ("all", "Todas"),
+)
+# Aba sem filtro de status que inclui as trocas arquivadas (library.archive);
+# não tem contador, que exigiria contar o arquivo inteiro.
+HISTORY_TAB = "all"
+
+
+def inbox_params(request):
+    """Aba e cursor (``?tab=accepted&before=<id>``) das caixas de solicitações."""
+    tab = request.GET.get("tab")
+    if tab not in INBOX_TABS and tab != HISTORY_TAB:
+        tab = "pending"
+    try:
+        before = int(request.GET.get("before", 0)) or None
+    except ValueError:
+        before = None
+    return tab, before
+
+
+def inbox_context(page, counts, tab, rated):
+    """
+    Contexto das páginas de solicitações enviadas e recebidas (compartilhado
+    com async_views); ``rated`` são os ids das trocas que o usuário já avaliou.
+    """
+    exchanges, next_before = page
+    for exchange in exchanges:
+        display_book_image(exchange.book)
+    return {
+        "exchanges": exchanges,
+        "next_before": next_before,
+        "tab": tab,
+        "tabs": [
+            {"key": key, "label": label, "count": counts.get(key)}
+            for key, label in INBOX_TAB_LABELS
+        ],
+        "rated": rated,
+        "events_url": exchange_events_url(),
+    }
+
+
 @login_required
 def send_books(request):
-    sent_requests = get_sent_requests(request.user.profile)
-    user_books = []
-    for exchange in sent_requests:
-        book_info = {
-            "book": display_book_image(exchange.book),
-            "status": exchange.status,
-            "owner_name": exchange.book.owner.firstname,
-            "exchange_id": exchange.id,
-        }
-        user_books.append(book_info)
-    return render(request, "send_books.html", {"user_books": user_books})
+    profile = request.user.profile
+    tab, before = inbox_params(request)
+    if tab == HISTORY_TAB:
+        page = get_sent_history(profile, before)
+    else:
+        page = get_sent_page(profile, tab, before)
+    context = inbox_context(
+        page, get_sent_counts(profile), tab, get_rated_exchange_ids(profile, page[0])
+    )
+    return render(request, "send_books.html", context)
 
 
 @login_required
 def received_books(request):
     if request.method == "POST":
-        exchange_id = request.POST.get("exchange_id")
-        action = request.POST.get("action")
-        message_text = request.POST.get("message", "")
-        try:
-            exchange_id = int(exchange_id)
-            respond_to_exchange_request(
-                exchange_id=exchange_id,
-                owner_profile=request.user.profile,
-                action=action,
-                message=message_text,
-            )
-        except BookExchangeError as e:
-            messages.warning(request, str(e))
+        return respond_to_received_request(request)
+
+    profile = request.user.profile
+    tab, before = inbox_params(request)
+    if tab == HISTORY_TAB:
+        page = get_received_history(profile, before)
+    else:
+        page = get_received_page(profile, tab, before)
+    context = inbox_context(
+        page,
+        get_received_counts(profile),
+        tab,
+        get_rated_exchange_ids(profile, page[0]),
+    )
+    return render(request, "received_books.html", context)
+
+
+def respond_to_received_request(request):
+    exchange_id = request.POST.get("exchange_id")
+    action = request.POST.get("action")
+    message_text = request.POST.get("message", "")
+    try:
+        exchange_id = int(exchange_id)
+        respond_to_exchange_request(
+            exchange_id=exchange_id,
+            owner_profile=request.user.profile,
+            action=action,
+            message=message_text,
+        )
+    except BookExchangeError as e:
+        messages.warning(request, str(e))
+    else:
+        if action == "accept":
+            messages.success(request, "Solicitação aceita com sucesso.")
         else:
-            if action == "accept":
-                messages.success(request, "Solicitação aceita com sucesso.")
-            else:
-                messages.success(request, "Solicitação rejeitada.")
-        return redirect("received-books")
-
-    received_requests = get_received_requests(request.user.profile)
-    user_books = []
-    for exchange in received_requests:
-        book = display_book_image(exchange.book)
-        user_books.append(
-            {
-                "book": display_book_image(book),
-                "requester_name": exchange.requester.firstname,
-                "exchange_id": exchange.id,
-                "message": exchange.message,
-                "status": exchange.status,
-            }
+            messages.success(request, "Solicitação rejeitada.")
+    return redirect("received-books")
+
+
+@login_required
+def rate_exchange_view(request, id):
+    # Volta para a página de onde a avaliação foi enviada.
+    next_page = request.POST.get("next")
+    if next_page not in ("send-books", "received-books"):
+        next_page = "send-books"
+    if request.method != "POST":
+        return redirect(next_page)
+
+    try:
+        rate_exchange(
+            exchange_id=id,
+            rater_profile=request.user.profile,
+            score=request.POST.get("score"),
+            comment=request.POST.get("comment", ""),
         )
-    return render(request, "received_books.html", {"user_books": user_books})
+    except RatingError as e:
+        messages.warning(request, str(e))
+    else:
+        messages.success(request, "Avaliação registrada. Obrigado!")
+    return redirect(f"{reverse(next_page)}?tab=accepted")
 
 
 def book_detail_view(request, id):
     try:
-        book = Book.objects.get(id=id)
+        book = get_book(id)
     except Book.DoesNotExist:
         raise Http404("Livro não encontrado.")
 
@@ -175,16 +426,23 @@ def book_detail_view(request, id):
         "book": display_book_image(book),
         "user": request.user.profile if request.user.is_authenticated else None,
     }
-    return render(request, "book_detail.html", {"book_info": book_info})
+    context = {
+        "book_info": book_info,
+        "recommendations": get_book_recommendations(book.id),
+        "similar_books": get_similar_books(book.id),
+    }
+    return render(request, "book_detail.html", context)
 
 
 def search_book(request):
     query = request.GET.get("q")
+    context, owner_ids = _distance_filter(request)
     if query:
-        books = search_books(query)
+        books = search_books(query, owner_ids)
     else:
         books = []
-    return render(request, "index.html", {"book_list": books})
+    context.update({"book_list": books, "query": query})
+    return render(request, "index.html", context)
 
 
 # View para solicitar a troca de um livro
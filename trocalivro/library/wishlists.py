@@ -0,0 +1,186 @@
+"""
+Casamento de livros novos com as listas de desejos.
+
+Cada pedido (Wishlist) é indexado por uma única chave, a palavra mais
+seletiva do pedido com o prefixo do campo ("t:casmurro", "a:machado",
+"g:romance"). Um livro novo gera as chaves de todas as suas palavras e busca
+os candidatos com um único ``index_key IN (...)`` no índice; só esses
+candidatos têm o pedido completo conferido em Python. O custo depende das
+palavras do livro e dos candidatos, não do total de pedidos.
+
+Os pedidos só com gênero não têm palavra seletiva: todos os de "Romance"
+dividem a chave "g:romance" e cada romance novo atende a todos eles. Esses
+ficam fora da busca do livro e são conferidos em jobs à parte, um por lote de
+WISHLIST_GENRE_BATCH_SIZE, dos pedidos mais novos para os mais antigos e até
+WISHLIST_GENRE_MATCH_LIMIT por palavra do gênero. Os mais antigos além do
+limite não são avisados daquele livro.
+"""
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from library.jobs import job
+from library.models import Book, Wishlist, WishlistMatch
+from library.notifications import notify_wishlist_matches
+from library.sharding import locate
+
+# Palavras comuns demais para identificar um livro.
+STOPWORDS = frozenset(
+    "a o as os e de da do das dos em no na nos nas "  # noqa: SIM905
+    "um uma uns umas para por com the of and".split()
+)
+FIELDS = (("title", "t"), ("author", "a"), ("genre", "g"))
+GENRE_PREFIX = "g"
+MAX_TOKEN_LENGTH = 64
+
+
+def words(text):
+    """Palavras normalizadas, na ordem: minúsculas, sem acentos e sem stopwords."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = text.encode("ascii", "ignore").decode().lower()
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in re.findall(r"[a-z0-9]+", text)
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def tokenize(text):
+    """Conjunto das palavras normalizadas do texto."""
+    return set(words(text))
+
+
+def field_tokens(obj):
+    """``{prefixo: palavras}`` dos campos título, autor e gênero."""
+    return {prefix: tokenize(getattr(obj, name)) for name, prefix in FIELDS}
+
+
+def index_key_for(wishlist):
+    """
+    Chave do índice: a palavra mais longa do título ou do autor (as longas
+    tendem a ser as mais raras) ou, na falta delas, a do gênero.
+    """
+    tokens = field_tokens(wishlist)
+    selective = [(token, prefix) for prefix in "ta" for token in tokens[prefix]]
+    if not selective:
+        selective = [(token, GENRE_PREFIX) for token in tokens[GENRE_PREFIX]]
+    if not selective:
+        return ""
+    token, prefix = max(selective, key=lambda item: (len(item[0]), item[0]))
+    return f"{prefix}:{token}"
+
+
+def book_keys(tokens, prefixes="ta"):
+    return [f"{prefix}:{token}" for prefix in prefixes for token in tokens[prefix]]
+
+
+def matches(wishlist, tokens):
+    wanted = field_tokens(wishlist)
+    return any(wanted.values()) and all(
+        wanted[prefix] <= tokens[prefix] for prefix in wanted
+    )
+
+
+def _candidates(book, keys):
+    return (
+        Wishlist.objects.using(DEFAULT_DB_ALIAS)
+        .filter(index_key__in=keys)
+        .exclude(profile_id=book.owner_id)
+    )
+
+
+def find_matching_wishlists(book):
+    """Pedidos de outros perfis atendidos pelo livro, fora os só de gênero."""
+    tokens = field_tokens(book)
+    keys = book_keys(tokens)
+    if not keys:
+        return []
+    return [
+        wishlist
+        for wishlist in _candidates(book, keys).iterator(chunk_size=2000)
+        if matches(wishlist, tokens)
+    ]
+
+
+def genre_wishlists(book, key, before=None, limit=None):
+    """
+    Pedidos só de gênero com a chave ``key``, dos mais novos, abaixo do id
+    ``before``; o índice de index_key já os entrega nessa ordem.
+    """
+    queryset = _candidates(book, [key])
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    return list(queryset.order_by("-id")[:limit])
+
+
+def _get_book(book_id):
+    try:
+        return Book.objects.using(locate(Book, book_id)).get(pk=book_id)
+    except Book.DoesNotExist:
+        return None
+
+
+@job(name="library.match_new_book")
+def match_new_book(book_id):
+    """
+    Registra os pedidos atendidos por um livro novo e avisa os donos; os
+    pedidos só de gênero ficam para match_genre_wishlists.
+    """
+    book = _get_book(book_id)
+    if book is None:
+        return []
+
+    new_matches = _record_matches(book, find_matching_wishlists(book))
+    for key in book_keys(field_tokens(book), GENRE_PREFIX):
+        match_genre_wishlists.enqueue(book_id=book.id, key=key)
+    return new_matches
+
+
+@job(name="library.match_genre_wishlists", priority=-1)
+def match_genre_wishlists(book_id, key, before=None, seen=0):
+    """
+    Confere um lote dos pedidos só de gênero com a chave ``key`` e agenda o
+    próximo, até WISHLIST_GENRE_MATCH_LIMIT pedidos.
+    """
+    book = _get_book(book_id)
+    if book is None:
+        return []
+
+    batch_size = getattr(settings, "WISHLIST_GENRE_BATCH_SIZE", 500)
+    limit = getattr(settings, "WISHLIST_GENRE_MATCH_LIMIT", 5000)
+    batch = genre_wishlists(book, key, before, min(batch_size, limit - seen))
+    tokens = field_tokens(book)
+    new_matches = _record_matches(
+        book, [wishlist for wishlist in batch if matches(wishlist, tokens)]
+    )
+    seen += len(batch)
+    if len(batch) == batch_size and seen < limit:
+        match_genre_wishlists.enqueue(
+            book_id=book_id, key=key, before=batch[-1].id, seen=seen
+        )
+    return new_matches
+
+
+def _record_matches(book, wishlists):
+    if not wishlists:
+        return []
+    already = set(
+        WishlistMatch.objects.using(DEFAULT_DB_ALIAS)
+        .filter(
+            book_id=book.id, wishlist_id__in=[wishlist.id for wishlist in wishlists]
+        )
+        .values_list("wishlist_id", flat=True)
+    )
+    new_matches = WishlistMatch.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [
+            WishlistMatch(wishlist=wishlist, book_id=book.id)
+            for wishlist in wishlists
+            if wishlist.id not in already
+        ],
+        ignore_conflicts=True,
+    )
+    notify_wishlist_matches(new_matches, book)
+    return new_matches
@@ -10,8 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
-from pathlib import Path
 import os
+from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,10 +43,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "library.middleware.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "library.middleware.SessionUserMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -71,6 +72,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "trocalivro.wsgi.application"
 
+# Páginas de leitura assíncronas (library.async_views). O asgi.py liga por
+# padrão; sob WSGI as views síncronas evitam um event loop por requisição.
+ASYNC_VIEWS = os.environ.get("TROCALIVRO_ASYNC_VIEWS", "0") == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -82,6 +87,166 @@ DATABASES = {
     }
 }
 
+# Réplicas de leitura: TROCALIVRO_READ_REPLICAS=N cria N cópias SQLite do
+# banco principal, atualizadas com `manage.py refresh_replicas --interval S`.
+# Réplicas mais antigas que REPLICA_MAX_LAG segundos são ignoradas, e uma
+# sessão lê do primário por REPLICA_STICKY_SECONDS depois de escrever.
+
+DATABASE_REPLICAS = []
+
+for number in range(1, int(os.environ.get("TROCALIVRO_READ_REPLICAS", "0")) + 1):
+    DATABASES[f"replica_{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db.replica_{number}.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+
+# Shards de livros e trocas: TROCALIVRO_SHARDS=N (até 15) adiciona N bancos
+# SQLite além do "default"; cada dono fica em um shard (library.sharding) e
+# `manage.py move_owner_shard` move um dono de shard.
+
+DATABASE_SHARDS = ["default"]
+
+for number in range(1, int(os.environ.get("TROCALIVRO_SHARDS", "0")) + 1):
+    DATABASES[f"shard_{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db.shard_{number}.sqlite3",
+    }
+    DATABASE_SHARDS.append(f"shard_{number}")
+
+DATABASE_ROUTERS = [
+    "library.db_routers.ShardRouter",
+    "library.db_routers.ReplicaRouter",
+]
+
+REPLICA_MAX_LAG = 30
+
+REPLICA_STICKY_SECONDS = 30
+
+# Eventos de troca enviados por SSE (library.events). O broker em memória só
+# alcança conexões do mesmo processo; com vários workers ASGI use
+# TROCALIVRO_EVENT_BROKER=sqlite para compartilhar os eventos por arquivo.
+EVENT_BROKER = "library.events.InMemoryBroker"
+EVENT_BROKER_OPTIONS = {}
+
+if os.environ.get("TROCALIVRO_EVENT_BROKER") == "sqlite":
+    EVENT_BROKER = "library.events.SQLiteBroker"
+    EVENT_BROKER_OPTIONS = {"path": BASE_DIR / "events.sqlite3"}
+
+# Segundos entre comentários de keep-alive numa conexão SSE ociosa.
+EVENT_HEARTBEAT = 15
+
+# Fila de tarefas (library.jobs), consumida por `manage.py run_worker`.
+# Um job reservado há mais de JOB_LOCK_TIMEOUT segundos volta para a fila;
+# falhas esperam JOB_RETRY_BACKOFF * 2^(tentativa - 1) segundos, até o teto.
+JOB_LOCK_TIMEOUT = 600
+
+JOB_RETRY_BACKOFF = 10
+
+JOB_RETRY_BACKOFF_MAX = 3600
+
+# Teto, em segundos, da espera entre as repetições da gravação que finaliza um
+# job quando o banco está ocupado.
+JOB_FINALIZE_BACKOFF_MAX = 5
+
+# E-mails de resumo das trocas (library.notifications): as notificações de um
+# perfil esperam NOTIFICATION_DIGEST_WINDOW segundos para sair juntas, e cada
+# conexão com o servidor de e-mail envia até NOTIFICATION_BATCH_SIZE resumos.
+NOTIFICATION_DIGEST_WINDOW = 900
+
+NOTIFICATION_BATCH_SIZE = 100
+
+# Sem SMTP configurado, os e-mails vão para o console; use
+# TROCALIVRO_EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend (e as
+# variáveis EMAIL_HOST...) em produção, ou o backend de arquivo para testes.
+EMAIL_BACKEND = os.environ.get(
+    "TROCALIVRO_EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+
+EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
+
+DEFAULT_FROM_EMAIL = "trocalivro <nao-responda@trocalivro.local>"
+
+# Solicitações de troca sem resposta por EXCHANGE_REQUEST_TTL segundos
+# expiram e liberam o livro (library.expiry). A varredura trata
+# EXCHANGE_EXPIRY_BATCH_SIZE por transação, espera EXCHANGE_EXPIRY_PAUSE
+# segundos entre os lotes e, agendada pela fila, repete a cada
+# EXCHANGE_EXPIRY_INTERVAL segundos.
+EXCHANGE_REQUEST_TTL = 14 * 86400
+
+EXCHANGE_EXPIRY_BATCH_SIZE = 200
+
+EXCHANGE_EXPIRY_PAUSE = 0.05
+
+EXCHANGE_EXPIRY_INTERVAL = 3600
+
+# Trocas encerradas há mais de EXCHANGE_ARCHIVE_AFTER dias saem da tabela
+# quente para o arquivo (library.archive, `manage.py archive_exchanges`, que
+# deve rodar pelo cron), EXCHANGE_ARCHIVE_BATCH_SIZE por transação.
+EXCHANGE_ARCHIVE_AFTER = 90
+
+EXCHANGE_ARCHIVE_BATCH_SIZE = 500
+
+# Listas de desejos (library.wishlists): os pedidos só com gênero de um livro
+# novo são conferidos em jobs de WISHLIST_GENRE_BATCH_SIZE pedidos, dos mais
+# novos para os mais antigos, até WISHLIST_GENRE_MATCH_LIMIT por palavra do
+# gênero.
+WISHLIST_GENRE_BATCH_SIZE = 500
+
+WISHLIST_GENRE_MATCH_LIMIT = 5000
+
+# Capas maiores que isso são reduzidas em segundo plano (library.tasks).
+BOOK_COVER_MAX_SIZE = (600, 900)
+
+# Recomendações "você também pode gostar" (library.recommendations):
+# vizinhos guardados por livro e por perfil, e o bônus de similaridade para
+# livros do mesmo gênero.
+RECOMMENDATIONS_TOP_N = 8
+
+RECOMMENDATIONS_GENRE_BONUS = 0.25
+
+# Livros parecidos pelo texto (library.similarity): o índice TF-IDF fica em
+# arquivos .npy abertos por mmap pelos workers.
+SIMILARITY_INDEX_DIR = BASE_DIR / "similarity_index"
+
+SIMILAR_BOOKS_TOP_K = 8
+
+# Importação de catálogos em lote (library.imports): arquivos enviados pela
+# página da equipe e tamanho de cada lote/transação.
+BOOK_IMPORT_DIR = BASE_DIR / "book_imports"
+
+BOOK_IMPORT_BATCH_SIZE = 500
+
+
+# Por padrão fica o cache locmem do Django, que é por processo.
+# TROCALIVRO_CACHE_BACKEND (ex.: FileBasedCache, Redis ou Memcached) e
+# TROCALIVRO_CACHE_LOCATION ligam um cache compartilhado por todos os
+# processos. Com shards ele é necessário para que um move_owner rodado em
+# outro processo chegue ao mapa de shards dos workers.
+
+CACHE_BACKEND = os.environ.get("TROCALIVRO_CACHE_BACKEND")
+
+if CACHE_BACKEND:
+    CACHES = {
+        "default": {
+            "BACKEND": CACHE_BACKEND,
+            "LOCATION": os.environ.get("TROCALIVRO_CACHE_LOCATION", ""),
+        }
+    }
+
+
+# Authentication
+# O backend carrega usuário e perfil juntos numa consulta. O middleware pode
+# guardar o par (sem o hash da senha) em cache por usuário durante
+# SESSION_USER_CACHE_TIMEOUT segundos; 0 desativa. A entrada é apagada a cada
+# save() do usuário ou do perfil, mas só no cache do processo que gravou.
+# Por isso o cache da sessão só fica ligado com um cache compartilhado.
+
+AUTHENTICATION_BACKENDS = ["library.backends.ProfileBackend"]
+
+SESSION_USER_CACHE_TIMEOUT = 300 if CACHE_BACKEND else 0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators